@@ -0,0 +1,81 @@
+"""
+Versioned schema migrations applied at startup (after create_all).
+
+create_all() only creates missing tables; it never adds indexes or columns
+to tables that already exist. Anything an existing database needs goes here
+as a new entry at the END of MIGRATIONS (never edit an applied one).
+
+Applied versions are recorded in public.schema_migrations. Every API process
+runs this on startup, so the whole run holds a transaction-scoped advisory
+lock: the first process applies, the others wait and find nothing to do.
+"""
+
+import logging
+import sys
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("migrations")
+logger.setLevel(logging.INFO)
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("[%(levelname)s] %(asctime)s - %(message)s"))
+    logger.addHandler(console_handler)
+logger.propagate = False
+
+MIGRATIONS_LOCK_ID = 0x0F1_0001  # pg_advisory_xact_lock key
+
+# (version, description, statements)
+MIGRATIONS: List[Tuple[str, str, List[str]]] = [
+    (
+        "0001_transaction_indexes",
+        "Composite indexes for sync and listing queries on transactions",
+        [
+            # sync engine: per-account history walks / anchors on (sms_timestamp, id)
+            'CREATE INDEX IF NOT EXISTS ix_transactions_account_sms_ts '
+            'ON public.transactions (account_id, sms_timestamp, id)',
+            # sync engine: which accounts have work, first/last unsynced row
+            'CREATE INDEX IF NOT EXISTS ix_transactions_unsynced '
+            'ON public.transactions (account_id, sms_timestamp, id) WHERE "isSynced" = false',
+            # per-account listing, newest first
+            'CREATE INDEX IF NOT EXISTS ix_transactions_account_txn_dt '
+            'ON public.transactions (account_id, txn_datetime DESC, id DESC)',
+            # all-accounts listing, newest first
+            'CREATE INDEX IF NOT EXISTS ix_transactions_txn_dt '
+            'ON public.transactions (txn_datetime DESC, id DESC)',
+        ],
+    ),
+]
+
+
+def apply_migrations(engine: Engine) -> List[str]:
+    """Apply every migration not yet recorded. Returns the versions applied."""
+    applied_now: List[str] = []
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS public.schema_migrations ("
+            " version VARCHAR PRIMARY KEY,"
+            " description VARCHAR,"
+            " applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        ))
+        done = {row[0] for row in conn.execute(text("SELECT version FROM public.schema_migrations"))}
+
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            for stmt in statements:
+                conn.execute(text(stmt))
+            conn.execute(
+                text("INSERT INTO public.schema_migrations (version, description) VALUES (:v, :d)"),
+                {"v": version, "d": description},
+            )
+            applied_now.append(version)
+
+    if applied_now:
+        logger.info(f"Migrations applied: {', '.join(applied_now)}")
+    return applied_now
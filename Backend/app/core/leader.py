@@ -0,0 +1,289 @@
+# leader.py
+"""
+Leader election over a Redis lock with a TTL.
+
+With `uvicorn --workers N` every process runs on_startup. Only the elected
+leader should open the SmartAPI socket, run the scheduler, flush LTPs to the
+DB, refresh tokens and sync transactions; every process (leader included)
+serves HTTP and /ws/stocks from Redis.
+
+    SET  onefinance:leader <identity> NX PX <ttl>     acquire
+    PEXPIRE if GET == identity  (Lua)                 renew every ttl/3
+    DEL     if GET == identity  (Lua)                 release on shutdown
+
+If the leader dies its key expires after LEADER_TTL_MS and the next
+follower to poll takes over. A leader that cannot renew (Redis unreachable)
+steps down once its own lease runs out locally, so two processes never both
+believe they lead for longer than one renew interval.
+
+Election fails open: once Redis has been unreachable for longer than the
+TTL (including at startup), processes fall back to an exclusive lock on
+LEADER_LOCK_FILE, so one process per host keeps ingesting without Redis.
+When Redis comes back the fallback leader re-acquires the Redis lock, or
+steps down if another process already holds it.
+
+Election is off by default (LEADER_ELECTION=0): the process is its own
+leader, as with a single worker. Set LEADER_ELECTION=1 for
+`uvicorn --workers N` / multi-host deployments.
+"""
+
+import os
+import time
+import uuid
+import socket
+import tempfile
+import threading
+from typing import Callable, List, Optional
+
+import redis_client
+from redis_client import get_redis
+
+LEADER_ELECTION = os.getenv("LEADER_ELECTION", "0").lower() in ("1", "true", "yes", "on")
+LEADER_KEY = os.getenv("LEADER_KEY", "onefinance:leader")
+LEADER_TTL_MS = int(os.getenv("LEADER_TTL_MS", "15000"))
+# host-local fallback lock while Redis is unreachable
+LEADER_LOCK_FILE = os.getenv(
+    "LEADER_LOCK_FILE",
+    os.path.join(tempfile.gettempdir(), LEADER_KEY.replace(":", "_") + ".lock"),
+)
+
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _log(msg: str, level: str = "INFO"):
+    print(f"[Leader] {level}: {msg}")
+
+
+def _try_lock_file(path: str):
+    """Non-blocking exclusive lock on `path`. Returns the open file, or None if held."""
+    f = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+    except OSError:
+        f.close()
+        return None
+
+
+class LeaderElector:
+    def __init__(
+        self,
+        key: str = LEADER_KEY,
+        ttl_ms: int = LEADER_TTL_MS,
+        enabled: bool = LEADER_ELECTION,
+        lock_file: str = LEADER_LOCK_FILE,
+    ):
+        self.key = key
+        self.ttl_ms = ttl_ms
+        self.enabled = enabled
+        self.lock_file = lock_file
+        self.renew_interval = ttl_ms / 3000.0
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._leader = False
+        self._lease_deadline = 0.0
+        self._on_elected: List[Callable[[], None]] = []
+        self._on_demoted: List[Callable[[], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # fail-open state: when Redis went away, and the host lock while we hold it
+        self._redis_down_since: Optional[float] = None
+        self._fallback_lock = None
+
+        self.elections = 0
+        self.demotions = 0
+        self.fallbacks = 0
+
+    # ------------------------ STATE ------------------------
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    @property
+    def fallback(self) -> bool:
+        """Leading on the host lock because Redis is unreachable."""
+        return self._fallback_lock is not None
+
+    def on_elected(self, cb: Callable[[], None]):
+        self._on_elected.append(cb)
+
+    def on_demoted(self, cb: Callable[[], None]):
+        self._on_demoted.append(cb)
+
+    def _fire(self, callbacks: List[Callable[[], None]]):
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception as e:
+                _log(f"callback {getattr(cb, '__name__', cb)} failed: {e}", "ERROR")
+
+    def _elect(self, lease_start: float):
+        self._lease_deadline = lease_start + self.ttl_ms / 1000.0
+        if self._leader:
+            return
+        self._leader = True
+        self.elections += 1
+        _log(f"{self.identity} elected")
+        self._fire(self._on_elected)
+
+    def _demote(self, reason: str):
+        self._release_fallback()
+        if not self._leader:
+            return
+        self._leader = False
+        self.demotions += 1
+        _log(f"{self.identity} stepped down: {reason}", "WARNING")
+        self._fire(self._on_demoted)
+
+    # ------------------------ LIFECYCLE ------------------------
+    def start(self):
+        if not self.enabled:
+            self._elect(float("inf"))
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leader-elector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop campaigning and give the lock up so a follower takes over at once."""
+        self._stop.set()
+        self.release()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                _log(f"tick error: {e}", "ERROR")
+            self._stop.wait(self.renew_interval)
+
+    def tick(self):
+        """One acquire-or-renew attempt."""
+        started = time.monotonic()
+
+        r = get_redis()
+        if not r:
+            self._redis_unavailable(started, "redis unreachable")
+            return
+
+        try:
+            if self._leader and not self.fallback:
+                ok = r.eval(_RENEW_LUA, 1, self.key, self.identity, self.ttl_ms)
+                if ok:
+                    self._elect(started)
+                else:
+                    self._demote("lock lost")
+            else:
+                if r.set(self.key, self.identity, nx=True, px=self.ttl_ms):
+                    if self.fallback:
+                        _log(f"{self.identity} redis is back, leading on the redis lock again", "WARNING")
+                        self._release_fallback()
+                    self._elect(started)
+                elif self.fallback:
+                    self._demote("redis is back and another process holds the lock")
+        except Exception as e:
+            redis_client.report_redis_error(e, r)
+            self._redis_unavailable(started, f"redis error ({e})")
+            return
+
+        self._redis_down_since = None
+
+    def _redis_unavailable(self, now: float, reason: str):
+        """
+        Fail open. A leader rides out its lease; a follower waits until Redis
+        has been gone longer than the TTL (any Redis lease has expired by
+        then). After that whoever takes the host lock leads without Redis.
+        """
+        if self._redis_down_since is None:
+            self._redis_down_since = now
+
+        if self.fallback:
+            return
+        if self._leader:
+            if now <= self._lease_deadline:
+                return
+        elif now - self._redis_down_since <= self.ttl_ms / 1000.0:
+            return
+
+        lock = _try_lock_file(self.lock_file)
+        if lock is None:
+            if self._leader:
+                self._demote(f"{reason}, lease expired")
+            return
+
+        self._fallback_lock = lock
+        self.fallbacks += 1
+        _log(
+            f"{self.identity} {reason}, no redis lease: FAILING OPEN, "
+            f"leading on host lock {self.lock_file} until redis is back",
+            "WARNING",
+        )
+        self._elect(float("inf"))
+
+    def _release_fallback(self):
+        lock, self._fallback_lock = self._fallback_lock, None
+        if lock is not None:
+            try:
+                lock.close()
+            except Exception:
+                pass
+
+    def release(self):
+        if not self.enabled or not self._leader:
+            return
+        r = get_redis()
+        try:
+            if r and not self.fallback:
+                r.eval(_RELEASE_LUA, 1, self.key, self.identity)
+        except Exception as e:
+            redis_client.report_redis_error(e, r)
+        self._demote("released")
+
+    def holder(self) -> Optional[str]:
+        r = get_redis()
+        if not r:
+            return None
+        try:
+            raw = r.get(self.key)
+        except Exception as e:
+            redis_client.report_redis_error(e, r)
+            return None
+        if raw is None:
+            return None
+        return raw.decode() if isinstance(raw, (bytes, bytearray)) else str(raw)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "identity": self.identity,
+            "is_leader": self._leader,
+            "fallback": self.fallback,
+            "holder": self.holder() if self.enabled else self.identity,
+            "ttl_ms": self.ttl_ms,
+            "elections": self.elections,
+            "demotions": self.demotions,
+            "fallbacks": self.fallbacks,
+        }
+
+
+leader = LeaderElector()
@@ -0,0 +1,417 @@
+# ltp_broadcaster.py
+"""
+Fan-out of live LTP updates to /ws/stocks clients on the app's OWN event loop.
+
+ - Worker / listener threads call publish(symbol, ltp). Updates land in a
+   thread-safe inbox and the loop is woken with call_soon_threadsafe (only
+   when the inbox goes from empty to non-empty, not once per tick).
+ - Clients choose what they receive (see handle_message); until they send
+   anything they get every symbol.
+ - Updates are conflated per client: at most one frame per FRAME_INTERVAL,
+   carrying only symbols that changed, each at its latest price:
+       {"type": "ltp", "data": [{"symbol": "INFY", "Ltp": 1500.5}, ...]}
+   Pending state is one dict entry per symbol, so a slow client costs
+   bounded memory; a client whose send times out is dropped and can never
+   stall the others.
+ - Events are deduplicated per symbol by seq (see app.core.price_bus): the
+   Redis path and the DB-flush fallback carry the same seq for the same
+   tick, so each price change reaches each client once.
+ - Delivery latency is sampled at socket send: exchange timestamp -> send
+   and receipt (seq) -> send, reported by stats().
+
+Encoding is negotiated per client (ltp_codec): json by default, or
+msgpack / struct via `/ws/stocks?encoding=struct` or an "encoding" message.
+Control replies are always JSON text.
+
+Client protocol (JSON text messages):
+    {"action": "subscribe",   "symbols": ["INFY", "TCS"]}
+    {"action": "subscribe",   "symbols": "*"}            every symbol
+    {"action": "subscribe",   "broker": "zerodha"}        that broker's holdings
+    {"action": "unsubscribe", "symbols": ["TCS"]}
+    {"action": "unsubscribe", "broker": "zerodha"}
+    {"action": "encoding",    "encoding": "msgpack"}      json | msgpack | struct
+    {"action": "replay",      "seconds": 60}              latest ticks from the tick stream
+                                                          (capped at TICK_REPLAY_SECONDS)
+Replies: {"type": "subscribed", "all": bool, "symbols": [...], "map": {..}}  (map: struct only)
+         {"type": "encoding", "encoding": ..}, {"type": "replayed", "symbols": n}
+         or {"type": "error", ...}
+"""
+
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from app.core import ltp_codec
+from app.core.price_bus import PriceEvent
+
+FRAME_INTERVAL = 0.25         # seconds between frames per client
+SEND_TIMEOUT = 5.0            # seconds before a stuck client is dropped
+LATENCY_SAMPLES = 4096        # recent deliveries kept for percentiles
+
+GroupResolver = Callable[[str], Awaitable[List[str]]]
+ReplaySource = Callable[[float], Awaitable[Dict[str, dict]]]
+SnapshotSource = Callable[[], Awaitable[Dict[str, dict]]]
+
+
+def _norm(symbols: Iterable[Any]) -> Set[str]:
+    return {str(s).strip().upper() for s in symbols if str(s).strip()}
+
+
+class _LatencyWindow:
+    """Last N samples in ms; percentiles computed on read."""
+
+    def __init__(self, maxlen: int = LATENCY_SAMPLES):
+        self._samples: Deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+
+    def add(self, ms: float):
+        self._samples.append(ms)
+        self.count += 1
+
+    def summary(self) -> dict:
+        s = sorted(self._samples)
+        if not s:
+            return {"count": self.count}
+        p = lambda q: round(s[min(len(s) - 1, int(q * len(s)))], 3)
+        return {"count": self.count, "p50": p(0.50), "p95": p(0.95), "p99": p(0.99), "max": round(s[-1], 3)}
+
+
+class _Client:
+    def __init__(self, ws: WebSocket, encoding: str = ltp_codec.JSON):
+        self.ws = ws
+        self.encoding = encoding
+        self.table = ltp_codec.SymbolTable()
+        self.all_symbols = True
+        self.symbols: Set[str] = set()
+        # symbol -> (ltp, exch_ts_ms, seq)
+        self.pending: Dict[str, Tuple[Any, Optional[int], Optional[int]]] = {}
+        self.ready = asyncio.Event()
+        self.next_send = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.frames = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.bytes_sent = 0
+
+    def wants(self, symbol: str) -> bool:
+        return self.all_symbols or symbol in self.symbols
+
+    def offer(self, symbol: str, ltp: Any, ts: Optional[int] = None, seq: Optional[int] = None):
+        if symbol in self.pending:
+            self.coalesced += 1
+        self.pending[symbol] = (ltp, ts, seq)
+        self.ready.set()
+
+
+class LtpBroadcaster:
+    def __init__(self, frame_interval: float = FRAME_INTERVAL, send_timeout: float = SEND_TIMEOUT):
+        self.frame_interval = frame_interval
+        self.send_timeout = send_timeout
+
+        # async broker -> symbols lookup, set by the app (keeps DB out of here)
+        self.group_resolver: Optional[GroupResolver] = None
+        # async seconds -> {symbol: {"ltp", "ts", "seq"}} from the tick stream
+        self.replay_source: Optional[ReplaySource] = None
+        # async () -> {symbol: {"ltp", "ts", "seq"}}, latest price per symbol
+        self.snapshot_source: Optional[SnapshotSource] = None
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[WebSocket, _Client] = {}
+
+        self._inbox: Deque[Tuple[str, Any, Optional[int], Optional[int]]] = deque()
+        self._inbox_lock = threading.Lock()
+        self._wakeup_pending = False
+
+        # symbol -> highest seq already fanned out (event loop only)
+        self._last_seq: Dict[str, int] = {}
+
+        self.published = 0
+        self.duplicates = 0
+        self.dropped_clients = 0
+        self.exch_latency = _LatencyWindow()
+        self.recv_latency = _LatencyWindow()
+
+    # ------------------------ LIFECYCLE ------------------------
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Call from an async startup hook with the running loop."""
+        self._loop = loop
+
+    # ------------------------ ANY THREAD ------------------------
+    def publish_event(self, event: PriceEvent):
+        """price_bus listener."""
+        self.publish(event.symbol, event.ltp, event.ts, event.seq)
+
+    def publish(self, symbol: str, ltp: Any, ts: Optional[int] = None, seq: Optional[int] = None):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        with self._inbox_lock:
+            self._inbox.append((symbol, ltp, ts, seq))
+            self.published += 1
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+
+        try:
+            loop.call_soon_threadsafe(self._drain_inbox)
+        except RuntimeError:
+            # loop shut down between the check and the call
+            pass
+
+    # ------------------------ EVENT LOOP ------------------------
+    def _drain_inbox(self):
+        with self._inbox_lock:
+            items = list(self._inbox)
+            self._inbox.clear()
+            self._wakeup_pending = False
+
+        for symbol, ltp, ts, seq in items:
+            if seq is not None:
+                last = self._last_seq.get(symbol)
+                if last is not None and seq <= last:
+                    # already delivered via the other path (or out of order)
+                    self.duplicates += 1
+                    continue
+                self._last_seq[symbol] = seq
+
+            if self._clients:
+                self._fanout(symbol, ltp, ts, seq)
+
+    def _fanout(self, symbol: str, ltp: Any, ts: Optional[int] = None, seq: Optional[int] = None):
+        for client in self._clients.values():
+            if client.wants(symbol):
+                client.offer(symbol, ltp, ts, seq)
+
+    async def _sender(self, client: _Client):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await client.ready.wait()
+
+                # conflate: at most one frame per interval
+                delay = client.next_send - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                client.ready.clear()
+                batch, client.pending = client.pending, {}
+                if not batch:
+                    continue
+
+                await asyncio.wait_for(self._send_frame(client, batch), timeout=self.send_timeout)
+                client.frames += 1
+                client.sent += len(batch)
+                client.next_send = loop.time() + self.frame_interval
+                self._record_latency(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._drop(client)
+
+    def _record_latency(self, batch: Dict[str, Tuple[Any, Optional[int], Optional[int]]]):
+        now_us = time.time_ns() // 1000
+        for _ltp, ts, seq in batch.values():
+            if ts:
+                self.exch_latency.add(now_us / 1000.0 - ts)
+            if seq:
+                self.recv_latency.add((now_us - seq) / 1000.0)
+
+    @staticmethod
+    async def _send_frame(client: _Client, batch: Dict[str, Tuple[Any, Optional[int], Optional[int]]]):
+        updates = [(sym, ltp, ts) for sym, (ltp, ts, _seq) in batch.items()]
+        payload = ltp_codec.encode_frame(client.encoding, updates, client.table)
+
+        if client.encoding == ltp_codec.STRUCT:
+            # ids first seen in this frame must be known before the frame
+            new_ids = client.table.take_unannounced()
+            if new_ids:
+                await client.ws.send_json(ltp_codec.symbols_message(new_ids))
+
+        if isinstance(payload, bytes):
+            await client.ws.send_bytes(payload)
+        else:
+            await client.ws.send_text(payload)
+        client.bytes_sent += len(payload)
+
+    def _drop(self, client: _Client):
+        if self._clients.pop(client.ws, None) is None:
+            return
+        self.dropped_clients += 1
+        if client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+        asyncio.ensure_future(self._close(client.ws))
+
+    @staticmethod
+    async def _close(ws: WebSocket):
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    async def register(self, ws: WebSocket, encoding: Optional[str] = None) -> _Client:
+        if self._loop is None:
+            self.bind(asyncio.get_running_loop())
+        client = _Client(ws, ltp_codec.negotiate(encoding))
+        self._clients[ws] = client
+        client.task = asyncio.create_task(self._sender(client))
+        return client
+
+    async def unregister(self, ws: WebSocket):
+        client = self._clients.pop(ws, None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
+
+    async def replay(self, ws: WebSocket, seconds: Any) -> int:
+        """Queue the latest recent tick per symbol for ONE client (no global dedupe)."""
+        client = self._clients.get(ws)
+        if client is None or self.replay_source is None:
+            return 0
+        try:
+            seconds = float(seconds)
+        except (TypeError, ValueError):
+            return 0
+        if seconds <= 0:
+            return 0
+
+        try:
+            recent = await self.replay_source(seconds)
+        except Exception:
+            return 0
+
+        return self._offer_records(client, recent)
+
+    async def snapshot(self, ws: WebSocket) -> int:
+        """Queue the current price of every symbol for ONE client (initial state)."""
+        client = self._clients.get(ws)
+        if client is None or self.snapshot_source is None:
+            return 0
+        try:
+            latest = await self.snapshot_source()
+        except Exception:
+            return 0
+
+        return self._offer_records(client, latest)
+
+    @staticmethod
+    def _offer_records(client: _Client, records: Dict[str, dict]) -> int:
+        count = 0
+        for symbol, rec in records.items():
+            if client.wants(symbol):
+                client.offer(symbol, rec["ltp"], rec.get("ts"), rec.get("seq"))
+                count += 1
+        return count
+
+    # ------------------------ SUBSCRIPTIONS ------------------------
+    async def _resolve(self, msg: dict) -> Tuple[bool, Set[str]]:
+        """(all_symbols, symbols) named by a subscribe/unsubscribe message."""
+        symbols = msg.get("symbols")
+        if symbols == "*":
+            return True, set()
+
+        out: Set[str] = set()
+        if isinstance(symbols, list):
+            out |= _norm(symbols)
+
+        broker = msg.get("broker")
+        if broker:
+            if self.group_resolver is None:
+                raise ValueError("broker groups are not available")
+            out |= _norm(await self.group_resolver(str(broker)))
+
+        return False, out
+
+    async def handle_message(self, ws: WebSocket, text: str) -> Optional[dict]:
+        """Apply one client control message; returns the reply to send (if any)."""
+        client = self._clients.get(ws)
+        if client is None:
+            return None
+
+        try:
+            msg = json.loads(text)
+            if not isinstance(msg, dict):
+                raise ValueError("expected a JSON object")
+
+            action = msg.get("action")
+            if action == "encoding":
+                return self._set_encoding(client, msg.get("encoding"))
+            if action == "replay":
+                count = await self.replay(ws, msg.get("seconds"))
+                return {"type": "replayed", "symbols": count}
+            if action not in ("subscribe", "unsubscribe"):
+                raise ValueError(f"unknown action: {action}")
+
+            all_symbols, symbols = await self._resolve(msg)
+        except Exception as e:
+            return {"type": "error", "message": str(e)}
+
+        if action == "subscribe":
+            if all_symbols:
+                client.all_symbols = True
+                client.symbols.clear()
+            else:
+                # first explicit subscription narrows the default "everything"
+                client.all_symbols = False
+                client.symbols |= symbols
+        else:
+            if all_symbols:
+                client.all_symbols = False
+                client.symbols.clear()
+            else:
+                client.symbols -= symbols
+            for sym in list(client.pending):
+                if not client.wants(sym):
+                    client.pending.pop(sym, None)
+
+        reply = {
+            "type": "subscribed",
+            "all": client.all_symbols,
+            "symbols": sorted(client.symbols),
+        }
+        if client.encoding == ltp_codec.STRUCT:
+            # symbol dictionary goes out with the subscription
+            client.table.add(sorted(client.symbols))
+            reply["map"] = client.table.take_unannounced()
+        return reply
+
+    @staticmethod
+    def _set_encoding(client: _Client, requested: Optional[str]) -> dict:
+        enc = ltp_codec.negotiate(requested)
+        if enc != client.encoding:
+            client.encoding = enc
+            client.table = ltp_codec.SymbolTable()
+
+        reply: Dict[str, Any] = {"type": "encoding", "encoding": enc}
+        if enc == ltp_codec.STRUCT:
+            reply["header"] = ltp_codec.STRUCT_HEADER.format
+            reply["record"] = ltp_codec.STRUCT_RECORD.format
+        return reply
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "published": self.published,
+            "duplicates": self.duplicates,
+            "inbox": len(self._inbox),
+            "dropped_clients": self.dropped_clients,
+            "frames": sum(c.frames for c in self._clients.values()),
+            "sent": sum(c.sent for c in self._clients.values()),
+            "coalesced": sum(c.coalesced for c in self._clients.values()),
+            "bytes_sent": sum(c.bytes_sent for c in self._clients.values()),
+            "encodings": {
+                enc: sum(1 for c in self._clients.values() if c.encoding == enc)
+                for enc in ltp_codec.ENCODINGS
+            },
+            "latency_ms": {
+                "exchange_to_send": self.exch_latency.summary(),
+                "receive_to_send": self.recv_latency.summary(),
+            },
+        }
+
+
+broadcaster = LtpBroadcaster()
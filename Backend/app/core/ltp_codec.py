@@ -0,0 +1,167 @@
+# ltp_codec.py
+"""
+Wire encodings for the live price stream.
+
+/ws/stocks frames (negotiated per client, JSON is the default):
+    json     text    {"type": "ltp", "data": [{"symbol": "INFY", "Ltp": 1500.5}, ...]}
+    msgpack  binary  {"type": "ltp", "data": [["INFY", 1500.5, ts], ...]}
+    struct   binary  HEADER + count * RECORD, symbols replaced by small ids.
+                     The id -> symbol dictionary goes out as a JSON text frame
+                     {"type": "symbols", "map": {"INFY": 1, ...}} at subscribe
+                     time and before any frame that uses a new id.
+
+Redis `ltp_updates` channel (opt-in, LTP_CHANNEL_PUBLISH; LTP_CHANNEL_ENCODING,
+default json):
+    json     [{"symbol": .., "ltp": .., "ts": .., "seq": ..}, ...]
+    msgpack  [[symbol, ltp, ts, seq], ...]
+
+msgpack is optional: asking for it without the package falls back to json.
+"""
+
+import json
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+JSON = "json"
+MSGPACK = "msgpack"
+STRUCT = "struct"
+ENCODINGS = (JSON, MSGPACK, STRUCT)
+
+# struct frame: kind (1 = ltp), record count
+STRUCT_HEADER = struct.Struct("<BH")
+# symbol id, price, exchange timestamp in ms (0 = unknown)
+STRUCT_RECORD = struct.Struct("<Idq")
+STRUCT_KIND_LTP = 1
+STRUCT_MAX_RECORDS = 0xFFFF
+
+# (symbol, ltp, exch_ts_ms)
+FrameUpdate = Tuple[str, float, Optional[int]]
+
+_msgpack = None
+
+
+def _import_msgpack() -> bool:
+    global _msgpack
+    if _msgpack is not None:
+        return True
+    try:
+        import msgpack
+        _msgpack = msgpack
+        return True
+    except Exception:
+        return False
+
+
+def available(encoding: str) -> bool:
+    if encoding == MSGPACK:
+        return _import_msgpack()
+    return encoding in ENCODINGS
+
+
+def negotiate(requested: Optional[str]) -> str:
+    """Requested encoding if known and usable, else json."""
+    enc = (requested or JSON).strip().lower()
+    return enc if available(enc) else JSON
+
+
+# ------------------------ SYMBOL DICTIONARY ------------------------
+class SymbolTable:
+    """Per-connection symbol -> id map for the struct encoding."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self._unannounced: Dict[str, int] = {}
+
+    def id_for(self, symbol: str) -> int:
+        sid = self.ids.get(symbol)
+        if sid is None:
+            sid = len(self.ids) + 1
+            self.ids[symbol] = sid
+            self._unannounced[symbol] = sid
+        return sid
+
+    def add(self, symbols: Iterable[str]):
+        for sym in symbols:
+            self.id_for(sym)
+
+    def take_unannounced(self) -> Dict[str, int]:
+        """New ids the client hasn't been told about yet (cleared on read)."""
+        out, self._unannounced = self._unannounced, {}
+        return out
+
+
+def symbols_message(mapping: Dict[str, int]) -> dict:
+    return {"type": "symbols", "map": mapping}
+
+
+# ------------------------ WEBSOCKET FRAMES ------------------------
+def encode_frame(
+    encoding: str,
+    updates: List[FrameUpdate],
+    table: Optional[SymbolTable] = None,
+) -> Union[str, bytes]:
+    """One conflated frame. str -> send as text, bytes -> send as binary."""
+    if encoding == STRUCT:
+        if table is None:
+            raise ValueError("struct encoding needs a SymbolTable")
+        if len(updates) > STRUCT_MAX_RECORDS:
+            raise ValueError("too many records for one struct frame")
+        buf = bytearray(STRUCT_HEADER.size + STRUCT_RECORD.size * len(updates))
+        STRUCT_HEADER.pack_into(buf, 0, STRUCT_KIND_LTP, len(updates))
+        off = STRUCT_HEADER.size
+        for sym, ltp, ts in updates:
+            STRUCT_RECORD.pack_into(buf, off, table.id_for(sym), float(ltp), int(ts or 0))
+            off += STRUCT_RECORD.size
+        return bytes(buf)
+
+    if encoding == MSGPACK and _import_msgpack():
+        return _msgpack.packb(
+            {"type": "ltp", "data": [[sym, ltp, ts] for sym, ltp, ts in updates]},
+            use_bin_type=True,
+        )
+
+    return json.dumps({
+        "type": "ltp",
+        "data": [{"symbol": sym, "Ltp": ltp} for sym, ltp, _ts in updates],
+    })
+
+
+def decode_frame(
+    encoding: str,
+    payload: Union[str, bytes],
+    id_to_symbol: Optional[Dict[int, str]] = None,
+) -> List[FrameUpdate]:
+    """Inverse of encode_frame (used by clients, tests and benchmarks)."""
+    if encoding == STRUCT:
+        kind, count = STRUCT_HEADER.unpack_from(payload, 0)
+        if kind != STRUCT_KIND_LTP:
+            raise ValueError(f"unknown struct frame kind: {kind}")
+        names = id_to_symbol or {}
+        out = []
+        for sid, ltp, ts in STRUCT_RECORD.iter_unpack(
+            payload[STRUCT_HEADER.size:STRUCT_HEADER.size + count * STRUCT_RECORD.size]
+        ):
+            out.append((names.get(sid, str(sid)), ltp, ts or None))
+        return out
+
+    if encoding == MSGPACK:
+        if not _import_msgpack():
+            raise RuntimeError("msgpack is not installed")
+        msg = _msgpack.unpackb(payload, raw=False)
+        return [(sym, ltp, ts) for sym, ltp, ts in msg.get("data", [])]
+
+    msg = json.loads(payload)
+    return [(d["symbol"], d["Ltp"], None) for d in msg.get("data", [])]
+
+
+# ------------------------ REDIS CHANNEL ------------------------
+def encode_channel(updates: List[Tuple[str, float, Optional[int], int]], encoding: str = JSON) -> Union[str, bytes]:
+    """Payload for one PUBLISH on ltp_updates. updates = (symbol, ltp, ts, seq)."""
+    if encoding == MSGPACK and _import_msgpack():
+        return _msgpack.packb([[sym, ltp, ts, seq] for sym, ltp, ts, seq in updates], use_bin_type=True)
+
+    return json.dumps([
+        {"symbol": sym, "ltp": ltp, "ts": ts, "seq": seq}
+        for sym, ltp, ts, seq in updates
+    ])
+
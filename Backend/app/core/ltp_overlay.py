@@ -0,0 +1,50 @@
+# ltp_overlay.py
+"""
+Batched live-LTP overlay for holdings.
+
+One HMGET on the ltp:px hash (app.core.ltp_store) for every symbol a
+request needs (across all brokers), instead of one GET per holding. Fetch once with get_ltp_overlay[_async](), then apply
+the same mapping to as many holding lists as needed.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from app.core import ltp_store
+
+
+def normalize_symbol(sym: Optional[str]) -> str:
+    return (sym or "").strip().upper()
+
+
+def collect_symbols(*holding_lists: Iterable[dict]) -> List[str]:
+    seen = set()
+    for holdings in holding_lists:
+        for h in holdings or []:
+            sym = normalize_symbol(h.get("symbol"))
+            if sym:
+                seen.add(sym)
+    return sorted(seen)
+
+
+def get_ltp_overlay(symbols: Iterable[str]) -> Dict[str, float]:
+    syms = sorted({normalize_symbol(s) for s in symbols if s})
+    return {sym: rec["ltp"] for sym, rec in ltp_store.snapshot(syms).items()}
+
+
+async def get_ltp_overlay_async(symbols: Iterable[str]) -> Dict[str, float]:
+    syms = sorted({normalize_symbol(s) for s in symbols if s})
+    return {sym: rec["ltp"] for sym, rec in (await ltp_store.snapshot_async(syms)).items()}
+
+
+def apply_ltp_overlay(holdings: List[dict], overlay: Dict[str, float]) -> List[dict]:
+    """
+    Inject latest LTP values WITHOUT modifying cached objects.
+    """
+    output = []
+    for h in holdings:
+        h2 = h.copy()                # ← important to avoid mutation
+        price = overlay.get(normalize_symbol(h2.get("symbol")))
+        if price is not None:
+            h2["Ltp"] = price
+        output.append(h2)
+    return output
@@ -0,0 +1,153 @@
+# ltp_store.py
+"""
+Live LTP store: every symbol in ONE Redis hash, versioned per field.
+
+Keys:
+    ltp:px    HASH  symbol -> "price|exch_ts|seq"
+    ltp:seq   ZSET  symbol scored by its latest seq   ("changed since N")
+
+seq is a process-independent, strictly increasing integer (microseconds
+since epoch, bumped on collision), so clients can poll
+changes_since(last_seen_seq) across worker restarts.
+
+Writes go through write_many(pipe, ...) so the tick writer can fold them
+into its existing MULTI/EXEC pipeline: the hash and the ZSET always change
+together. Reads have sync and async flavours.
+"""
+
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis_client
+import redis_client_async
+
+PX_KEY = "ltp:px"
+SEQ_KEY = "ltp:seq"
+
+# (symbol, price, exch_ts_ms, seq)
+LtpUpdate = Tuple[str, float, Optional[int], int]
+
+_seq_lock = threading.Lock()
+_last_seq = 0
+
+
+def next_seq() -> int:
+    global _last_seq
+    with _seq_lock:
+        _last_seq = max(_last_seq + 1, time.time_ns() // 1000)
+        return _last_seq
+
+
+# ------------------------ ENCODING ------------------------
+def pack(price: float, exch_ts: Optional[int], seq: int) -> str:
+    return f"{price}|{exch_ts or 0}|{seq}"
+
+
+def unpack(raw) -> Optional[dict]:
+    if raw is None:
+        return None
+    try:
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode()
+        price, exch_ts, seq = raw.split("|")
+        return {"ltp": float(price), "ts": int(exch_ts) or None, "seq": int(seq)}
+    except Exception:
+        return None
+
+
+def _decode(v) -> str:
+    return v.decode() if isinstance(v, (bytes, bytearray)) else str(v)
+
+
+# ------------------------ WRITE ------------------------
+def write_many(pipe, updates: List[LtpUpdate]):
+    """Queue HSET + ZADD on an existing pipeline."""
+    if not updates:
+        return
+    pipe.hset(PX_KEY, mapping={sym: pack(price, ts, seq) for sym, price, ts, seq in updates})
+    pipe.zadd(SEQ_KEY, {sym: seq for sym, _price, _ts, seq in updates})
+
+
+# ------------------------ READ (sync) ------------------------
+def snapshot(symbols: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """HGETALL (all symbols) or HMGET (given symbols): one round trip."""
+    r = redis_client.get_redis()
+    if not r:
+        return {}
+    try:
+        if symbols is None:
+            raw = r.hgetall(PX_KEY) or {}
+            items = ((_decode(k), v) for k, v in raw.items())
+        else:
+            syms = list(symbols)
+            if not syms:
+                return {}
+            items = zip(syms, r.hmget(PX_KEY, syms))
+    except Exception as e:
+        redis_client.report_redis_error(e, r)
+        return {}
+
+    out = {}
+    for sym, raw in items:
+        rec = unpack(raw)
+        if rec is not None:
+            out[sym] = rec
+    return out
+
+
+def changes_since(seq: int) -> Tuple[int, Dict[str, dict]]:
+    """
+    (head_seq, {symbol: rec}) for every symbol written after `seq`.
+
+    head is the highest ZSET score actually read, never a seq taken from the
+    hash: a batch landing between ZRANGEBYSCORE and HMGET can leave newer
+    values in the hash for symbols this call did not list, and advancing the
+    cursor past them would skip those symbols for good.
+    """
+    r = redis_client.get_redis()
+    if not r:
+        return seq, {}
+    try:
+        scored = r.zrangebyscore(SEQ_KEY, f"({int(seq)}", "+inf", withscores=True)
+        if not scored:
+            return seq, {}
+        syms = [_decode(s) for s, _score in scored]
+        raws = r.hmget(PX_KEY, syms)
+    except Exception as e:
+        redis_client.report_redis_error(e, r)
+        return seq, {}
+
+    out = {}
+    for sym, raw in zip(syms, raws):
+        rec = unpack(raw)
+        if rec is not None:
+            out[sym] = rec
+    head = max(int(score) for _s, score in scored)
+    return head, out
+
+
+# ------------------------ READ (async) ------------------------
+async def snapshot_async(symbols: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    r = await redis_client_async.get_redis_async()
+    if not r:
+        return {}
+    try:
+        if symbols is None:
+            raw = await r.hgetall(PX_KEY) or {}
+            items = ((_decode(k), v) for k, v in raw.items())
+        else:
+            syms = list(symbols)
+            if not syms:
+                return {}
+            items = zip(syms, await r.hmget(PX_KEY, syms))
+    except Exception as e:
+        redis_client_async.report_redis_error(e, r)
+        return {}
+
+    out = {}
+    for sym, raw in items:
+        rec = unpack(raw)
+        if rec is not None:
+            out[sym] = rec
+    return out
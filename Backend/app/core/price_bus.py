@@ -0,0 +1,61 @@
+# price_bus.py
+"""
+One in-process bus for live price events, whichever path they arrive on.
+
+Producers:
+ - the "ws:<identity>" tick stream consumer started in app.main (real time,
+   every few ms; one consumer group per process on ltp:stream)
+ - the DB flusher after each commit (fallback when Redis missed a tick)
+
+Every event carries the seq assigned ONCE in on_data_callback
+(app.core.ltp_store.next_seq), so the same price change has the same seq on
+both paths and subscribers (the websocket broadcaster) can drop anything
+they have already delivered.
+"""
+
+import threading
+from typing import Callable, List, Optional
+
+
+class PriceEvent:
+    __slots__ = ("symbol", "ltp", "ts", "seq")
+
+    def __init__(self, symbol: str, ltp: float, ts: Optional[int] = None, seq: Optional[int] = None):
+        self.symbol = symbol
+        self.ltp = ltp
+        self.ts = ts        # exchange timestamp, ms since epoch
+        self.seq = seq      # per-tick version, µs since epoch at receipt
+
+    def __repr__(self) -> str:
+        return f"PriceEvent({self.symbol!r}, {self.ltp!r}, ts={self.ts!r}, seq={self.seq!r})"
+
+
+PriceListener = Callable[[PriceEvent], None]
+
+
+class PriceBus:
+    def __init__(self):
+        self._listeners: List[PriceListener] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, cb: PriceListener):
+        with self._lock:
+            if cb not in self._listeners:
+                self._listeners = self._listeners + [cb]
+
+    def unsubscribe(self, cb: PriceListener):
+        with self._lock:
+            self._listeners = [fn for fn in self._listeners if fn != cb]
+
+    def publish(self, event: PriceEvent):
+        """Safe from any thread; a failing listener never affects the others."""
+        self.published += 1
+        for cb in self._listeners:
+            try:
+                cb(event)
+            except Exception:
+                pass
+
+
+price_bus = PriceBus()
@@ -0,0 +1,312 @@
+# tick_stream.py
+"""
+Durable tick log on a Redis Stream (the opt-in pub/sub `ltp_updates` is fire-and-forget).
+
+    ltp:stream   XADD * s=<symbol> p=<price> t=<exch_ts_ms> q=<seq>
+                 MAXLEN ~ TICK_STREAM_MAXLEN
+
+The tick writer appends in the same pipeline as the LTP hash. Readers:
+ - StreamConsumer: consumer-group reader in a thread. A reader that drops
+   off (Redis restart, network blip) resumes from the group's last
+   delivered id, so nothing published in between is lost. Un-acked entries
+   stay pending and can be re-read or claimed by another process.
+     * websocket broadcaster: one group per process ("ws:<identity>");
+       groups whose consumers all went quiet (killed processes) are
+       removed by reap_idle_groups() on startup
+     * DB flusher: shared group "ltp:db", acked only after the DB commit
+ - replay(seconds): latest tick per symbol over the last N seconds, used
+   to give a new websocket client a full picture immediately.
+ - read_range(): plain XRANGE paging (bar aggregation, backfills).
+
+Entry ids are "<ms>-<n>", so time windows map directly onto id ranges.
+"""
+
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis_client
+from redis_client import get_redis
+
+STREAM_KEY = "ltp:stream"
+TICK_STREAM_MAXLEN = int(os.getenv("TICK_STREAM_MAXLEN", "200000"))
+# upper bound for replay(); clients cannot ask for more
+TICK_REPLAY_SECONDS = float(os.getenv("TICK_REPLAY_SECONDS", "60"))
+# a group whose consumers have all been idle this long belongs to a dead process
+TICK_GROUP_REAP_IDLE_MS = int(os.getenv("TICK_GROUP_REAP_IDLE_MS", str(10 * 60 * 1000)))
+# must stay below REDIS_SOCKET_TIMEOUT or the blocking read times out
+STREAM_BLOCK_MS = int(os.getenv("TICK_STREAM_BLOCK_MS", "1000"))
+
+# (entry_id, {"symbol", "ltp", "ts", "seq"})
+StreamEntry = Tuple[str, dict]
+StreamHandler = Callable[[List[StreamEntry]], bool]
+
+
+def _s(v) -> str:
+    return v.decode() if isinstance(v, (bytes, bytearray)) else str(v)
+
+
+# ------------------------ WRITE ------------------------
+def append_many(pipe, updates):
+    """Queue one XADD per (symbol, price, exch_ts, seq) on an existing pipeline."""
+    for sym, price, ts, seq in updates:
+        pipe.xadd(
+            STREAM_KEY,
+            {"s": sym, "p": price, "t": ts or 0, "q": seq},
+            maxlen=TICK_STREAM_MAXLEN,
+            approximate=True,
+        )
+
+
+# ------------------------ DECODE ------------------------
+def decode(fields) -> Optional[dict]:
+    try:
+        f = {_s(k): v for k, v in fields.items()}
+        return {
+            "symbol": _s(f["s"]),
+            "ltp": float(_s(f["p"])),
+            "ts": int(_s(f.get("t", 0))) or None,
+            "seq": int(_s(f["q"])),
+        }
+    except Exception:
+        return None
+
+
+def _decode_entries(raw) -> List[StreamEntry]:
+    out = []
+    for entry_id, fields in raw or []:
+        rec = decode(fields)
+        if rec is not None:
+            out.append((_s(entry_id), rec))
+    return out
+
+
+def id_for_time(ms: int) -> str:
+    return f"{int(ms)}-0"
+
+
+# ------------------------ RANGE READS ------------------------
+def read_range(start: str = "-", end: str = "+", count: Optional[int] = None) -> List[StreamEntry]:
+    r = get_redis()
+    if not r:
+        return []
+    try:
+        return _decode_entries(r.xrange(STREAM_KEY, min=start, max=end, count=count))
+    except Exception as e:
+        redis_client.report_redis_error(e, r)
+        return []
+
+
+def replay(seconds: float = TICK_REPLAY_SECONDS, page: int = 5000) -> Dict[str, dict]:
+    """Latest tick per symbol over the last `seconds` (paged XRANGE, capped at TICK_REPLAY_SECONDS)."""
+    seconds = min(float(seconds), TICK_REPLAY_SECONDS)
+    if seconds <= 0:
+        return {}
+    start = id_for_time(time.time() * 1000 - seconds * 1000)
+    latest: Dict[str, dict] = {}
+
+    while True:
+        entries = read_range(start, "+", count=page)
+        for _id, rec in entries:
+            prev = latest.get(rec["symbol"])
+            if prev is None or rec["seq"] >= prev["seq"]:
+                latest[rec["symbol"]] = rec
+        if len(entries) < page:
+            return latest
+        start = "(" + entries[-1][0]
+
+
+# ------------------------ CONSUMER GROUPS ------------------------
+def reap_idle_groups(prefix: str, idle_ms: int = TICK_GROUP_REAP_IDLE_MS, keep: Optional[str] = None) -> List[str]:
+    """
+    Destroy `prefix*` groups none of whose consumers has read for `idle_ms`
+    (a live StreamConsumer polls every STREAM_BLOCK_MS). Returns the names.
+    A group with no consumers yet counts as idle; if a starting process
+    loses it, its consumer recreates the group on the next read.
+    """
+    r = get_redis()
+    if not r:
+        return []
+
+    reaped = []
+    try:
+        for info in r.xinfo_groups(STREAM_KEY):
+            name = _s(info.get("name", ""))
+            if not name.startswith(prefix) or name == keep:
+                continue
+            consumers = r.xinfo_consumers(STREAM_KEY, name)
+            if any(int(c.get("idle", 0)) < idle_ms for c in consumers):
+                continue
+            r.xgroup_destroy(STREAM_KEY, name)
+            reaped.append(name)
+    except Exception as e:
+        if "no such key" not in str(e).lower():
+            redis_client.report_redis_error(e, r)
+
+    if reaped:
+        print(f"[TickStream] reaped {len(reaped)} idle consumer groups: {', '.join(reaped)}")
+    return reaped
+
+
+class StreamConsumer:
+    """
+    XREADGROUP loop in a daemon thread.
+
+    handler(entries) -> bool: True acks the batch at once; False leaves it
+    pending for the owner to ack() later (e.g. after a DB commit).
+    `active` gates reading (leader-only consumers). `claim_idle_ms` takes over
+    entries left pending by a dead consumer of the same group.
+    """
+
+    def __init__(
+        self,
+        group: str,
+        consumer: str,
+        handler: StreamHandler,
+        start_id: str = "$",
+        count: int = 1000,
+        block_ms: int = STREAM_BLOCK_MS,
+        claim_idle_ms: Optional[int] = None,
+        active: Optional[Callable[[], bool]] = None,
+    ):
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        self.start_id = start_id
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.active = active or (lambda: True)
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._group_ready = False
+        self._read_backlog = True     # re-read own pending entries first
+
+        self.entries_read = 0
+        self.entries_acked = 0
+        self.entries_claimed = 0
+        self.errors = 0
+
+    # ------------------------ LIFECYCLE ------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"stream-{self.group}", daemon=True)
+        self._thread.start()
+
+    def stop(self, destroy_group: bool = False):
+        self._stop.set()
+        if not destroy_group:
+            return
+        r = get_redis()
+        if not r:
+            return
+        try:
+            r.xgroup_destroy(STREAM_KEY, self.group)
+        except Exception as e:
+            redis_client.report_redis_error(e, r)
+
+    # ------------------------ ACK / REDELIVERY ------------------------
+    def ack(self, ids: List[str]) -> bool:
+        if not ids:
+            return True
+        r = get_redis()
+        if not r:
+            return False
+        try:
+            self.entries_acked += r.xack(STREAM_KEY, self.group, *ids) or 0
+            return True
+        except Exception as e:
+            redis_client.report_redis_error(e, r)
+            return False
+
+    def request_redelivery(self):
+        """Deliver this consumer's un-acked entries again on the next read."""
+        self._read_backlog = True
+
+    # ------------------------ LOOP ------------------------
+    def _ensure_group(self, r):
+        if self._group_ready:
+            return
+        try:
+            r.xgroup_create(STREAM_KEY, self.group, id=self.start_id, mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def _claim(self, r):
+        if not self.claim_idle_ms:
+            return
+        _next, raw, *_rest = r.xautoclaim(
+            STREAM_KEY, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.count,
+        )
+        self.entries_claimed += len(raw or [])
+
+    def _read(self, r) -> List[StreamEntry]:
+        if self._read_backlog:
+            # claimed entries move into our own pending list, so the "0"
+            # read below delivers them together with our un-acked ones
+            self._claim(r)
+            resp = r.xreadgroup(self.group, self.consumer, {STREAM_KEY: "0"}, count=self.count)
+            backlog = _decode_entries(resp[0][1]) if resp else []
+            if len(backlog) < self.count:
+                self._read_backlog = False
+            if backlog:
+                return backlog
+
+        resp = r.xreadgroup(
+            self.group, self.consumer, {STREAM_KEY: ">"},
+            count=self.count, block=self.block_ms,
+        )
+        return _decode_entries(resp[0][1]) if resp else []
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.active():
+                self._read_backlog = True
+                self._stop.wait(1)
+                continue
+
+            r = get_redis()
+            if not r:
+                self._stop.wait(1)
+                continue
+
+            try:
+                self._ensure_group(r)
+                entries = self._read(r)
+            except Exception as e:
+                self.errors += 1
+                self._group_ready = False     # group may be gone after a Redis restart
+                self._read_backlog = True
+                redis_client.report_redis_error(e, r)
+                self._stop.wait(1)
+                continue
+
+            if not entries:
+                continue
+
+            self.entries_read += len(entries)
+            try:
+                if self.handler(entries):
+                    self.ack([entry_id for entry_id, _rec in entries])
+            except Exception as e:
+                self.errors += 1
+                print(f"[TickStream:{self.group}] handler error: {e}")
+                self._read_backlog = True
+                self._stop.wait(1)
+
+    def stats(self) -> dict:
+        return {
+            "group": self.group,
+            "consumer": self.consumer,
+            "entries_read": self.entries_read,
+            "entries_acked": self.entries_acked,
+            "entries_claimed": self.entries_claimed,
+            "errors": self.errors,
+        }
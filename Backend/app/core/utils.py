@@ -34,3 +34,10 @@ def load_credentials(broker_name):
     with open(CREDENTIALS_FILE, "r") as f:
         data = json.load(f)
     return data.get(broker_name)
+
+
+def safe_float(v) -> float:
+    try:
+        return float(str(v))
+    except Exception:
+        return 0.0
@@ -1,12 +1,13 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import func, tuple_
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
+import base64
+import json
 
 # ✅ Use the safe redis helpers (NO redis_client)
 from redis_client import (
     get_redis,
-    redis_safe_get,
     redis_safe_set,
     redis_safe_json_get,
     redis_safe_json_set
@@ -14,40 +15,30 @@ from redis_client import (
 
 from . import models
 from . import schemas
+from . import sync_engine
+from .core.utils import safe_float
 
 
 # ------------------------------------------------------
-# Small helper
+# Display numbers
 # ------------------------------------------------------
-def safe_float(v) -> float:
-    try:
-        return float(str(v))
-    except Exception:
-        return 0.0
+# IDs are stable (never renumbered). The contiguous 1..N number the UI shows
+# is computed at read time: row_number() OVER (ORDER BY id), attached to each
+# returned object as `display_no`.
+def _display_no(model):
+    return func.row_number().over(order_by=model.id).label("display_no")
 
 
-# ------------------------------------------------------
-# Reset IDs
-# ------------------------------------------------------
-def reset_ids(db: Session, table_model, table_name: str):
-    rows = db.query(table_model).order_by(table_model.id).all()
-    next_id = 1
+def _attach_display_no(rows) -> list:
+    out = []
+    for obj, display_no in rows:
+        obj.display_no = display_no
+        out.append(obj)
+    return out
 
-    for r in rows:
-        try:
-            r.id = next_id
-        except Exception:
-            pass
-        next_id += 1
-
-    db.commit()
 
-    seq_name = f"public.{table_name}_id_seq"
-    try:
-        db.execute(text(f"ALTER SEQUENCE {seq_name} RESTART WITH {next_id}"))
-        db.commit()
-    except Exception:
-        db.rollback()
+def account_display_no(db: Session, account: models.Account) -> int:
+    return db.query(func.count(models.Account.id)).filter(models.Account.id <= account.id).scalar() or 0
 
 
 # =========================
@@ -92,12 +83,7 @@ def create_account(db: Session, acc: schemas.AccountCreate):
     # Save balance in Redis safely
     redis_safe_set(f"balance:{new_acc.account_number}", new_acc.current_balance)
 
-    # Reset IDs
-    try:
-        reset_ids(db, models.Account, "accounts")
-    except Exception:
-        db.rollback()
-
+    new_acc.display_no = account_display_no(db, new_acc)
     return new_acc
 
 
@@ -113,6 +99,11 @@ def list_accounts(db: Session):
     return db.query(models.Account).order_by(models.Account.id).all()
 
 
+def list_accounts_numbered(db: Session) -> List[models.Account]:
+    rows = db.query(models.Account, _display_no(models.Account)).order_by(models.Account.id).all()
+    return _attach_display_no(rows)
+
+
 def update_account(db: Session, account: models.Account, data: dict):
     for k, v in data.items():
         if v is not None:
@@ -137,6 +128,7 @@ def delete_account(db: Session, account: models.Account):
         db.query(models.Transaction).filter(
             models.Transaction.account_id == full_acc_no
         ).delete(synchronize_session=False)
+        sync_engine.delete_checkpoints(db, full_acc_no)
         db.commit()
     except Exception:
         db.rollback()
@@ -157,17 +149,6 @@ def delete_account(db: Session, account: models.Account):
     except Exception:
         pass
 
-    # Reset both tables
-    try:
-        reset_ids(db, models.Account, "accounts")
-    except Exception:
-        db.rollback()
-
-    try:
-        reset_ids(db, models.Transaction, "transactions")
-    except Exception:
-        db.rollback()
-
 
 # =========================
 # INSERT RAW TRANSACTION
@@ -230,11 +211,6 @@ def insert_raw_transaction(db: Session, txn: schemas.TransactionCreate):
         db.commit()
         db.refresh(new_txn)
 
-        try:
-            reset_ids(db, models.Transaction, "transactions")
-        except Exception:
-            db.rollback()
-
         return new_txn
 
     # -------------------------------------------
@@ -264,11 +240,6 @@ def insert_raw_transaction(db: Session, txn: schemas.TransactionCreate):
     db.commit()
     db.refresh(new_txn)
 
-    try:
-        reset_ids(db, models.Transaction, "transactions")
-    except Exception:
-        db.rollback()
-
     return new_txn
 
 
@@ -283,134 +254,176 @@ def process_single_transaction(db: Session, txn: models.Transaction):
     if acc is None:
         raise ValueError("Account not found")
 
-    created_txns = []
-
-    # ==========================================
-    # 1️⃣ Find previous transaction by timestamp
-    # ==========================================
-    prev_txn = (
-        db.query(models.Transaction)
-        .filter(models.Transaction.account_id == acc.account_number)
-        .filter(models.Transaction.sms_timestamp < txn.sms_timestamp)
-        .order_by(models.Transaction.sms_timestamp.desc())
-        .first()
-    )
+    # one ordered pass syncs every unsynced transaction of the account
+    return sync_engine.sync_account(db, acc)
 
-    prev_balance = 0.0
-    if prev_txn and prev_txn.balance_after_txn is not None:
-        prev_balance = safe_float(prev_txn.balance_after_txn)
-    else:
-        # fallback to account balance
-        prev_balance = safe_float(redis_safe_get(f"balance:{acc.account_number}") or acc.current_balance)
-
-    amount = safe_float(txn.amount)
-    expected_balance = prev_balance - amount if txn.type == "debit" else prev_balance + amount
-
-    # ==========================================
-    # 2️⃣ Mismatch handling if SMS has balance
-    # ==========================================
-    if txn.sms_balance is not None:
-        sms_bal = safe_float(txn.sms_balance)
-
-        if abs(expected_balance - sms_bal) > 0.01:
-            diff = expected_balance - sms_bal
-            missing_type = "debit" if diff > 0 else "credit"
-            base_ts = txn.sms_timestamp if txn.sms_timestamp is not None else txn.txn_datetime.timestamp()
-            auto_timestamp = base_ts - 1
-
-            auto_txn = models.Transaction(
-                account_id=acc.account_number,
-                bankName=acc.bank_name,
-                sms_account_number=None,
-                type=missing_type,
-                amount=abs(diff),
-                mode="auto",
-                reference_id=None,
-                description="Auto-generated missing transaction",
-                txn_datetime=datetime.utcnow(),
-                sms_timestamp=auto_timestamp,  # ensure order
-                balance_after_txn=sms_bal,
-                sms_balance=None,
-                is_auto_generated=True,
-                isSynced=True
-            )
-
-            db.add(auto_txn)
-            db.commit()
-            db.refresh(auto_txn)
-            created_txns.append(auto_txn)
-
-        final_balance = sms_bal
-    else:
-        final_balance = expected_balance
 
-    # ==========================================
-    # 3️⃣ Update current txn
-    # ==========================================
-    txn.balance_after_txn = final_balance
-    txn.isSynced = True
-    db.commit()
-    db.refresh(txn)
-
-    # ==========================================
-    # 4️⃣ Recalculate all future transactions
-    # ==========================================
-    future_txns = (
-        db.query(models.Transaction)
-        .filter(models.Transaction.account_id == acc.account_number)
-        .filter(models.Transaction.sms_timestamp > txn.sms_timestamp)
-        .order_by(models.Transaction.sms_timestamp.asc())
-        .all()
-    )
+def process_all_unsynced_transactions(db: Session):
+    return sync_engine.sync_all(db)
 
-    running_balance = final_balance
-    for ft in future_txns:
-        amt = safe_float(ft.amount)
-        running_balance = running_balance - amt if ft.type == "debit" else running_balance + amt
-        ft.balance_after_txn = running_balance
-        db.add(ft)
 
-    # Update account final balance
-    acc.current_balance = running_balance
-    acc.updated_at = datetime.utcnow()
+def get_balance_as_of(db: Session, account_number: str, as_of: datetime) -> Optional[float]:
+    return sync_engine.balance_as_of(db, account_number, as_of)
 
-    db.commit()
 
-    # ==========================================
-    # 5️⃣ Update redis
-    # ==========================================
-    redis_safe_set(f"balance:{acc.account_number}", running_balance)
+# =========================
+# FETCH TRANSACTIONS
+# =========================
+def _numbered_transactions_query(db: Session, account_number: Optional[str] = None):
+    T = models.Transaction
+
+    # numbered over the whole table, so a row keeps its number in every listing
+    # (reads every row; the paged listings below skip display_no for that reason)
+    numbered = db.query(T.id.label("numbered_id"), _display_no(T)).subquery()
 
-    created_txns.append(txn)
-    return created_txns
+    q = (
+        db.query(T, numbered.c.display_no)
+        .join(numbered, numbered.c.numbered_id == T.id)
+        .filter(T.isSynced == True)
+    )
 
+    if account_number:
+        q = q.filter(T.account_id == account_number)
 
+    return q.order_by(T.txn_datetime.desc())
 
-def process_all_unsynced_transactions(db: Session):
-    unsynced = db.query(models.Transaction).filter(models.Transaction.isSynced == False).all()
-    processed = []
 
-    for txn in unsynced:
-        processed.extend(process_single_transaction(db, txn))
+def get_transactions(db: Session, account_number: Optional[str] = None):
+    return _attach_display_no(_numbered_transactions_query(db, account_number).all())
 
-    try:
-        reset_ids(db, models.Transaction, "transactions")
-    except Exception:
-        db.rollback()
 
-    return processed
+def get_all_transactions_numbered(db: Session) -> List[models.Transaction]:
+    """Every transaction (synced or not), newest first, with display_no."""
+    T = models.Transaction
+    rows = db.query(T, _display_no(T)).order_by(T.txn_datetime.desc()).all()
+    return _attach_display_no(rows)
 
 
 # =========================
-# FETCH TRANSACTIONS
+# PAGED / STREAMED TRANSACTIONS
 # =========================
-def get_transactions(db: Session, account_number: Optional[str] = None):
-    q = db.query(models.Transaction).filter(models.Transaction.isSynced == True)
+# Keyset pagination over (txn_datetime DESC, id DESC): every page is one
+# index range scan (ix_transactions_account_txn_dt / ix_transactions_txn_dt)
+# no matter how deep. Paged and streamed rows carry no display_no, since
+# numbering them would scan the whole table for each page.
+PAGE_SIZE_MAX = 500
+EXPORT_BATCH = 1000
+
+TRANSACTION_COLUMNS = (
+    "id", "account_id", "sms_account_number", "bankName", "type", "amount",
+    "mode", "reference_id", "txn_datetime", "sms_timestamp", "sms_formatted_datetime",
+    "sms_balance", "balance_after_txn", "is_auto_generated", "isSynced",
+    "description", "created_at",
+)
+
+
+def encode_cursor(txn_datetime: datetime, txn_id: int) -> str:
+    raw = f"{txn_datetime.isoformat()}|{txn_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, txn_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(txn_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+def _transactions_query(
+    db: Session,
+    *entities,
+    account_number: Optional[str] = None,
+    synced_only: bool = True,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    txn_type: Optional[str] = None,
+):
+    T = models.Transaction
+    q = db.query(*entities)
+
+    if synced_only:
+        q = q.filter(T.isSynced == True)
     if account_number:
-        q = q.filter(models.Transaction.account_id == account_number)
+        q = q.filter(T.account_id == account_number)
+    if date_from:
+        q = q.filter(T.txn_datetime >= date_from)
+    if date_to:
+        q = q.filter(T.txn_datetime <= date_to)
+    if txn_type:
+        q = q.filter(T.type == txn_type.lower())
+
+    return q.order_by(T.txn_datetime.desc(), T.id.desc())
+
+
+def _transactions_page_query(db: Session, limit: int, after: Optional[Tuple[datetime, int]] = None, **filters):
+    """`limit` rows newest-first, strictly after the (txn_datetime, id) key `after`."""
+    T = models.Transaction
+    q = _transactions_query(db, T, **filters)
+    if after is not None:
+        q = q.filter(tuple_(T.txn_datetime, T.id) < after)
+    return q.limit(limit)
+
+
+def get_transactions_page(
+    db: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    **filters,
+) -> Tuple[List[models.Transaction], Optional[str]]:
+    """One page newest-first plus the cursor for the next one (None at the end)."""
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+    after = decode_cursor(cursor) if cursor else None
+
+    rows = _transactions_page_query(db, limit + 1, after, **filters).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.txn_datetime, last.id)
+
+
+def iter_transactions(db: Session, **filters) -> Iterator[dict]:
+    """
+    Every matching row newest-first as a plain dict, read through a
+    server-side cursor in EXPORT_BATCH chunks, so memory stays flat.
+    """
+    T = models.Transaction
+    q = _transactions_query(db, *(getattr(T, c) for c in TRANSACTION_COLUMNS), **filters)
+    q = q.execution_options(stream_results=True, yield_per=EXPORT_BATCH)
+
+    for row in q:
+        yield dict(zip(TRANSACTION_COLUMNS, row))
+
+
+def iter_transactions_ndjson(db: Session, **filters) -> Iterator[str]:
+    for row in iter_transactions(db, **filters):
+        yield json.dumps(row, default=_json_default) + "\n"
+
+
+def stream_transactions_ndjson(**filters) -> Iterator[str]:
+    """
+    iter_transactions_ndjson on a session of its own, for StreamingResponse:
+    the body is produced after the handler returns, when a request-scoped
+    session would already be closed.
+    """
+    # imported here: app.db builds the engine from DB_* env on import
+    from .db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield from iter_transactions_ndjson(db, **filters)
+    finally:
+        db.close()
+
 
-    return q.order_by(models.Transaction.txn_datetime.desc()).all()
+def _json_default(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return str(v)
 
 
 # =========================
@@ -418,6 +431,7 @@ def get_transactions(db: Session, account_number: Optional[str] = None):
 # =========================
 def delete_all_transactions(db: Session):
     db.query(models.Transaction).delete(synchronize_session=False)
+    sync_engine.delete_checkpoints(db)
     db.commit()
 
 
@@ -425,5 +439,6 @@ def delete_transactions_for_account(db: Session, account_number: str):
     db.query(models.Transaction).filter(
         models.Transaction.account_id == account_number
     ).delete(synchronize_session=False)
+    sync_engine.delete_checkpoints(db, account_number)
 
     db.commit()
@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from .models import Base
+from .Database.migrations import apply_migrations
 
 load_dotenv()
 
@@ -31,3 +32,5 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def create_tables():
    
     Base.metadata.create_all(bind=engine)
+    # indexes / changes to tables that already exist
+    apply_migrations(engine)
@@ -1,31 +1,31 @@
 # app/main.py
+import asyncio
 import threading
 import time
-import json
-from datetime import datetime
 import traceback
-from typing import List
+from typing import Dict, List, Optional
 
 from websocket_angelone.token_updater import TokenRefresher
 from websocket_angelone.worker import (
     WebSocketWorker,
     start_scheduler,
-    register_ltp_listener,
-    update_holdings_batch,
+    sync_market_mode,
+    disable_market_mode,
+    start_ltp_flusher,
+    start_db_stream_consumer,
 )
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 
 from app.db import create_tables, SessionLocal
+from app.Database.database_util import get_holdings_from_db
 
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
 
 from sqlalchemy import text
 
-# Use runtime redis getter (resilient)
-from redis_client import get_redis, redis_safe_json_get
-
 # Routers
 from app.routers import user_router
 from app.routers.broker_routes import router as broker_router
@@ -35,6 +35,15 @@ from app.routers.account_route import router as account_router
 from app.routers.live_updater_routes import router as live_updater_routes
 from app.routers.AI_Model_Analysis_route import router as AI_Model_Analysis_route
 
+# Live LTP fan-out (runs on this app's event loop)
+from app.core.ltp_broadcaster import broadcaster
+from app.core import ltp_store, tick_stream
+from app.core.tick_stream import StreamConsumer, StreamEntry
+from app.core.price_bus import PriceEvent, price_bus
+
+# Multi-process: one elected leader ingests, every process serves
+from app.core.leader import leader
+
 # Sync engine
 from app.crud import process_all_unsynced_transactions
 
@@ -86,120 +95,78 @@ def db_status():
 # -------------------------------------------------------
 # WEBSOCKET (Frontend LTP Updates)
 # -------------------------------------------------------
-connected_clients: List[WebSocket] = []
-_connected_clients_lock = threading.RLock()
-
-
 @app.websocket("/ws/stocks")
 async def ws_endpoint(ws: WebSocket):
     await ws.accept()
-    with _connected_clients_lock:
-        connected_clients.append(ws)
+    # ?encoding=json|msgpack|struct (json if missing/unavailable)
+    await broadcaster.register(ws, ws.query_params.get("encoding"))
+    # initial state: current price per symbol (one HGETALL on ltp:px)
+    await broadcaster.snapshot(ws)
+    # ?replay=N: also the latest tick per symbol from the last N seconds of the
+    # tick stream (capped at TICK_REPLAY_SECONDS)
+    await broadcaster.replay(ws, ws.query_params.get("replay", 0))
     try:
-        # keep connection alive — we don't expect client messages
+        # client control messages: subscribe / unsubscribe (see ltp_broadcaster)
         while True:
-            await ws.receive_text()
+            text = await ws.receive_text()
+            reply = await broadcaster.handle_message(ws, text)
+            if reply is not None:
+                await ws.send_json(reply)
     except WebSocketDisconnect:
-        with _connected_clients_lock:
-            try:
-                connected_clients.remove(ws)
-            except Exception:
-                pass
+        pass
     except Exception:
-        # unexpected error — ensure removal
-        with _connected_clients_lock:
-            try:
-                connected_clients.remove(ws)
-            except Exception:
-                pass
+        # unexpected error — ensure removal below
+        pass
+    finally:
+        await broadcaster.unregister(ws)
 
 
-def push_ltp_update(symbol: str, ltp: float):
-    """Send real-time LTP to all websocket clients."""
-    message = {"symbol": symbol, "Ltp": ltp}
+async def _broker_symbols(broker: str) -> List[str]:
+    """Symbol group for {"action": "subscribe", "broker": ...}."""
+    rows = await run_in_threadpool(get_holdings_from_db, broker.lower())
+    return [r["symbol"] for r in rows if r.get("symbol")]
 
-    import asyncio
 
-    async def _send():
-        remove = []
-        with _connected_clients_lock:
-            clients = list(connected_clients)
-        for ws in clients:
-            try:
-                await ws.send_json(message)
-            except Exception:
-                remove.append(ws)
+broadcaster.group_resolver = _broker_symbols
 
-        if remove:
-            with _connected_clients_lock:
-                for ws in remove:
-                    try:
-                        connected_clients.remove(ws)
-                    except Exception:
-                        pass
 
-    # run async send in separate thread so caller (worker) is not blocked
-    threading.Thread(target=lambda: asyncio.run(_send()), daemon=True).start()
+def push_ltp_update(symbol: str, ltp: float, ts: Optional[int] = None, seq: Optional[int] = None):
+    """Send real-time LTP to all websocket clients (safe from any thread)."""
+    price_bus.publish(PriceEvent(symbol, ltp, ts, seq))
 
 
-# Worker will call this to send updates
-register_ltp_listener(push_ltp_update)
+# Every price path (ws:<identity> stream consumer, worker DB flush) ends on the bus;
+# the broadcaster dedupes by seq so each change goes out once.
+price_bus.subscribe(broadcaster.publish_event)
 
 
 # -------------------------------------------------------
-# REDIS PUB/SUB LISTENER → NOTIFY WEBSOCKET
+# REDIS TICK STREAM → NOTIFY WEBSOCKET
 # -------------------------------------------------------
-def redis_ltp_listener():
-    """
-    Listen for Redis LTP updates and push to WebSocket instantly.
-    Resilient: retries when Redis is down and continues when recovered.
-    """
-    while True:
-        r = get_redis()
-        if not r:
-            
-            time.sleep(5)
-            continue
-
-        try:
-            # ignore_subscribe_messages=True to avoid subscribe join messages
-            pubsub = r.pubsub(ignore_subscribe_messages=True)
-            pubsub.subscribe("ltp_updates")
-            # print("[Redis] Listening for LTP updates...")
-
-            for msg in pubsub.listen():
-                try:
-                    # msg example: {'type': 'message', 'channel': b'ltp_updates', 'data': b'...'}
-                    if not msg or msg.get("type") != "message":
-                        continue
+def _forward_ticks(entries: List[StreamEntry]) -> bool:
+    for _id, rec in entries:
+        push_ltp_update(rec["symbol"], rec["ltp"], rec["ts"], rec["seq"])
+    return True
+
+
+# One consumer group per process: every process sees every tick, and a
+# reconnect resumes from the last delivered entry instead of losing the gap.
+# Groups left behind by killed processes are reaped on startup.
+WS_GROUP_PREFIX = "ws:"
+ws_stream_consumer = StreamConsumer(
+    group=f"{WS_GROUP_PREFIX}{leader.identity}",
+    consumer=leader.identity,
+    handler=_forward_ticks,
+    start_id="$",
+)
 
-                    raw = msg.get("data")
-                    if isinstance(raw, (bytes, bytearray)):
-                        raw = raw.decode("utf-8", errors="ignore")
 
-                    if isinstance(raw, str):
-                        data = json.loads(raw)
-                    else:
-                        # unexpected type, skip
-                        continue
+async def _replay_ticks(seconds: float) -> Dict[str, dict]:
+    return await run_in_threadpool(tick_stream.replay, seconds)
 
-                    symbol = data.get("symbol")
-                    ltp = data.get("ltp")
-                    if symbol is None or ltp is None:
-                        continue
 
-                    push_ltp_update(symbol, ltp)
-
-                except Exception as e:
-                    print(f"[Redis Listener msg error] {e} — continuing")
-                    # continue listening
-            # if pubsub.listen() exits, try reconnect
-            print("[Redis Listener] pubsub.listen() returned — reconnecting")
-            time.sleep(1)
-
-        except Exception as e:
-            # print(f"[Redis Listener] error: {e} — will retry in 3s")
-            time.sleep(3)
+broadcaster.replay_source = _replay_ticks
+broadcaster.snapshot_source = ltp_store.snapshot_async
 
 
 # -------------------------------------------------------
@@ -207,21 +174,31 @@ def redis_ltp_listener():
 # -------------------------------------------------------
 # Keep single worker instance
 _worker_instance: WebSocketWorker | None = None
+_scheduler = None
+_leader_services_started = False
+_leader_services_lock = threading.Lock()
 
 
-@app.on_event("startup")
-def on_startup():
-    global _worker_instance
+def _start_leader_services():
+    """
+    Ingestion, scheduling, DB flush, token refresh and transaction sync.
+    Runs in the elected leader only (see app.core.leader); the loops below
+    idle while this process is a follower, so re-election just resumes them.
+    """
+    global _worker_instance, _scheduler, _leader_services_started
 
-    try:
-        create_tables()
-    except Exception as e:
-        print(f"[startup] create_tables error: {e} — continuing")
+    with _leader_services_lock:
+        if _leader_services_started:
+            if _scheduler is not None:
+                _scheduler.resume()
+            sync_market_mode()
+            return
+        _leader_services_started = True
 
     # Token refresher
     def start_token_refresher():
         try:
-            TokenRefresher().run_forever()
+            TokenRefresher().run_forever(active=lambda: leader.is_leader)
         except Exception:
             print("[TokenRefresher] crashed:\n", traceback.format_exc())
 
@@ -229,34 +206,29 @@ def on_startup():
 
     # Scheduler
     try:
-        start_scheduler()
+        _scheduler = start_scheduler()
     except Exception:
         print("[startup] start_scheduler error:\n", traceback.format_exc())
 
     # SmartAPI WebSocket worker (singleton)
     try:
         if _worker_instance is None:
-            _worker_instance = WebSocketWorker()
-            threading.Thread(target=_worker_instance.run, daemon=True).start()
-        else:
-            # best-effort to ensure worker runs after reload
-            threading.Thread(target=_worker_instance.run, daemon=True).start()
+            _worker_instance = WebSocketWorker(active=lambda: leader.is_leader)
+        threading.Thread(target=_worker_instance.run, daemon=True).start()
     except Exception:
         print("[startup] WebSocketWorker start error:\n", traceback.format_exc())
 
-    # DB flush loop: drains LTP queue into DB regularly
-    def flush_loop():
-        while True:
-            try:
-                update_holdings_batch()
-            except Exception as e:
-                print(f"[{datetime.now()}] flush_loop error: {e}\n{traceback.format_exc()}")
-            time.sleep(5)
-
-    threading.Thread(target=flush_loop, daemon=True).start()
+    # DB flusher: drains tick_buffer into holding.Ltp (one thread, adaptive cadence)
+    try:
+        start_ltp_flusher(active=lambda: leader.is_leader)
+    except Exception:
+        print("[startup] LTP flusher start error:\n", traceback.format_exc())
 
-    # Redis pub/sub listener (robust)
-    threading.Thread(target=redis_ltp_listener, daemon=True).start()
+    # Tick stream → DB buffer (entries acked after commit)
+    try:
+        start_db_stream_consumer(active=lambda: leader.is_leader)
+    except Exception:
+        print("[startup] tick stream consumer start error:\n", traceback.format_exc())
 
     # Transaction sync on startup
     def startup_sync():
@@ -279,6 +251,8 @@ def on_startup():
         while True:
             try:
                 time.sleep(300)
+                if not leader.is_leader:
+                    continue
                 db = SessionLocal()
                 try:
                     processed = process_all_unsynced_transactions(db)
@@ -295,9 +269,48 @@ def on_startup():
     threading.Thread(target=sync_loop, daemon=True).start()
 
 
+def _pause_leader_services():
+    # worker / flush / token / sync loops check leader.is_leader themselves
+    if _scheduler is not None:
+        try:
+            _scheduler.pause()
+        except Exception:
+            print("[leader] scheduler pause error:\n", traceback.format_exc())
+    disable_market_mode()
+
+
+@app.on_event("startup")
+def on_startup():
+    try:
+        create_tables()
+    except Exception as e:
+        print(f"[startup] create_tables error: {e} — continuing")
+
+    # Every process serves clients from the Redis tick stream
+    tick_stream.reap_idle_groups(WS_GROUP_PREFIX, keep=ws_stream_consumer.group)
+    ws_stream_consumer.start()
+
+    # Only the elected process ingests / schedules / writes
+    leader.on_elected(_start_leader_services)
+    leader.on_demoted(_pause_leader_services)
+    leader.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # hand the feed over immediately instead of waiting for the TTL
+    leader.stop()
+    ws_stream_consumer.stop(destroy_group=True)
+
+
 # -------------------------------------------------------
 # CACHE INIT
 # -------------------------------------------------------
+@app.on_event("startup")
+async def _broadcaster_startup():
+    broadcaster.bind(asyncio.get_running_loop())
+
+
 @app.on_event("startup")
 async def _cache_startup():
     try:
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 
 from sqlalchemy import (
-    String, Integer, Float, TIMESTAMP, JSON, Boolean, Identity, text
+    String, Integer, Float, TIMESTAMP, JSON, Boolean, Identity, text, UniqueConstraint
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.ext.mutable import MutableDict
@@ -104,6 +104,30 @@ class MutualFund(Base):
     )
 
 
+# -----------------------------------------
+# INTRADAY BARS (built from live ticks)
+# -----------------------------------------
+class IntradayBar(Base):
+    __tablename__ = "intraday_bar"
+    __table_args__ = (
+        UniqueConstraint("token", "interval_s", "bar_start", name="uq_intraday_bar_token_interval_start"),
+        {"schema": "public"},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, Identity(start=1, cycle=False), primary_key=True)
+    token: Mapped[str] = mapped_column(String, nullable=False)
+    symbol: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    interval_s: Mapped[int] = mapped_column(Integer, nullable=False)
+    bar_start: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
+
+    open: Mapped[float] = mapped_column(Float, nullable=False)
+    high: Mapped[float] = mapped_column(Float, nullable=False)
+    low: Mapped[float] = mapped_column(Float, nullable=False)
+    close: Mapped[float] = mapped_column(Float, nullable=False)
+    volume: Mapped[float] = mapped_column(Float, default=0.0)
+    ticks: Mapped[int] = mapped_column(Integer, default=0)
+
+
 # -----------------------------------------
 # ACCOUNTS
 # -----------------------------------------
@@ -149,6 +173,8 @@ class Account(Base):
 # -----------------------------------------
 # TRANSACTIONS
 # -----------------------------------------
+# Composite / partial indexes for the sync and listing queries live in
+# app/Database/migrations.py (0001_transaction_indexes).
 class Transaction(Base):
     __tablename__ = "transactions"
     __table_args__ = {"schema": "public"}
@@ -184,3 +210,38 @@ class Transaction(Base):
         server_default=text("now()"),
         default=datetime.utcnow
     )
+
+
+# -----------------------------------------
+# BALANCE CHECKPOINTS
+# -----------------------------------------
+# Running balance of an account at the end of each period (UTC day of
+# sms_timestamp) that has transactions. Written by app.sync_engine; a late
+# transaction marks the checkpoints from its period onward invalid, and they
+# are rebuilt lazily on the next balance-as-of read.
+class BalanceCheckpoint(Base):
+    __tablename__ = "balance_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("account_id", "period_start", name="uq_balance_checkpoint_account_period"),
+        {"schema": "public"},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, Identity(start=1, cycle=False), primary_key=True)
+    account_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+
+    # ms epoch, same unit as Transaction.sms_timestamp
+    period_start: Mapped[float] = mapped_column(Float, nullable=False)
+
+    # last transaction of the period: (sms_timestamp, id) orders the history
+    last_ts: Mapped[float] = mapped_column(Float, nullable=False)
+    last_txn_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    balance: Mapped[float] = mapped_column(Float, nullable=False)
+    is_valid: Mapped[bool] = mapped_column(Boolean, default=True)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP,
+        server_default=text("now()"),
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
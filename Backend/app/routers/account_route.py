@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 # Use runtime-safe getter, NOT redis_client variable
 from redis_client import get_redis
 
 from app.db import SessionLocal
 from app import crud, schemas
+from app.core.utils import safe_float
 
 router = APIRouter(tags=["accounts"])
 
@@ -19,16 +22,6 @@ def get_db():
         db.close()
 
 
-# -----------------------------
-# Safe float
-# -----------------------------
-def safe_float(v):
-    try:
-        return float(str(v))
-    except Exception:
-        return 0.0
-
-
 # -----------------------------
 # Create account
 # -----------------------------
@@ -47,7 +40,7 @@ def create_account(acc: schemas.AccountCreate, db: Session = Depends(get_db)):
 # -----------------------------
 @router.get("/accounts", response_model=List[schemas.AccountResponse])
 def get_all_accounts(db: Session = Depends(get_db)):
-    accounts = crud.list_accounts(db)
+    accounts = crud.list_accounts_numbered(db)
 
     r = get_redis()
     for acc in accounts:
@@ -83,9 +76,27 @@ def get_single_account(account_number: str, db: Session = Depends(get_db)):
         except Exception:
             pass
 
+    account.display_no = crud.account_display_no(db, account)
     return account
 
 
+# -----------------------------
+# Balance as of a date
+# -----------------------------
+@router.get("/accounts/{account_number}/balance")
+def get_balance_as_of(account_number: str, as_of: Optional[datetime] = None, db: Session = Depends(get_db)):
+    account = crud.get_account_by_number(db, account_number)
+    if not account:
+        raise HTTPException(404, "Account not found")
+
+    as_of = as_of or datetime.now()
+    return {
+        "account_number": account_number,
+        "as_of": as_of,
+        "balance": crud.get_balance_as_of(db, account_number, as_of),
+    }
+
+
 # -----------------------------
 # Update account
 # -----------------------------
@@ -96,6 +107,7 @@ def update_account(account_number: str, acc_data: schemas.AccountUpdate, db: Ses
         raise HTTPException(404, "Account not found")
 
     updated = crud.update_account(db, account, acc_data.dict())
+    updated.display_no = crud.account_display_no(db, updated)
     return updated
 
 
@@ -120,6 +132,50 @@ def get_all_transactions(db: Session = Depends(get_db)):
     return crud.get_transactions(db)
 
 
+# -----------------------------
+# Paged transactions (keyset)
+# declared before /transactions/{account_number}
+# -----------------------------
+@router.get("/transactions/page", response_model=schemas.TransactionPage)
+def get_transactions_page(
+    account_number: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=crud.PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        rows, next_cursor = crud.get_transactions_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            account_number=account_number,
+            date_from=date_from,
+            date_to=date_to,
+            txn_type=type,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    return {"data": rows, "next_cursor": next_cursor}
+
+
+# -----------------------------
+# Streaming export (NDJSON)
+# -----------------------------
+@router.get("/transactions/export")
+def export_transactions(
+    account_number: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+):
+    filters = dict(account_number=account_number, date_from=date_from, date_to=date_to, txn_type=type)
+    return StreamingResponse(crud.stream_transactions_ndjson(**filters), media_type="application/x-ndjson")
+
+
 # -----------------------------
 # Transactions for one account
 # -----------------------------
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.db import SessionLocal
-from app.models import Holding, MutualFund
+from app.models import Holding, MutualFund, IntradayBar
 from fastapi.responses import JSONResponse
 
 import websocket_angelone.worker as worker
-from redis_client import get_redis
+from websocket_angelone.bar_builder import bar_to_dict, parse_interval
+from app.core.ltp_overlay import get_ltp_overlay
+from app.core import ltp_store
+from app.core.ltp_broadcaster import broadcaster
+from app.core.leader import leader
+from redis_client import redis_safe_json_get
 
 from datetime import datetime, timedelta
 import pytz
@@ -107,34 +112,50 @@ def market_status():
 # ------------------------------------------
 # REAL-TIME LTP SNAPSHOT
 # ------------------------------------------
+_NO_CACHE = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0"
+}
+
+
+def holding_symbols():
+    """
+    Mapped holding symbols, the same way in every process: the map the
+    leader publishes to Redis, else this process's own (only the leader
+    builds one, e.g. while leading without Redis).
+    """
+    shared = redis_safe_json_get("symbol_token_map")
+    if isinstance(shared, dict) and shared:
+        return list(shared)
+    return list(worker.symbol_token_map)
+
+
+def not_leader(what: str) -> JSONResponse:
+    """503 for data only the ingesting leader holds in memory."""
+    return JSONResponse(
+        {"error": f"not leader: {what} are only held by the leader process", "leader": leader.holder()},
+        status_code=503,
+        headers=_NO_CACHE,
+    )
+
+
 @router.get("/holdings-ltp")
 def get_holdings_ltp():
     result = []
-    r = get_redis()
 
-    token_set = worker.holding_tokens_set
-    token_to_symbol = worker.token_to_symbol_map
     cache = worker.ltp_cache
+    symbols = holding_symbols()
 
-    if not token_set:
-        print("❌ No tokens in holding_tokens_set")
+    if not symbols:
+        print("❌ No mapped holding symbols")
         return []
 
-    for token in token_set:
-        symbol = token_to_symbol.get(token)
-        if not symbol:
-            continue
-
-        ltp = None
+    # Redis first: one HMGET on ltp:px for every symbol
+    overlay = get_ltp_overlay(symbols)
 
-        # Redis first
-        if r:
-            try:
-                raw = r.get(f"ltp:{symbol}")
-                if raw:
-                    ltp = float(raw.decode("utf-8")) if isinstance(raw, bytes) else float(raw)
-            except:
-                pass
+    for symbol in symbols:
+        ltp = overlay.get(symbol)
 
         # Memory-cache fallback
         if ltp is None:
@@ -144,8 +165,105 @@ def get_holdings_ltp():
 
         result.append({"symbol": symbol, "Ltp": ltp})
 
-    return JSONResponse(result, headers={
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0"
-    })
+    return JSONResponse(result, headers=_NO_CACHE)
+
+
+# ------------------------------------------
+# LTP STORE: SNAPSHOT + DELTAS
+# ------------------------------------------
+@router.get("/ltp")
+def ltp_snapshot():
+    """Every live price with exchange timestamp and seq (one HGETALL)."""
+    data = ltp_store.snapshot()
+    head = max((rec["seq"] for rec in data.values()), default=0)
+    return JSONResponse({"seq": head, "data": data}, headers=_NO_CACHE)
+
+
+@router.get("/ltp/changes")
+def ltp_changes(since: int = 0):
+    """Only symbols written after `since`; poll again with the returned seq."""
+    head, data = ltp_store.changes_since(since)
+    return JSONResponse({"seq": head, "data": data}, headers=_NO_CACHE)
+
+
+# ------------------------------------------
+# QUOTES (volume / OHLC / best 5, by subscription mode)
+# ------------------------------------------
+@router.get("/quote")
+def live_quote(symbol: str):
+    if not leader.is_leader:
+        return not_leader("live quotes")
+
+    symbol = symbol.strip().upper()
+    token = worker.symbol_token_map.get(symbol)
+    slot = worker.quote_book.slot_of(token) if token else None
+    if slot is None:
+        return JSONResponse({"error": f"no live quote for {symbol}"}, status_code=404)
+    return JSONResponse({"symbol": symbol, **worker.quote_book.quote(slot)}, headers=_NO_CACHE)
+
+
+# ------------------------------------------
+# INTRADAY BARS
+# ------------------------------------------
+@router.get("/bars")
+def intraday_bars(symbol: str, interval: str = "1m", limit: int = 100, db: Session = Depends(get_db)):
+    """
+    OHLCV bars oldest→newest, the last one possibly still open.
+    Served from the in-memory builder when this process ingests the feed,
+    otherwise from the flushed intraday_bar table. A follower with nothing
+    flushed yet answers 503: the bars exist only on the leader.
+    """
+    iv = parse_interval(interval)
+    if iv is None:
+        return JSONResponse({"error": f"unsupported interval: {interval}"}, status_code=400)
+
+    symbol = symbol.strip().upper()
+    limit = max(1, min(limit, 2000))
+
+    token = worker.symbol_token_map.get(symbol)
+    bars = worker.bar_builder.bars(token, iv, limit) if token and worker.bar_builder else []
+    if len(bars):
+        return JSONResponse(
+            {"symbol": symbol, "interval": iv, "source": "live", "bars": [bar_to_dict(b) for b in bars]},
+            headers=_NO_CACHE,
+        )
+
+    rows = (
+        db.query(IntradayBar)
+        .filter(IntradayBar.symbol == symbol, IntradayBar.interval_s == iv)
+        .order_by(IntradayBar.bar_start.desc())
+        .limit(limit)
+        .all()
+    )
+    data = [
+        {
+            "time": int(r.bar_start.replace(tzinfo=pytz.utc).timestamp()),
+            "open": r.open,
+            "high": r.high,
+            "low": r.low,
+            "close": r.close,
+            "volume": r.volume,
+            "ticks": r.ticks,
+        }
+        for r in reversed(rows)
+    ]
+    if not data and not leader.is_leader:
+        return not_leader("unflushed intraday bars")
+    return JSONResponse({"symbol": symbol, "interval": iv, "source": "db", "bars": data}, headers=_NO_CACHE)
+
+
+# ------------------------------------------
+# FEED METRICS
+# ------------------------------------------
+@router.get("/metrics")
+def feed_metrics():
+    return {
+        "tick_buffer": worker.tick_buffer.stats(),
+        "redis_writer": worker.redis_writer.stats(),
+        "bar_builder": worker.bar_builder.stats() if worker.bar_builder else None,
+        "quote_book": worker.quote_book.stats(),
+        "broadcaster": broadcaster.stats(),
+        "leader": leader.stats(),
+        "db_stream": worker.db_stream_consumer.stats() if worker.db_stream_consumer else None,
+        "db_flusher": worker.ltp_flusher.stats() if worker.ltp_flusher else None,
+    }
@@ -1,13 +1,18 @@
 from fastapi import APIRouter
 from typing import List
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 import copy
 
-# Redis safe utils
-from redis_client import (
+# Redis safe utils (asyncio twin — never blocks the event loop)
+from redis_client_async import (
     redis_safe_json_get,
     redis_safe_json_set,
-    redis_safe_get,
+)
+from app.core.ltp_overlay import (
+    apply_ltp_overlay,
+    collect_symbols,
+    get_ltp_overlay_async,
 )
 
 from app.Database.database_util import (
@@ -20,13 +25,6 @@ from app.schemas import HoldingResponse, MFResponse
 router = APIRouter(prefix="/brokers", tags=["Portfolio"])
 
 
-def safe_float(v):
-    try:
-        return float(str(v))
-    except:
-        return 0.0
-
-
 def normalize_result(rows: List[dict]):
     normalized = []
     for h in rows:
@@ -36,26 +34,29 @@ def normalize_result(rows: List[dict]):
     return normalized
 
 
-def apply_redis_ltp(holdings: List[dict]):
+async def apply_redis_ltp(holdings: List[dict]):
     """
     Inject latest Redis LTP values WITHOUT modifying cached objects.
+    One HMGET on the ltp:px hash for the whole list.
     """
-    output = []
-    for h in holdings:
-        h2 = h.copy()                # ← important to avoid mutation
-        sym = (h2.get("symbol") or "").strip().upper()
+    overlay = await get_ltp_overlay_async(collect_symbols(holdings))
+    return apply_ltp_overlay(holdings, overlay)
 
-        cached = redis_safe_get(f"ltp:{sym}")
-        if cached is not None:
-            try:
-                if isinstance(cached, (bytes, bytearray)):
-                    cached = cached.decode()
-                h2["Ltp"] = safe_float(cached)
-            except:
-                pass
 
-        output.append(h2)
-    return output
+async def overlay_portfolios(portfolios: dict) -> dict:
+    """
+    LTP overlay for every broker in one HMGET on ltp:px, shared across brokers.
+    """
+    overlay = await get_ltp_overlay_async(
+        collect_symbols(*(info["holdings"] for info in portfolios.values()))
+    )
+    return {
+        broker: {
+            "holdings": apply_ltp_overlay(info["holdings"], overlay),
+            "mfs": info["mfs"],
+        }
+        for broker, info in portfolios.items()
+    }
 
 
 # ---------------------------------------------------------
@@ -75,43 +76,30 @@ async def all_portfolios():
     # -----------------------------------------
     # 1) Try Redis first
     # -----------------------------------------
-    cached = redis_safe_json_get(key)
+    cached = await redis_safe_json_get(key)
     if cached:
-        fresh = {}
-        for broker, info in cached.items():
-            fresh[broker] = {
-                "holdings": apply_redis_ltp(info["holdings"]),
-                "mfs": info["mfs"]
-            }
-        return fresh
+        return await overlay_portfolios(cached)
 
     # -----------------------------------------
     # 2) Redis empty → load from DB
     # -----------------------------------------
     results = {}
-    brokers = get_all_brokers()
+    brokers = await run_in_threadpool(get_all_brokers)
 
     for broker in brokers:
-        holdings = get_holdings_from_db(broker)
+        holdings = await run_in_threadpool(get_holdings_from_db, broker)
         holdings = normalize_result(holdings)
 
         results[broker] = {
             "holdings": holdings,
-            "mfs": get_mfs_from_db(broker),
+            "mfs": await run_in_threadpool(get_mfs_from_db, broker),
         }
 
     # Save raw DB results in Redis
-    redis_safe_json_set(key, results, ex=600)
+    await redis_safe_json_set(key, results, ex=600)
 
     # Return with LTP
-    final = {}
-    for broker, info in results.items():
-        final[broker] = {
-            "holdings": apply_redis_ltp(info["holdings"]),
-            "mfs": info["mfs"],
-        }
-
-    return final
+    return await overlay_portfolios(results)
 
 
 # ------------------------------ HOLDINGS ------------------------------
@@ -120,16 +108,16 @@ async def all_portfolios():
 async def holdings(broker_name: str):
     key = f"portfolio:{broker_name}:holdings"
 
-    cached = redis_safe_json_get(key)
+    cached = await redis_safe_json_get(key)
     if cached:
-        return apply_redis_ltp(cached)
+        return await apply_redis_ltp(cached)
 
     # DB fallback
-    data = get_holdings_from_db(broker_name.lower())
+    data = await run_in_threadpool(get_holdings_from_db, broker_name.lower())
     data = normalize_result(data)
 
-    redis_safe_json_set(key, data, ex=600)
-    return apply_redis_ltp(data)
+    await redis_safe_json_set(key, data, ex=600)
+    return await apply_redis_ltp(data)
 
 
 # ------------------------------ MUTUAL FUNDS ------------------------------
@@ -138,10 +126,10 @@ async def holdings(broker_name: str):
 async def mf(broker_name: str):
     key = f"portfolio:{broker_name}:mfs"
 
-    cached = redis_safe_json_get(key)
+    cached = await redis_safe_json_get(key)
     if cached:
         return cached
 
-    data = get_mfs_from_db(broker_name.lower())
-    redis_safe_json_set(key, data, ex=600)
+    data = await run_in_threadpool(get_mfs_from_db, broker_name.lower())
+    await redis_safe_json_set(key, data, ex=600)
     return data
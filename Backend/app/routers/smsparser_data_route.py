@@ -1,8 +1,10 @@
 # app/routers/smsparser_data_route.py
 
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional
 
 from app.db import SessionLocal
 from app import crud, schemas
@@ -60,14 +62,13 @@ def get_all_sms_data(db: Session = Depends(get_db)):
     Debug endpoint: return ALL transactions (synced + unsynced).
     Now also returns bankName.
     """
-    txns = db.query(crud.models.Transaction).order_by(
-        crud.models.Transaction.txn_datetime.desc()
-    ).all()
+    txns = crud.get_all_transactions_numbered(db)
 
     result: List[Dict] = []
     for t in txns:
         result.append({
             "id": t.id,
+            "display_no": t.display_no,
             "account_id": t.account_id,
             "sms_account_number": t.sms_account_number,
 
@@ -90,3 +91,43 @@ def get_all_sms_data(db: Session = Depends(get_db)):
         })
 
     return {"total": len(result), "data": result}
+
+
+@router.get("/smsparser/page", response_model=schemas.TransactionPage)
+def get_sms_data_page(
+    limit: int = Query(50, ge=1, le=crud.PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Keyset-paged version of /smsparser/all (synced + unsynced, newest
+    first). Pass next_cursor back as ?cursor= for the following page.
+    """
+    try:
+        rows, next_cursor = crud.get_transactions_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            synced_only=False,
+            date_from=date_from,
+            date_to=date_to,
+            txn_type=type,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    return {"data": rows, "next_cursor": next_cursor}
+
+
+@router.get("/smsparser/export")
+def export_sms_data(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+):
+    """Every transaction (synced + unsynced) as NDJSON, streamed from a server-side cursor."""
+    filters = dict(synced_only=False, date_from=date_from, date_to=date_to, txn_type=type)
+    return StreamingResponse(crud.stream_transactions_ndjson(**filters), media_type="application/x-ndjson")
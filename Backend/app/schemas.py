@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -99,6 +99,8 @@ class AccountUpdate(BaseModel):
 
 class AccountResponse(ORMBase):
     id: int
+    # contiguous 1..N position (ids are stable and may have gaps)
+    display_no: Optional[int] = None
     account_number: str
     bank_name: str
     acronym: str
@@ -135,6 +137,7 @@ class TransactionCreate(BaseModel):
 
 class TransactionResponse(ORMBase):
     id: int
+    display_no: Optional[int] = None
     bankName: Optional[str] = None
     # stored as FULL account number
     account_id: Optional[str]
@@ -158,3 +161,9 @@ class TransactionResponse(ORMBase):
     description: Optional[str]
 
     created_at: datetime
+
+
+class TransactionPage(BaseModel):
+    data: List[TransactionResponse]
+    # pass back as ?cursor= for the next page; None on the last page
+    next_cursor: Optional[str] = None
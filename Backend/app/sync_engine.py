@@ -0,0 +1,532 @@
+"""
+Transaction sync engine: unsynced SMS transactions → running balances.
+
+Unsynced rows are grouped by account and each account is synced with one
+ordered pass over (sms_timestamp, id) and a single commit:
+
+    anchor   the nearest VALID balance checkpoint before the earliest
+             unsynced row (else the balance of the row just before it)
+    window   anchor → last unsynced row, walked in Python; changed balances
+             go out in one UPDATE ... FROM (VALUES ...)
+    tail     rows after the window are all synced, so their balances just
+             shift by a constant: one UPDATE ... SET balance + delta
+
+Rules for an unsynced row (same as the old per-row sync):
+    expected = previous balance -/+ amount
+    if the SMS carried a balance that disagrees with `expected`, an
+    auto-generated transaction for the difference is inserted just before
+    it, and the SMS balance becomes the row's balance.
+
+Balance checkpoints (models.BalanceCheckpoint) hold the balance at the end of
+each CHECKPOINT_PERIOD_MS period (UTC day) that has transactions. A sync
+marks the checkpoints from its earliest period onward invalid with one
+UPDATE and rewrites only those its window fully covered; the rest are
+rebuilt lazily by balance_as_of(), which is then an index seek plus at most
+one period of rows.
+
+sync_account() runs in the background sync loop while balance_as_of() runs
+from API requests. Both take a per-account transaction-scoped advisory lock
+first, so a rebuild can never read balances from before a sync commits and
+then mark its checkpoints valid over the sync's invalidation.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, case, column, func, text, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from redis_client import redis_safe_get, redis_safe_set
+
+from . import models
+from .core.utils import safe_float
+
+BALANCE_TOLERANCE = 0.01
+UPDATE_CHUNK = 5000
+CHECKPOINT_PERIOD_MS = float(os.getenv("BALANCE_CHECKPOINT_PERIOD_MS", str(24 * 60 * 60 * 1000)))
+# first key of the two-key advisory lock (second: hashtext(account number))
+ACCOUNT_LOCK_CLASS = 0x5AC
+
+# (sms_timestamp, id): position of a transaction in an account's history
+TxnKey = Tuple[float, int]
+
+
+def _signed(txn_type: str, amount) -> float:
+    amt = safe_float(amount)
+    return -amt if txn_type == "debit" else amt
+
+
+def period_of(ts: float) -> float:
+    return (ts // CHECKPOINT_PERIOD_MS) * CHECKPOINT_PERIOD_MS
+
+
+def lock_account(db: Session, account_number: str):
+    """Serialise balance writers of one account until the current transaction ends."""
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:cls, hashtext(:account))"),
+        {"cls": ACCOUNT_LOCK_CLASS, "account": account_number},
+    )
+
+
+def _key():
+    T = models.Transaction
+    return tuple_(T.sms_timestamp, T.id)
+
+
+# ------------------------------------------------------
+# Entry points
+# ------------------------------------------------------
+def unsynced_accounts(db: Session) -> Dict[str, int]:
+    """account_number -> number of unsynced transactions."""
+    return {account_id: n for account_id, n in _unsynced_accounts_query(db).all()}
+
+
+def sync_all(db: Session) -> List[models.Transaction]:
+    """Sync every account that has unsynced transactions. One commit per account."""
+    processed: List[models.Transaction] = []
+
+    for account_number in sorted(unsynced_accounts(db)):
+        acc = db.query(models.Account).filter(models.Account.account_number == account_number).first()
+        if acc is None:
+            print(f"[SYNC] skipping unsynced transactions for unknown account {account_number}")
+            continue
+        try:
+            processed.extend(sync_account(db, acc))
+        except Exception as e:
+            db.rollback()
+            print(f"[SYNC ERROR] account {account_number}: {e}")
+
+    return processed
+
+
+def sync_account(db: Session, acc: models.Account) -> List[models.Transaction]:
+    """
+    Sync every unsynced transaction of one account. Returns the
+    auto-generated and newly synced transactions.
+    """
+    T = models.Transaction
+    account_number = acc.account_number
+
+    lock_account(db, account_number)
+
+    first = _unsynced_edge_query(db, account_number).first()
+    if first is None or first.sms_timestamp is None:
+        db.commit()  # release the lock
+        return []
+    last = _unsynced_edge_query(db, account_number, last=True).first()
+    start: TxnKey = (first.sms_timestamp, first.id)
+    end: TxnKey = (last.sms_timestamp, last.id)
+
+    # ---- anchor ----
+    cp = _checkpoint_before(db, account_number, period_of(start[0]))
+    if cp is not None:
+        running = cp.balance
+        rows = _window_query(db, account_number, (cp.last_ts, cp.last_txn_id), end).all()
+    else:
+        running = _balance_before(db, acc, start)
+        rows = _window_query(db, account_number, start, end, include_lo=True).all()
+
+    # checkpoints from the first touched period on (an auto-generated row
+    # lands 1ms before `start`) are stale; rebuilt lazily
+    invalidate_from(db, account_number, start[0] - 1)
+
+    # ---- window ----
+    changes: List[Tuple[int, float]] = []
+    synced_ids: List[int] = []
+    auto_txns: List[models.Transaction] = []
+    periods = _PeriodTracker(complete_first=cp is not None)
+
+    for r in rows:
+        if r.isSynced:
+            running += _signed(r.type, r.amount)
+            if r.balance_after_txn != running:
+                changes.append((r.id, running))
+            periods.add(r.sms_timestamp, r.id, running)
+            continue
+
+        expected = running + _signed(r.type, r.amount)
+        final = expected
+
+        if r.sms_balance is not None:
+            sms_bal = safe_float(r.sms_balance)
+            diff = expected - sms_bal
+            if abs(diff) > BALANCE_TOLERANCE:
+                auto_txns.append(_missing_txn(acc, r, diff, running - diff))
+            final = sms_bal
+
+        running = final
+        changes.append((r.id, final))
+        synced_ids.append(r.id)
+        periods.add(r.sms_timestamp, r.id, running)
+
+    _write_balances(db, changes)
+
+    # ---- tail ----
+    account_balance = _shift_tail(db, account_number, end, running)
+    if account_balance is None:
+        # nothing after the window: its last period is complete too
+        account_balance = running
+        periods.close()
+
+    db.add_all(auto_txns)
+    db.flush()
+    _write_checkpoints(db, account_number, periods.done)
+
+    acc.current_balance = account_balance
+    acc.updated_at = datetime.utcnow()
+    db.commit()
+
+    redis_safe_set(f"balance:{account_number}", account_balance)
+
+    synced = db.query(T).filter(T.id.in_(synced_ids)).order_by(T.sms_timestamp, T.id).all() if synced_ids else []
+    return auto_txns + synced
+
+
+# ------------------------------------------------------
+# Balance as of
+# ------------------------------------------------------
+def balance_as_of(db: Session, account_number: str, as_of: datetime) -> Optional[float]:
+    """
+    Balance after the last synced transaction at or before `as_of`
+    (None if the account has no history by then). One checkpoint seek plus
+    at most one period of rows; stale checkpoints are rebuilt first.
+    """
+    T = models.Transaction
+    ts = as_of.timestamp() * 1000.0
+    period = period_of(ts)
+
+    rebuild_checkpoints(db, account_number, upto_period=period)
+
+    cp = _checkpoint_before(db, account_number, period)
+    if cp is not None:
+        delta = _sum_until_query(db, account_number, ts, after=(cp.last_ts, cp.last_txn_id)).scalar()
+        return cp.balance + (delta or 0.0)
+
+    # nothing checkpointed before this period: start from the first row
+    first = (
+        db.query(T.balance_after_txn, T.type, T.amount, T.sms_timestamp)
+        .filter(T.account_id == account_number, T.isSynced == True, T.balance_after_txn.isnot(None))
+        .order_by(T.sms_timestamp.asc(), T.id.asc())
+        .first()
+    )
+    if first is None or first.sms_timestamp > ts:
+        return None
+    opening = first.balance_after_txn - _signed(first.type, first.amount)
+    return opening + (_sum_until_query(db, account_number, ts).scalar() or 0.0)
+
+
+def _signed_amount():
+    T = models.Transaction
+    return case((T.type == "debit", -T.amount), else_=T.amount)
+
+
+# ------------------------------------------------------
+# Checkpoints
+# ------------------------------------------------------
+class _PeriodTracker:
+    """Collects (period, last ts, last id, balance) for periods a walk fully covers."""
+
+    def __init__(self, complete_first: bool):
+        self.done: List[Tuple[float, float, int, float]] = []
+        self._complete = complete_first
+        self._current: Optional[List] = None
+
+    def add(self, ts: float, txn_id: int, balance: float):
+        period = period_of(ts)
+        cur = self._current
+        if cur is not None and cur[0] == period:
+            cur[1], cur[2], cur[3] = ts, txn_id, balance
+            return
+        if cur is not None:
+            self._emit()
+        self._current = [period, ts, txn_id, balance]
+
+    def close(self):
+        if self._current is not None:
+            self._emit()
+            self._current = None
+
+    def _emit(self):
+        # the first period of a walk that did not start at a period boundary is partial
+        if self._complete:
+            self.done.append(tuple(self._current))
+        self._complete = True
+
+
+def _checkpoint_before(db: Session, account_number: str, period: float) -> Optional[models.BalanceCheckpoint]:
+    C = models.BalanceCheckpoint
+    return (
+        db.query(C)
+        .filter(C.account_id == account_number, C.is_valid == True, C.period_start < period)
+        .order_by(C.period_start.desc())
+        .first()
+    )
+
+
+def invalidate_from(db: Session, account_number: str, ts: float):
+    C = models.BalanceCheckpoint
+    db.query(C).filter(
+        C.account_id == account_number,
+        C.period_start >= period_of(ts),
+        C.is_valid == True,
+    ).update({C.is_valid: False}, synchronize_session=False)
+
+
+def _write_checkpoints(db: Session, account_number: str, done: List[Tuple[float, float, int, float]]):
+    if not done:
+        return
+    C = models.BalanceCheckpoint
+    rows = [
+        {
+            "account_id": account_number,
+            "period_start": period,
+            "last_ts": ts,
+            "last_txn_id": txn_id,
+            "balance": balance,
+            "is_valid": True,
+            "updated_at": datetime.utcnow(),
+        }
+        for period, ts, txn_id, balance in done
+    ]
+    for i in range(0, len(rows), UPDATE_CHUNK):
+        stmt = pg_insert(C).values(rows[i : i + UPDATE_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_balance_checkpoint_account_period",
+            set_={
+                col: stmt.excluded[col]
+                for col in ("last_ts", "last_txn_id", "balance", "is_valid", "updated_at")
+            },
+        )
+        db.execute(stmt)
+
+
+def rebuild_checkpoints(db: Session, account_number: str, upto_period: Optional[float] = None) -> int:
+    """
+    Lazily rebuild stale or missing checkpoints up to (and excluding)
+    `upto_period` from the stored row balances. Returns checkpoints written.
+    If there is nothing to rebuild the account lock stays held until the
+    caller's transaction ends, so its follow-up reads are consistent too.
+    """
+    C = models.BalanceCheckpoint
+
+    lock_account(db, account_number)
+
+    q_stale = db.query(func.min(C.period_start)).filter(C.account_id == account_number, C.is_valid == False)
+    if upto_period is not None:
+        q_stale = q_stale.filter(C.period_start < upto_period)
+    stale_from = q_stale.scalar()
+
+    # newest valid checkpoint below the first stale one is where the walk resumes
+    anchor_q = db.query(C.period_start, C.last_ts, C.last_txn_id).filter(
+        C.account_id == account_number, C.is_valid == True
+    )
+    if stale_from is not None:
+        anchor_q = anchor_q.filter(C.period_start < stale_from)
+    elif upto_period is not None:
+        anchor_q = anchor_q.filter(C.period_start < upto_period)
+    anchor = anchor_q.order_by(C.period_start.desc()).first()
+
+    after = (anchor.last_ts, anchor.last_txn_id) if anchor is not None else None
+    rows_q = _checkpoint_rows_query(db, account_number, after, upto_period)
+
+    if stale_from is None:
+        # nothing stale: only periods newer than the last checkpoint can be missing
+        if not rows_q.limit(1).first():
+            return 0
+
+    periods = _PeriodTracker(complete_first=True)
+    for r in rows_q.yield_per(UPDATE_CHUNK):
+        periods.add(r.sms_timestamp, r.id, r.balance_after_txn)
+    periods.close()
+
+    _write_checkpoints(db, account_number, periods.done)
+
+    # stale periods that no longer have rows
+    stale_q = db.query(C).filter(C.account_id == account_number, C.is_valid == False)
+    if upto_period is not None:
+        stale_q = stale_q.filter(C.period_start < upto_period)
+    stale_q.delete(synchronize_session=False)
+
+    db.commit()
+    return len(periods.done)
+
+
+def delete_checkpoints(db: Session, account_number: Optional[str] = None):
+    C = models.BalanceCheckpoint
+    q = db.query(C)
+    if account_number is not None:
+        q = q.filter(C.account_id == account_number)
+    q.delete(synchronize_session=False)
+
+
+# ------------------------------------------------------
+# Query builders
+# ------------------------------------------------------
+# The hot transaction queries, unexecuted. benchmarks.explain_check EXPLAINs
+# these same builders, so a change here that loses its index shows up there.
+def _unsynced_accounts_query(db: Session):
+    T = models.Transaction
+    return (
+        db.query(T.account_id, func.count(T.id))
+        .filter(T.isSynced == False, T.account_id.isnot(None))
+        .group_by(T.account_id)
+    )
+
+
+def _unsynced_edge_query(db: Session, account_number: str, last: bool = False):
+    """First (or last) unsynced row of the account, as (sms_timestamp, id)."""
+    T = models.Transaction
+    q = db.query(T.sms_timestamp, T.id).filter(T.account_id == account_number, T.isSynced == False)
+    if last:
+        return q.order_by(T.sms_timestamp.desc(), T.id.desc()).limit(1)
+    return q.order_by(T.sms_timestamp.asc(), T.id.asc()).limit(1)
+
+
+def _window_query(db: Session, account_number: str, lo: TxnKey, hi: TxnKey, include_lo: bool = False):
+    """Rows between lo and hi (inclusive), oldest first."""
+    T = models.Transaction
+    above_lo = _key() >= lo if include_lo else _key() > lo
+    return (
+        db.query(
+            T.id, T.type, T.amount, T.sms_timestamp, T.txn_datetime,
+            T.sms_balance, T.balance_after_txn, T.isSynced,
+        )
+        .filter(T.account_id == account_number, above_lo, _key() <= hi)
+        .order_by(T.sms_timestamp.asc(), T.id.asc())
+    )
+
+
+def _tail_query(db: Session, account_number: str, end: TxnKey, newest_first: bool = False):
+    """Rows after `end`, oldest first (or newest first)."""
+    T = models.Transaction
+    q = db.query(T.id, T.type, T.amount, T.balance_after_txn).filter(
+        T.account_id == account_number, _key() > end
+    )
+    if newest_first:
+        return q.order_by(T.sms_timestamp.desc(), T.id.desc())
+    return q.order_by(T.sms_timestamp.asc(), T.id.asc())
+
+
+def _checkpoint_rows_query(
+    db: Session,
+    account_number: str,
+    after: Optional[TxnKey] = None,
+    upto_period: Optional[float] = None,
+):
+    """Synced rows with a balance, oldest first, for a checkpoint rebuild walk."""
+    T = models.Transaction
+    q = db.query(T.sms_timestamp, T.id, T.balance_after_txn).filter(
+        T.account_id == account_number,
+        T.isSynced == True,
+        T.balance_after_txn.isnot(None),
+    )
+    if after is not None:
+        q = q.filter(_key() > after)
+    if upto_period is not None:
+        q = q.filter(T.sms_timestamp < upto_period)
+    return q.order_by(T.sms_timestamp.asc(), T.id.asc())
+
+
+def _balance_before_query(db: Session, account_number: str, key: TxnKey):
+    T = models.Transaction
+    return (
+        db.query(T.balance_after_txn)
+        .filter(T.account_id == account_number, _key() < key)
+        .order_by(T.sms_timestamp.desc(), T.id.desc())
+        .limit(1)
+    )
+
+
+def _sum_until_query(db: Session, account_number: str, ts: float, after: Optional[TxnKey] = None):
+    """Signed sum of synced rows up to `ts` (after a checkpoint key, if given)."""
+    T = models.Transaction
+    q = db.query(func.sum(_signed_amount())).filter(
+        T.account_id == account_number,
+        T.isSynced == True,
+        T.sms_timestamp <= ts,
+    )
+    if after is not None:
+        q = q.filter(_key() > after)
+    return q
+
+
+# ------------------------------------------------------
+# Helpers
+# ------------------------------------------------------
+def _balance_before(db: Session, acc: models.Account, key: TxnKey) -> float:
+    prev = _balance_before_query(db, acc.account_number, key).first()
+    if prev is not None and prev.balance_after_txn is not None:
+        return safe_float(prev.balance_after_txn)
+
+    # no history before it: fall back to the account balance
+    return safe_float(redis_safe_get(f"balance:{acc.account_number}") or acc.current_balance)
+
+
+def _shift_tail(db: Session, account_number: str, end: TxnKey, running: float) -> Optional[float]:
+    """
+    Re-base every row after `end` on the new running balance with one
+    UPDATE. Returns the new balance after the last row (None if no tail).
+    """
+    T = models.Transaction
+    head = _tail_query(db, account_number, end).first()
+    if head is None:
+        return None
+
+    if head.balance_after_txn is None:
+        # never synced consistently: re-walk it
+        running_tail = running
+        changes = []
+        for r in _tail_query(db, account_number, end).all():
+            running_tail += _signed(r.type, r.amount)
+            changes.append((r.id, running_tail))
+        _write_balances(db, changes)
+        return running_tail
+
+    delta = running + _signed(head.type, head.amount) - head.balance_after_txn
+    if delta:
+        db.query(T).filter(T.account_id == account_number, _key() > end).update(
+            {T.balance_after_txn: T.balance_after_txn + delta}, synchronize_session=False
+        )
+
+    last = _tail_query(db, account_number, end, newest_first=True).first()
+    return safe_float(last.balance_after_txn)
+
+
+def _missing_txn(acc: models.Account, r, diff: float, balance_after: float) -> models.Transaction:
+    base_ts = r.sms_timestamp if r.sms_timestamp is not None else r.txn_datetime.timestamp()
+    return models.Transaction(
+        account_id=acc.account_number,
+        bankName=acc.bank_name,
+        sms_account_number=None,
+        type="debit" if diff > 0 else "credit",
+        amount=abs(diff),
+        mode="auto",
+        reference_id=None,
+        description="Auto-generated missing transaction",
+        txn_datetime=datetime.utcnow(),
+        sms_timestamp=base_ts - 1,  # ensure order
+        balance_after_txn=balance_after,
+        sms_balance=None,
+        is_auto_generated=True,
+        isSynced=True,
+    )
+
+
+def _write_balances(db: Session, changes: List[Tuple[int, float]]):
+    """UPDATE transactions SET balance_after_txn = v.balance, isSynced = true FROM (VALUES ...) v."""
+    T = models.Transaction
+    for i in range(0, len(changes), UPDATE_CHUNK):
+        batch = values(
+            column("id", Integer),
+            column("balance", Float),
+            name="sync_balances",
+        ).data(changes[i : i + UPDATE_CHUNK])
+
+        db.execute(
+            update(T)
+            .where(T.id == batch.c.id)
+            .values(balance_after_txn=batch.c.balance, isSynced=True)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,124 @@
+"""
+Query-plan regression check for the transaction hot paths.
+
+Applies pending migrations, then EXPLAINs (no ANALYZE; nothing is executed)
+the queries built by the sync engine and crud query builders themselves, so
+a builder change that loses its index fails here. Runs with seq scans,
+bitmap scans and sorts priced out (enable_* = off): the planner still picks
+one only when no index can serve the query or its order, so the verdict does
+not depend on table size or statistics (an empty dev database, an account
+with three rows). Exits 1 if a gated query plans a Seq Scan on transactions,
+or if one that walks history in order (ORDER BY ... LIMIT / keyset) needs an
+explicit Sort instead of reading an index in order.
+
+The unpaged, numbered listings (crud.get_transactions) number the whole
+table with row_number(), so they read every row whatever the indexes; they
+are printed as "info" and not gated. The paged endpoints are the indexed path.
+
+Needs Postgres: app.db's engine (DB_* env) or --dsn.
+
+Run from Backend/:
+    python -m benchmarks.explain_check
+    python -m benchmarks.explain_check --dsn postgresql://user:pw@localhost/db --verbose
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import crud, models, sync_engine
+from app.Database.migrations import apply_migrations
+
+T = models.Transaction
+ACCOUNT = "000000000000"
+KEY_LO = (1_700_000_000_000.0, 1)
+KEY_HI = (1_800_000_000_000.0, 1)
+CURSOR = (datetime(2030, 1, 1), 10**9)
+PRICED_OUT = ("enable_seqscan", "enable_bitmapscan", "enable_sort", "enable_incremental_sort")
+
+
+# (name, query from the real builder, must be served in index order, gated)
+# Ungated entries are printed for reference only: a scan there is by design.
+def hot_queries(db: Session) -> List[Tuple[str, object, bool, bool]]:
+    return [
+        ("sync: accounts with unsynced rows", sync_engine._unsynced_accounts_query(db), False, True),
+        ("sync: first unsynced row", sync_engine._unsynced_edge_query(db, ACCOUNT), True, True),
+        ("sync: last unsynced row", sync_engine._unsynced_edge_query(db, ACCOUNT, last=True), True, True),
+        ("sync: balance before key", sync_engine._balance_before_query(db, ACCOUNT, KEY_LO), True, True),
+        ("sync: window walk", sync_engine._window_query(db, ACCOUNT, KEY_LO, KEY_HI), True, True),
+        ("sync: tail after window", sync_engine._tail_query(db, ACCOUNT, KEY_HI).limit(1), True, True),
+        ("sync: tail, newest first", sync_engine._tail_query(db, ACCOUNT, KEY_HI, newest_first=True).limit(1), True, True),
+        ("checkpoints: rebuild walk", sync_engine._checkpoint_rows_query(db, ACCOUNT, KEY_LO, KEY_HI[0]), True, True),
+        ("balance as of: sum after checkpoint", sync_engine._sum_until_query(db, ACCOUNT, KEY_HI[0], after=KEY_LO), False, True),
+        ("page: one account, first page", crud._transactions_page_query(db, 51, account_number=ACCOUNT), True, True),
+        ("page: one account, after cursor", crud._transactions_page_query(db, 51, CURSOR, account_number=ACCOUNT), True, True),
+        ("page: all accounts, after cursor", crud._transactions_page_query(db, 51, CURSOR), True, True),
+        ("page: sms, all rows, after cursor", crud._transactions_page_query(db, 51, CURSOR, synced_only=False), True, True),
+        ("export: all accounts", crud._transactions_query(db, T.id, T.txn_datetime), True, True),
+        ("list (unpaged, numbered): one account", crud._numbered_transactions_query(db, ACCOUNT), False, False),
+        ("list (unpaged, numbered): all", crud._numbered_transactions_query(db), False, False),
+    ]
+
+
+def _nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def explain(conn, query) -> dict:
+    compiled = query.statement.compile(dialect=conn.dialect)
+    raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    doc = raw if isinstance(raw, list) else json.loads(raw)
+    return doc[0]["Plan"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dsn", help="Postgres URL (default: app.db engine from DB_* env)")
+    ap.add_argument("--verbose", action="store_true", help="print every plan node")
+    args = ap.parse_args()
+
+    if args.dsn:
+        engine = create_engine(args.dsn)
+    else:
+        from app.db import engine
+        engine.echo = False
+
+    models.Base.metadata.create_all(engine, tables=[T.__table__])
+    apply_migrations(engine)
+
+    failures = 0
+    with Session(engine) as db:
+        conn = db.connection()
+        for setting in PRICED_OUT:
+            conn.exec_driver_sql(f"SET {setting} = off")
+        for name, query, ordered, gated in hot_queries(db):
+            plan = explain(conn, query)
+            nodes = list(_nodes(plan))
+            seq = any(n["Node Type"] == "Seq Scan" and n.get("Relation Name") == T.__tablename__ for n in nodes)
+            sort = ordered and any(n["Node Type"] in ("Sort", "Incremental Sort") for n in nodes)
+            used = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+
+            bad = gated and (seq or sort)
+            failures += bad
+            status = "FAIL" if bad else "ok  " if gated else "info"
+            reason = " (seq scan)" if seq else " (sort)" if sort else ""
+            print(f"{status} {name:<42} {', '.join(used) or '-'}{reason}")
+            if args.verbose or bad:
+                for n in nodes:
+                    print(f"       {n['Node Type']:<22} {n.get('Index Name') or n.get('Relation Name') or ''}")
+
+    if failures:
+        print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} not served by an index on transactions")
+        sys.exit(1)
+    print("\nall gated queries are index-served")
+
+
+if __name__ == "__main__":
+    main()
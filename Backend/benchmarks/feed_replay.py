@@ -0,0 +1,291 @@
+"""
+Replay harness / load generator for the live tick pipeline.
+
+    fake SmartAPI server (local websocket, binary packets, paced)
+      → QuoteWebSocket → QuoteBook → on_quote_packet
+      → RedisTickWriter (LTP hash + tick stream)
+      → StreamConsumer → price_bus → LtpBroadcaster → N fake /ws/stocks clients
+      → update_holdings_batch (Postgres from DB_* env, unless --no-db)
+
+Packets come from a file recorded with QUOTE_RECORD_PATH (paced by their
+exchange timestamps) or are synthesised for --tokens at --rate ticks/s.
+Exchange timestamps are rewritten at send time, so exchange_to_send latency
+is the real pipeline delay. Needs the `websockets` package for the fake
+server; Redis is fakeredis (default) or the one at REDIS_HOST.
+
+Run from Backend/:
+    python -m benchmarks.feed_replay --no-db
+    python -m benchmarks.feed_replay --no-db --speed 10 --tokens 500 --clients 20
+    python -m benchmarks.feed_replay --packets ticks.bin --speed max --redis local
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import struct
+import threading
+import time
+from typing import List, Optional
+
+from websocket_angelone.quote_parser import MODE_QUOTE, MODES, build_packet, read_packets
+
+_EXCH_TS = struct.Struct("<q")
+_EXCH_TS_OFFSET = 35                # mode, exch, token[25], seq → exch_ts
+
+
+# ------------------------ TICK SOURCE ------------------------
+def synthetic_packets(tokens: int, rate: float, duration: float, mode: int) -> List[bytes]:
+    rnd = random.Random(11)
+    prices = [rnd.randint(10_000, 500_000) for _ in range(tokens)]
+    start_ms = int(time.time() * 1000)
+    out = []
+    for i in range(int(rate * duration)):
+        t = i % tokens if i < tokens else rnd.randrange(tokens)
+        prices[t] = max(100, prices[t] + rnd.randint(-50, 50))
+        out.append(build_packet(mode, str(1000 + t), prices[t], seq=i,
+                                exch_ts=start_ms + int(i * 1000 / rate), volume=i * 10))
+    return out
+
+
+def packet_token(p: bytes) -> str:
+    return p[2:27].rstrip(b"\x00").decode("ascii", "ignore")
+
+
+def packet_ts(p: bytes) -> int:
+    return _EXCH_TS.unpack_from(p, _EXCH_TS_OFFSET)[0]
+
+
+# ------------------------ FAKE SMARTAPI SERVER ------------------------
+class FakeSmartApiServer:
+    """Local stand-in for smartapisocket.angelone.in: waits for a subscribe, then streams."""
+
+    def __init__(self, packets: List[bytes], speed: Optional[float]):
+        self.packets = packets
+        self.speed = speed             # None = as fast as possible
+        self.port = 0
+        self.sent = 0
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.done = threading.Event()
+        self._ready = threading.Event()
+
+    def start(self) -> int:
+        threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True).start()
+        self._ready.wait(10)
+        return self.port
+
+    async def _main(self):
+        from websockets.asyncio.server import serve
+
+        async with serve(self._handler, "127.0.0.1", 0, max_size=None) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await asyncio.get_running_loop().create_future()
+
+    async def _handler(self, conn):
+        async for msg in conn:
+            if msg == "ping":
+                await conn.send("pong")
+                continue
+            try:
+                if json.loads(msg).get("action") == 1:
+                    break
+            except Exception:
+                continue
+
+        await self._stream(conn)
+
+    async def _stream(self, conn):
+        base_ts = packet_ts(self.packets[0]) if self.packets else 0
+        self.started_at = time.perf_counter()
+
+        for p in self.packets:
+            if self.speed:
+                due = self.started_at + (packet_ts(p) - base_ts) / 1000.0 / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0.001:
+                    await asyncio.sleep(delay)
+
+            buf = bytearray(p)
+            _EXCH_TS.pack_into(buf, _EXCH_TS_OFFSET, int(time.time() * 1000))
+            await conn.send(bytes(buf))
+            self.sent += 1
+            if not self.speed and self.sent % 500 == 0:
+                await asyncio.sleep(0)
+
+        self.finished_at = time.perf_counter()
+        self.done.set()
+
+
+# ------------------------ FAKE /ws/stocks CLIENTS ------------------------
+class _CountingClient:
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, _msg):
+        self.frames += 1
+
+    async def send_bytes(self, _msg):
+        self.frames += 1
+
+    async def send_json(self, _msg):
+        self.frames += 1
+
+    async def close(self):
+        pass
+
+
+def _pct(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+# ------------------------ HARNESS ------------------------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", help="recorded packet file (QUOTE_RECORD_PATH format)")
+    ap.add_argument("--tokens", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=2000, help="synthetic ticks/s at 1x")
+    ap.add_argument("--duration", type=float, default=10, help="synthetic feed length (s at 1x)")
+    ap.add_argument("--mode", type=int, default=MODE_QUOTE, choices=MODES)
+    ap.add_argument("--speed", default="1", help="1, 10, ... or max")
+    ap.add_argument("--clients", type=int, default=10, help="fake /ws/stocks clients")
+    ap.add_argument("--redis", choices=("fake", "local"), default="fake")
+    ap.add_argument("--no-db", action="store_true", help="skip Postgres; only drain the tick buffer")
+    ap.add_argument("--flush-interval", type=float, default=5.0)
+    args = ap.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+
+    if args.no_db:
+        # app.db builds its engine at import; it never connects unless used
+        for k, v in (("DB_USER", "bench"), ("DB_PASSWORD", "bench"), ("DB_HOST", "localhost"),
+                     ("DB_PORT", "5432"), ("DB_NAME", "bench")):
+            os.environ.setdefault(k, v)
+
+    import redis_client
+    if args.redis == "fake":
+        import fakeredis
+        fake = fakeredis.FakeRedis()
+        redis_client._build_client = lambda: fake
+        redis_client._redis_client = fake
+    elif redis_client.get_redis() is None:
+        print(f"Redis not reachable at {redis_client.REDIS_HOST}:{redis_client.REDIS_PORT}")
+        return
+
+    import websocket_angelone.worker as worker
+    from app.core import tick_stream
+    from app.core.ltp_broadcaster import LtpBroadcaster
+    from app.core.price_bus import PriceEvent, price_bus
+
+    packets = list(read_packets(args.packets)) if args.packets else \
+        synthetic_packets(args.tokens, args.rate, args.duration, args.mode)
+    if not packets:
+        print("no packets")
+        return
+
+    tokens = sorted({packet_token(p) for p in packets})
+    for tok in tokens:
+        sym = f"SYM{tok}"
+        worker.token_to_symbol_map[tok] = sym
+        worker.symbol_token_map[sym] = tok
+    worker.holding_tokens_set.update(tokens)
+
+    print(f"{len(packets):,} packets, {len(tokens)} tokens, speed={args.speed}, "
+          f"redis={args.redis}, db={'off' if args.no_db else 'on'}, clients={args.clients}")
+
+    # ---- fan-out: its own loop, like the app's ----
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    broadcaster = LtpBroadcaster()
+    broadcaster.bind(loop)
+    price_bus.subscribe(broadcaster.publish_event)
+    clients = [_CountingClient() for _ in range(args.clients)]
+    for c in clients:
+        asyncio.run_coroutine_threadsafe(broadcaster.register(c), loop).result()
+
+    def forward(entries):
+        for _id, rec in entries:
+            price_bus.publish(PriceEvent(rec["symbol"], rec["ltp"], rec["ts"], rec["seq"]))
+        return True
+
+    consumer = tick_stream.StreamConsumer(f"ws:bench:{os.getpid()}", "bench", forward, block_ms=100)
+    consumer.start()
+    worker.redis_writer.start()
+
+    # ---- DB flusher ----
+    flush_ms: List[float] = []
+    stop = threading.Event()
+
+    def flusher():
+        while not stop.wait(args.flush_interval):
+            t0 = time.perf_counter()
+            if args.no_db:
+                worker.tick_buffer.drain()
+            else:
+                worker.update_holdings_batch()
+            flush_ms.append((time.perf_counter() - t0) * 1000)
+
+    threading.Thread(target=flusher, daemon=True).start()
+
+    # ---- fake SmartAPI + real client ----
+    server = FakeSmartApiServer(packets, speed)
+    port = server.start()
+
+    qws = worker.QuoteWebSocket(
+        auth_token="bench", api_key="bench", client_code="bench", feed_token="bench",
+        book=worker.quote_book, on_quote=worker.on_quote_packet,
+    )
+    qws.ROOT_URI = f"ws://127.0.0.1:{port}"
+    qws.on_open = lambda wsapp: qws.subscribe(
+        "bench", args.mode, [{"exchangeType": 1, "tokens": tokens}]
+    )
+    threading.Thread(target=qws.connect, daemon=True).start()
+
+    server.done.wait()
+    feed_s = server.finished_at - server.started_at
+
+    # let the writer / stream / fan-out drain
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if worker.redis_writer.stats()["pending"] == 0 and consumer.entries_read >= worker.redis_writer.ticks_written:
+            break
+        time.sleep(0.1)
+    time.sleep(0.5)
+
+    stop.set()
+    consumer.stop(destroy_group=True)
+    try:
+        qws.close_connection()
+    except Exception:
+        pass
+
+    # ---- report ----
+    b = broadcaster.stats()
+    w = worker.redis_writer.stats()
+    lat = b["latency_ms"]
+    received = worker.quote_book.packets
+
+    print(f"\nfeed        sent={server.sent:,}  in {feed_s:.2f}s  = {server.sent / feed_s:,.0f} ticks/s")
+    print(f"ingest      received={received:,}  ({received / feed_s:,.0f} ticks/s)")
+    print(f"redis       flushes={w['flushes']}  written={w['ticks_written']:,}  "
+          f"avg pipeline={w['avg_pipeline_size']}  avg flush={w['avg_flush_ms']}ms  max={w['max_flush_ms']}ms")
+    print(f"stream      read={consumer.entries_read:,}  acked={consumer.entries_acked:,}")
+    print(f"fan-out     frames={b['frames']:,}  updates sent={b['sent']:,}  coalesced={b['coalesced']:,}  "
+          f"dropped clients={b['dropped_clients']}")
+    for name in ("exchange_to_send", "receive_to_send"):
+        s = lat[name]
+        if "p50" in s:
+            print(f"latency     {name:<17} p50={s['p50']:.1f}ms  p95={s['p95']:.1f}ms  "
+                  f"p99={s['p99']:.1f}ms  max={s['max']:.1f}ms  (n={s['count']:,})")
+    if flush_ms:
+        label = "drain" if args.no_db else "db flush"
+        print(f"{label:<11} n={len(flush_ms)}  p50={statistics.median(flush_ms):.1f}ms  "
+              f"p95={_pct(flush_ms, 0.95):.1f}ms  max={max(flush_ms):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+End-to-end check of the conditional scrip master refresh.
+
+Serves a small scrip master from a local http.server (ETag + Last-Modified,
+304 on a matching If-None-Match / If-Modified-Since), points the worker at
+it through ANGEL_INSTRUMENTS_URL and runs worker.refresh_instruments()
+against a temporary cache directory:
+
+    1. first download      200, store written, holdings mapped
+    2. validators match    304, store neither re-parsed nor rewritten
+    3. new ETag, same body 200, sha256 equal: no-op, only the meta moves on
+    4. real change         200, store rewritten, only the touched holdings
+                           remapped (and the map republished to Redis)
+
+Exits 1 if any step misbehaves. Redis is fakeredis when installed,
+otherwise whatever REDIS_HOST points at (the safe wrappers fail soft).
+
+Run from Backend/:
+    python -m benchmarks.instrument_sync_check
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+HOLDINGS = {"INFY", "TCS", "NEWCO"}
+
+BEFORE = [
+    {"token": "1594", "symbol": "INFY-EQ", "name": "INFY", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "11536", "symbol": "TCS-EQ", "name": "TCS", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "2885", "symbol": "RELIANCE-EQ", "name": "RELIANCE", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "35001", "symbol": "NIFTY26JANFUT", "name": "NIFTY", "exch_seg": "NFO", "expiry": "29JAN2026", "lotsize": "75"},
+]
+
+# INFY moves to a new token, NEWCO lists, RELIANCE is renamed, TCS is untouched
+AFTER = [
+    {"token": "99001", "symbol": "INFY-EQ", "name": "INFY", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "11536", "symbol": "TCS-EQ", "name": "TCS", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "2885", "symbol": "RELIANCE-EQ", "name": "RELIANCE INDUSTRIES", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "77777", "symbol": "NEWCO-EQ", "name": "NEWCO", "exch_seg": "NSE", "expiry": "", "lotsize": "1"},
+    {"token": "35001", "symbol": "NIFTY26JANFUT", "name": "NIFTY", "exch_seg": "NFO", "expiry": "29JAN2026", "lotsize": "75"},
+]
+
+
+# ------------------------ FAKE SCRIP MASTER SERVER ------------------------
+class ScripMaster:
+    def __init__(self):
+        self.body = b""
+        self.etag = ""
+        self.last_modified = ""
+        # (status, If-None-Match, If-Modified-Since) per request
+        self.requests: List[tuple] = []
+
+    def publish(self, rows: List[dict], etag: Optional[str] = None):
+        self.body = json.dumps(rows).encode()
+        self.etag = etag or f'"{hashlib.sha256(self.body).hexdigest()[:16]}"'
+        self.last_modified = formatdate(usegmt=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        master: ScripMaster = self.server.master
+        inm = self.headers.get("If-None-Match")
+        ims = self.headers.get("If-Modified-Since")
+
+        if (inm and inm == master.etag) or (not inm and ims and ims == master.last_modified):
+            master.requests.append((304, inm, ims))
+            self.send_response(304)
+            self.send_header("ETag", master.etag)
+            self.end_headers()
+            return
+
+        master.requests.append((200, inm, ims))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(master.body)))
+        self.send_header("ETag", master.etag)
+        self.send_header("Last-Modified", master.last_modified)
+        self.end_headers()
+        self.wfile.write(master.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(master: ScripMaster) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.master = master
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ------------------------ CHECK ------------------------
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def check(self, name: str, ok: bool, detail: str = ""):
+        self.failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<58} {detail}")
+
+
+def main():
+    master = ScripMaster()
+    master.publish(BEFORE)
+    server = start_server(master)
+    url = f"http://127.0.0.1:{server.server_port}/OpenAPIScripMaster.json"
+    os.environ["ANGEL_INSTRUMENTS_URL"] = url
+
+    # app.db builds its engine at import; it never connects unless used
+    for k, v in (("DB_USER", "check"), ("DB_PASSWORD", "check"), ("DB_HOST", "localhost"),
+                 ("DB_PORT", "5432"), ("DB_NAME", "check")):
+        os.environ.setdefault(k, v)
+
+    import redis_client
+    try:
+        import fakeredis
+        fake = fakeredis.FakeRedis()
+        redis_client._build_client = lambda: fake
+        redis_client._redis_client = fake
+    except ImportError:
+        pass
+
+    import websocket_angelone.worker as worker
+
+    tmp = tempfile.mkdtemp(prefix="instrument_sync_check_")
+    worker.INSTRUMENTS_CACHE = os.path.join(tmp, "instruments_cache.bin")
+    worker.INSTRUMENTS_INDEX = os.path.join(tmp, "instruments_index.json")
+    worker.INSTRUMENTS_META = os.path.join(tmp, "instruments_meta.json")
+    worker.holding_symbols = set(HOLDINGS)
+
+    def cache_mtime() -> int:
+        return os.stat(worker.INSTRUMENTS_CACHE).st_mtime_ns
+
+    def shared_map() -> Optional[Dict[str, str]]:
+        return redis_client.redis_safe_json_get("symbol_token_map")
+
+    c = Checker()
+    print(f"scrip master at {url}, cache in {tmp}\n")
+    c.check("ANGEL_INSTRUMENTS_URL override honoured", worker.ANGEL_INSTRUMENTS_URL == url,
+            worker.ANGEL_INSTRUMENTS_URL)
+
+    # 1) first download: no snapshot, so no validators
+    store = worker.refresh_instruments()
+    status, inm, _ims = master.requests[-1]
+    c.check("first download: 200 without validators", status == 200 and inm is None, f"status={status}")
+    c.check("first download: store written", store is not None and len(store) == len(BEFORE),
+            f"rows={len(store or [])}")
+    c.check("first download: holdings mapped", worker.symbol_token_map == {"INFY": "1594", "TCS": "11536"},
+            str(worker.symbol_token_map))
+    meta = worker.load_meta(worker.INSTRUMENTS_META)
+    c.check("first download: meta has etag / last_modified / sha256",
+            meta.get("etag") == master.etag and bool(meta.get("last_modified")) and bool(meta.get("sha256")))
+
+    # 2) unchanged on the server: validators match → 304
+    mtime = cache_mtime()
+    again = worker.refresh_instruments()
+    status, inm, ims = master.requests[-1]
+    c.check("304: validators sent", inm == master.etag and ims == master.last_modified)
+    c.check("304: server answered not modified", status == 304, f"status={status}")
+    c.check("304: store kept, file not rewritten", again is store and cache_mtime() == mtime)
+
+    # 3) new ETag, byte-identical body → 200, but sha256 equal: no-op
+    master.publish(BEFORE, etag='"reissued-by-cdn"')
+    again = worker.refresh_instruments()
+    status, _inm, _ims = master.requests[-1]
+    meta = worker.load_meta(worker.INSTRUMENTS_META)
+    c.check("sha256-equal: server sent the full body", status == 200, f"status={status}")
+    c.check("sha256-equal: store kept, file not rewritten", again is store and cache_mtime() == mtime)
+    c.check("sha256-equal: meta follows the new ETag", meta.get("etag") == master.etag, str(meta.get("etag")))
+    c.check("sha256-equal: mapping untouched", worker.symbol_token_map == {"INFY": "1594", "TCS": "11536"})
+
+    # 4) real change → rewritten store, only touched holdings remapped
+    master.publish(AFTER)
+    updated = worker.refresh_instruments()
+    status, _inm, _ims = master.requests[-1]
+    expected = {"INFY": "99001", "TCS": "11536", "NEWCO": "77777"}
+    c.check("delta: server sent the new body", status == 200, f"status={status}")
+    c.check("delta: store rewritten", updated is not None and updated is not store and len(updated) == len(AFTER),
+            f"rows={len(updated or [])}")
+    c.check("delta: moved token remapped, new listing mapped", worker.symbol_token_map == expected,
+            str(worker.symbol_token_map))
+    c.check("delta: token -> symbol map consistent",
+            worker.token_to_symbol_map == {v: k for k, v in expected.items()}
+            and worker.holding_tokens_set == set(expected.values()))
+    shared = shared_map()
+    if shared is not None:
+        c.check("delta: map republished to Redis", shared == expected, str(shared))
+
+    server.shutdown()
+    worker._release_store()
+
+    if c.failures:
+        print(f"\n{c.failures} check{'s' if c.failures != 1 else ''} failed")
+        sys.exit(1)
+    print("\nconditional download and delta apply behave")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Encoder/decoder benchmark + payload sizes for the live price stream.
+
+Encodes one burst of N symbols (default 500) as a /ws/stocks frame and as
+an ltp_updates channel message (published only with LTP_CHANNEL_PUBLISH=1)
+in every available encoding, then reports bytes per burst and encode/decode
+time.
+
+Run from Backend/:
+    python -m benchmarks.ltp_codec_bench
+    python -m benchmarks.ltp_codec_bench --symbols 500 --rounds 2000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, List
+
+from app.core import ltp_codec
+
+
+def _burst(n: int):
+    now_ms = int(time.time() * 1000)
+    rnd = random.Random(42)
+    return [
+        (f"SYM{i:04d}-EQ", round(rnd.uniform(10, 5000), 2), now_ms + i, now_ms * 1000 + i)
+        for i in range(n)
+    ]
+
+
+def decode_channel(raw: Any) -> List[dict]:
+    """Any ltp_updates payload (json list or msgpack rows) -> list of dicts, as a subscriber would."""
+    if raw.lstrip()[:1] in (b"[", b"{"):
+        data = json.loads(raw.decode("utf-8", errors="ignore"))
+    else:
+        import msgpack
+        data = msgpack.unpackb(raw, raw=False)
+
+    out = []
+    for item in data if isinstance(data, list) else [data]:
+        if isinstance(item, dict):
+            out.append(item)
+        else:
+            sym, ltp, ts, seq = item
+            out.append({"symbol": sym, "ltp": ltp, "ts": ts, "seq": seq})
+    return out
+
+
+def _time_us(fn: Callable[[], object], rounds: int) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+
+def _row(label: str, size: int, enc: List[float], dec: List[float], base: int):
+    print(
+        f"{label:<18} bytes={size:>7}  ({size / base * 100:5.1f}% of json)  "
+        f"encode p50={statistics.median(enc):8.1f}us  decode p50={statistics.median(dec):8.1f}us"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=500)
+    ap.add_argument("--rounds", type=int, default=1000)
+    args = ap.parse_args()
+
+    updates = _burst(args.symbols)
+    frame_updates = [(sym, ltp, ts) for sym, ltp, ts, _seq in updates]
+
+    encodings = [e for e in ltp_codec.ENCODINGS if ltp_codec.available(e)]
+    if ltp_codec.MSGPACK not in encodings:
+        print("msgpack not installed — skipping msgpack rows")
+
+    print(f"\n/ws/stocks frame, burst of {args.symbols} symbols")
+    base = len(ltp_codec.encode_frame(ltp_codec.JSON, frame_updates))
+    for enc in encodings:
+        # struct clients already hold the symbol dictionary (sent at subscribe)
+        table = ltp_codec.SymbolTable()
+        table.add(sym for sym, _l, _t in frame_updates)
+        names = {sid: sym for sym, sid in table.ids.items()}
+
+        payload = ltp_codec.encode_frame(enc, frame_updates, table)
+        enc_us = _time_us(lambda: ltp_codec.encode_frame(enc, frame_updates, table), args.rounds)
+        dec_us = _time_us(lambda: ltp_codec.decode_frame(enc, payload, names), args.rounds)
+        _row(enc, len(payload), enc_us, dec_us, base)
+
+        if enc == ltp_codec.STRUCT:
+            dictionary = len(json.dumps(ltp_codec.symbols_message(table.ids)))
+            print(f"{'':<18} + one-off symbol dictionary: {dictionary} bytes")
+
+    print(f"\nltp_updates channel, burst of {args.symbols} symbols")
+    base = len(ltp_codec.encode_channel(updates, ltp_codec.JSON))
+    for enc in encodings:
+        if enc == ltp_codec.STRUCT:
+            continue
+        payload = ltp_codec.encode_channel(updates, enc)
+        raw = payload.encode() if isinstance(payload, str) else payload
+        enc_us = _time_us(lambda: ltp_codec.encode_channel(updates, enc), args.rounds)
+        dec_us = _time_us(lambda: decode_channel(raw), args.rounds)
+        _row(enc, len(raw), enc_us, dec_us, base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Throughput: SmartAPI binary packets → per-token records.
+
+Replays packets (a file recorded with QUOTE_RECORD_PATH, or synthetic ones
+for N tokens) through:
+    stock     SmartWebSocketV2._parse_binary_data → dict  (skipped if SmartApi is missing)
+    quotebook QuoteBook.ingest → preallocated record
+    callback  full worker path: QuoteBook.ingest + on_quote_packet
+              (tick buffer, Redis writer queue, bar builder; no network)
+
+Run from Backend/:
+    python -m benchmarks.quote_parser_bench                       # synthetic, all modes
+    python -m benchmarks.quote_parser_bench --packets ticks.bin   # recorded
+    python -m benchmarks.quote_parser_bench --callback            # include worker path
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from websocket_angelone.quote_parser import MODES, QuoteBook, build_packet, read_packets
+
+MODE_NAMES = {1: "LTP", 2: "QUOTE", 3: "SNAP_QUOTE"}
+
+
+def synthetic(mode: int, tokens: int, n: int) -> List[bytes]:
+    rnd = random.Random(7)
+    now_ms = int(time.time() * 1000)
+    return [
+        build_packet(
+            mode,
+            str(1000 + i % tokens),
+            100_000 + rnd.randint(-500, 500),
+            seq=i,
+            exch_ts=now_ms + i,
+            volume=i * 10,
+        )
+        for i in range(n)
+    ]
+
+
+def _run(label: str, fn: Callable[[bytes], object], packets: List[bytes], rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for p in packets:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<10} {len(packets) / best:>12,.0f} packets/s   {best / len(packets) * 1e9:8.0f} ns/packet")
+
+
+def _stock_parser():
+    try:
+        from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+    except Exception:
+        return None
+    # _parse_binary_data only uses helper methods, no connection state
+    sws = SmartWebSocketV2.__new__(SmartWebSocketV2)
+    return sws._parse_binary_data
+
+
+def _worker_callback(packets: List[bytes]):
+    try:
+        import websocket_angelone.worker as worker
+    except Exception as e:
+        print(f"  callback   skipped ({e})")
+        return None
+
+    book = worker.quote_book
+    for p in packets:
+        token = p[2:27].rstrip(b"\x00").decode()
+        worker.holding_tokens_set.add(token)
+        worker.token_to_symbol_map.setdefault(token, f"SYM{token}")
+
+    def fn(p: bytes):
+        slot = book.ingest(p)
+        if slot >= 0:
+            worker.on_quote_packet(slot)
+
+    return fn
+
+
+def bench(title: str, packets: List[bytes], args):
+    print(f"{title}: {len(packets):,} packets")
+
+    stock = _stock_parser()
+    if stock is not None:
+        _run("stock", stock, packets, args.rounds)
+    else:
+        print("  stock      skipped (SmartApi not installed)")
+
+    book = QuoteBook()
+    _run("quotebook", book.ingest, packets, args.rounds)
+
+    if args.callback:
+        fn = _worker_callback(packets)
+        if fn is not None:
+            _run("callback", fn, packets, args.rounds)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--packets", help="recorded packet file (QUOTE_RECORD_PATH format)")
+    ap.add_argument("--tokens", type=int, default=500)
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--callback", action="store_true", help="also run the full worker callback path")
+    args = ap.parse_args()
+
+    if args.packets:
+        bench(args.packets, list(read_packets(args.packets)), args)
+        return
+
+    for mode in MODES:
+        bench(f"{MODE_NAMES[mode]} (synthetic, {args.tokens} tokens)", synthetic(mode, args.tokens, args.n), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Microbenchmark: redis_safe_* helper latency, old vs new get_redis().
+
+"before" reproduces the previous get_redis(): take the global RLock and
+PING on every call before the command. "after" is the current lock-free
+get_redis() with background health checks.
+
+Run from Backend/:
+    python -m benchmarks.redis_helpers_bench              # REDIS_HOST/REDIS_PORT
+    python -m benchmarks.redis_helpers_bench --threads 8 --n 20000
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from typing import Callable, List
+
+import redis_client
+from redis_client import get_redis, redis_safe_get, redis_safe_set
+
+_legacy_lock = threading.RLock()
+
+
+def legacy_get_redis():
+    """Old behaviour: serialize on a lock and PING before handing out the client."""
+    cli = get_redis()
+    if cli is None:
+        return None
+    with _legacy_lock:
+        try:
+            cli.ping()
+            return cli
+        except Exception:
+            return None
+
+
+def legacy_safe_get(key: str):
+    r = legacy_get_redis()
+    if not r:
+        return None
+    try:
+        return r.get(key)
+    except Exception:
+        return None
+
+
+def legacy_safe_set(key: str, value) -> bool:
+    r = legacy_get_redis()
+    if not r:
+        return False
+    try:
+        r.set(key, value)
+        return True
+    except Exception:
+        return False
+
+
+def _run(fn: Callable[[int], object], n: int, threads: int) -> List[float]:
+    samples: List[float] = []
+    samples_lock = threading.Lock()
+    per_thread = max(1, n // threads)
+
+    def work():
+        local = []
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            fn(i)
+            local.append((time.perf_counter() - t0) * 1e6)
+        with samples_lock:
+            samples.extend(local)
+
+    pool = [threading.Thread(target=work) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return samples
+
+
+def _report(label: str, samples: List[float], wall: float):
+    samples.sort()
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    print(
+        f"{label:<14} n={len(samples):>7}  mean={statistics.fmean(samples):8.1f}us  "
+        f"p50={p(0.50):8.1f}us  p99={p(0.99):8.1f}us  ops/s={len(samples) / wall:10.0f}"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--threads", type=int, default=1)
+    args = ap.parse_args()
+
+    if get_redis() is None:
+        print(f"Redis not reachable at {redis_client.REDIS_HOST}:{redis_client.REDIS_PORT}")
+        return
+
+    redis_safe_set("bench:key", "1")
+
+    cases = [
+        ("get before", lambda i: legacy_safe_get("bench:key")),
+        ("get after", lambda i: redis_safe_get("bench:key")),
+        ("set before", lambda i: legacy_safe_set("bench:key", str(i))),
+        ("set after", lambda i: redis_safe_set("bench:key", str(i))),
+    ]
+
+    print(f"threads={args.threads}")
+    for label, fn in cases:
+        t0 = time.perf_counter()
+        samples = _run(fn, args.n, args.threads)
+        _report(label, samples, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+SMS ingestion cost: full-table reset_ids renumbering vs stable IDs.
+
+Copies the transactions table into a scratch schema, seeds it with N rows
+(default 100k), then inserts SMS transactions the way insert_raw_transaction
+does:
+    legacy  INSERT + commit + the old crud.reset_ids (load every row,
+            rewrite ids, restart the sequence)
+    stable  INSERT + commit (ids never change)
+and times the read-time replacement: row_number() OVER (ORDER BY id) for
+the full listing and for one account. Statements are counted per insert.
+
+Needs Postgres: app.db's engine (DB_* env) or --dsn. The scratch schema is
+dropped afterwards; public.* is never touched.
+
+Run from Backend/:
+    python -m benchmarks.txn_ids_bench
+    python -m benchmarks.txn_ids_bench --rows 100000 --legacy-rounds 3 --rounds 500
+    python -m benchmarks.txn_ids_bench --dsn postgresql://user:pw@localhost/db
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import MetaData, create_engine, event, insert, text
+from sqlalchemy.orm import Session, registry
+
+from app import crud, models
+
+BENCH_SCHEMA = "bench_txn_ids"
+SEED_CHUNK = 10_000
+ACCOUNTS = ["1000000001", "1000000002", "1000000003", "1000000004"]
+
+
+class BenchTxn:
+    pass
+
+
+def _table(engine):
+    md = MetaData()
+    table = models.Transaction.__table__.to_metadata(md, schema=BENCH_SCHEMA)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    md.create_all(engine)
+    registry().map_imperatively(BenchTxn, table)
+    return table
+
+
+def _row(i: int, base: datetime) -> dict:
+    rnd = random.Random(i)
+    ts = base + timedelta(minutes=i)
+    return {
+        "account_id": ACCOUNTS[i % len(ACCOUNTS)],
+        "bankName": "BENCH",
+        "sms_account_number": "0001",
+        "type": "debit" if rnd.random() < 0.6 else "credit",
+        "amount": round(rnd.uniform(10, 5000), 2),
+        "mode": "upi",
+        "sms_timestamp": ts.timestamp() * 1000.0,
+        "txn_datetime": ts,
+        "description": "bench",
+        "is_auto_generated": False,
+        "isSynced": True,
+    }
+
+
+def _seed(engine, table, n: int):
+    base = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        for start in range(0, n, SEED_CHUNK):
+            conn.execute(insert(table), [_row(i, base) for i in range(start, min(n, start + SEED_CHUNK))])
+
+
+# the pre-change crud.reset_ids, pointed at the scratch table
+def _legacy_reset_ids(db: Session):
+    rows = db.query(BenchTxn).order_by(BenchTxn.id).all()
+    next_id = 1
+
+    for r in rows:
+        try:
+            r.id = next_id
+        except Exception:
+            pass
+        next_id += 1
+
+    db.commit()
+
+    try:
+        db.execute(text(f"ALTER SEQUENCE {BENCH_SCHEMA}.transactions_id_seq RESTART WITH {next_id}"))
+        db.commit()
+    except Exception:
+        db.rollback()
+
+
+class _StatementCounter:
+    def __init__(self, engine):
+        self.counts = {}
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, params, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        n = len(params) if executemany and params else 1
+        self.counts[verb] = self.counts.get(verb, 0) + n
+
+    def take(self) -> dict:
+        out, self.counts = self.counts, {}
+        return out
+
+
+def _ingest(engine, rounds: int, legacy: bool, counter: _StatementCounter, first: int):
+    samples: List[float] = []
+    counter.take()
+    base = datetime(2030, 1, 1)
+    for k in range(rounds):
+        with Session(engine) as db:
+            t0 = time.perf_counter()
+            txn = BenchTxn()
+            for key, value in _row(first + k, base).items():
+                setattr(txn, key, value)
+            txn.isSynced = False
+            db.add(txn)
+            db.commit()
+            db.refresh(txn)
+            if legacy:
+                _legacy_reset_ids(db)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples, counter.take()
+
+
+def _read(engine, rounds: int, account: str = None) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        with Session(engine) as db:
+            t0 = time.perf_counter()
+            numbered = db.query(BenchTxn.id.label("numbered_id"), crud._display_no(BenchTxn)).subquery()
+            q = db.query(BenchTxn, numbered.c.display_no).join(numbered, numbered.c.numbered_id == BenchTxn.id)
+            if account:
+                q = q.filter(BenchTxn.account_id == account)
+            q.order_by(BenchTxn.txn_datetime.desc()).all()
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def _report(label: str, samples: List[float], counts: dict = None):
+    line = f"  {label:<26} p50={statistics.median(samples):9.2f} ms   max={max(samples):9.2f} ms   (n={len(samples)})"
+    if counts is not None:
+        per = {k: round(v / len(samples), 1) for k, v in sorted(counts.items())}
+        line += f"   statements/insert={per}"
+    print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--rounds", type=int, default=200, help="stable-id inserts")
+    ap.add_argument("--legacy-rounds", type=int, default=3, help="reset_ids inserts (each is O(rows))")
+    ap.add_argument("--read-rounds", type=int, default=5)
+    ap.add_argument("--dsn", help="Postgres URL (default: app.db engine from DB_* env)")
+    args = ap.parse_args()
+
+    if args.dsn:
+        engine = create_engine(args.dsn)
+    else:
+        from app.db import engine
+        engine.echo = False
+
+    table = _table(engine)
+    try:
+        t0 = time.perf_counter()
+        _seed(engine, table, args.rows)
+        print(f"seeded {args.rows:,} transactions in {time.perf_counter() - t0:.1f}s ({BENCH_SCHEMA}.transactions)\n")
+
+        counter = _StatementCounter(engine)
+
+        print("ingest one SMS:")
+        if args.legacy_rounds:
+            samples, counts = _ingest(engine, args.legacy_rounds, True, counter, args.rows)
+            _report("legacy (reset_ids)", samples, counts)
+        samples, counts = _ingest(engine, args.rounds, False, counter, args.rows + args.legacy_rounds)
+        _report("stable ids", samples, counts)
+
+        print("\nread with display_no (row_number over id):")
+        _report("all transactions", _read(engine, args.read_rounds))
+        _report("one account", _read(engine, args.read_rounds, ACCOUNTS[0]))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
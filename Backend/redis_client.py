@@ -2,7 +2,8 @@
 Safe Redis client wrapper.
 
 Exports:
- - get_redis() -> redis.Redis | None
+ - get_redis() -> redis.Redis | None   (lock-free; no per-call PING)
+ - redis_health()
  - redis_client  (backwards compatibility)
  - redis_safe_get()
  - redis_safe_set()
@@ -31,11 +32,17 @@ REDIS_DB = int(os.getenv("REDIS_DB", "0"))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))
 REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2.0"))
+# pool pings a connection before reuse if it sat idle this long
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "15"))
+# background liveness probe period
+REDIS_PROBE_INTERVAL = float(os.getenv("REDIS_PROBE_INTERVAL", "1.0"))
 
 _lock = threading.RLock()
 _redis_client: Any = None
 _last_attempt = 0.0
 _RECONNECT_COOLDOWN = 1.0
+_probe_thread: Optional[threading.Thread] = None
+_health = {"up": False, "last_ok": 0.0, "last_failure": 0.0, "failures": 0, "reconnects": 0}
 # ==================================================
 
 
@@ -55,6 +62,7 @@ def _build_client():
             password=REDIS_PASSWORD or None,
             socket_timeout=REDIS_SOCKET_TIMEOUT,
             socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
             decode_responses=False,
         )
 
@@ -66,11 +74,75 @@ def _build_client():
         return None
 
 
+# ------------------------ HEALTH ------------------------
+def _mark_down(cli: Any = None):
+    """Drop the current client so the next get_redis() reconnects (with cooldown)."""
+    global _redis_client
+
+    with _lock:
+        if cli is None or _redis_client is cli:
+            if _redis_client is not None:
+                try:
+                    _redis_client.connection_pool.disconnect()
+                except Exception:
+                    pass
+            _redis_client = None
+            _health["up"] = False
+            _health["failures"] += 1
+            _health["last_failure"] = time.time()
+
+
+def report_redis_error(exc: Exception, cli: Any = None):
+    """Connection-level errors mean Redis is down; command errors do not."""
+    if redis is not None and isinstance(exc, (redis.ConnectionError, redis.TimeoutError)):
+        _mark_down(cli)
+
+
+def _probe_loop():
+    """Background liveness probe: replaces the old PING on every get_redis()."""
+    while True:
+        time.sleep(REDIS_PROBE_INTERVAL)
+
+        cli = _redis_client
+        if cli is None:
+            # try to come back up without waiting for a caller
+            get_redis()
+            continue
+
+        try:
+            cli.ping()
+            _health["up"] = True
+            _health["last_ok"] = time.time()
+        except Exception:
+            _mark_down(cli)
+
+
+def _ensure_probe():
+    global _probe_thread
+
+    if _probe_thread is not None and _probe_thread.is_alive():
+        return
+    _probe_thread = threading.Thread(target=_probe_loop, name="redis-probe", daemon=True)
+    _probe_thread.start()
+
+
+def redis_health() -> dict:
+    return dict(_health, connected=_redis_client is not None)
+
+
 # ------------------------ GET CLIENT ------------------------
 def get_redis() -> Optional[Any]:
-    """Return a connected Redis client or None (safe for Pylance)."""
+    """
+    Return a connected Redis client or None (safe for Pylance).
+    Fast path is a plain read of the current client: no lock, no PING.
+    Liveness is tracked by the background probe and by helper errors.
+    """
     global _redis_client, _last_attempt, redis
 
+    cli = _redis_client
+    if cli is not None:
+        return cli
+
     if redis is None:
         try:
             import redis as redis_runtime
@@ -79,13 +151,8 @@ def get_redis() -> Optional[Any]:
             return None
 
     with _lock:
-        # Check working client
         if _redis_client is not None:
-            try:
-                _redis_client.ping()
-                return _redis_client
-            except Exception:
-                _redis_client = None
+            return _redis_client
 
         # Throttle reconnection attempts
         now = time.time()
@@ -93,10 +160,14 @@ def get_redis() -> Optional[Any]:
             return None
 
         _last_attempt = now
+        _ensure_probe()
 
         client = _build_client()
         if client:
             _redis_client = client
+            _health["up"] = True
+            _health["last_ok"] = now
+            _health["reconnects"] += 1
             return _redis_client
 
         return None
@@ -116,7 +187,8 @@ def redis_safe_get(key: str) -> Optional[bytes]:
         return None
     try:
         return r.get(key)
-    except Exception:
+    except Exception as e:
+        report_redis_error(e, r)
         return None
 
 
@@ -131,7 +203,8 @@ def redis_safe_set(key: str, value: Any, ex: Optional[int] = None) -> bool:
             value = value.encode("utf-8")
         r.set(key, value, ex=ex)
         return True
-    except Exception:
+    except Exception as e:
+        report_redis_error(e, r)
         return False
 
 
@@ -148,7 +221,8 @@ def redis_safe_publish(channel: str, message: Any) -> bool:
 
         r.publish(channel, message)
         return True
-    except Exception:
+    except Exception as e:
+        report_redis_error(e, r)
         return False
 
 
@@ -0,0 +1,207 @@
+"""
+Safe asyncio Redis client wrapper (async twin of redis_client.py).
+
+For `async def` routes: every call awaits on the event loop instead of
+blocking it. Same semantics as the sync helpers — a missing/unreachable
+Redis never raises, helpers just return None/False.
+
+Exports:
+ - get_redis_async() -> redis.asyncio.Redis | None
+ - redis_safe_get()
+ - redis_safe_set()
+ - redis_safe_publish()
+ - redis_safe_json_get()
+ - redis_safe_json_set()
+"""
+
+import os
+import time
+import json
+import asyncio
+from typing import Optional, TYPE_CHECKING, Any
+
+from redis_client import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+# For type hints only – Pylance safe
+if TYPE_CHECKING:
+    import redis.asyncio as aioredis
+else:
+    aioredis = None  # runtime import later
+
+
+# ===================== CONFIG =====================
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+
+_lock: Optional[asyncio.Lock] = None
+_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+_redis_client: Any = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_last_attempt = 0.0
+_RECONNECT_COOLDOWN = 1.0
+# ==================================================
+
+
+def _import_runtime() -> bool:
+    global aioredis
+    if aioredis is not None:
+        return True
+    try:
+        import redis.asyncio as aioredis_runtime
+        aioredis = aioredis_runtime
+        return True
+    except Exception:
+        return False
+
+
+# ------------------------ BUILD CLIENT ------------------------
+async def _build_client():
+    try:
+        pool = aioredis.ConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD or None,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            decode_responses=False,
+        )
+
+        cli = aioredis.Redis(connection_pool=pool)
+        await cli.ping()
+        return cli
+
+    except Exception:
+        return None
+
+
+def _mark_down(cli: Any = None):
+    global _redis_client
+    if cli is None or _redis_client is cli:
+        _redis_client = None
+
+
+def report_redis_error(exc: Exception, cli: Any = None):
+    """Connection-level errors mean Redis is down; command errors do not."""
+    if aioredis is not None and isinstance(exc, (aioredis.ConnectionError, aioredis.TimeoutError)):
+        _mark_down(cli)
+
+
+# ------------------------ GET CLIENT ------------------------
+async def get_redis_async() -> Optional[Any]:
+    """
+    Return a connected asyncio Redis client or None.
+    Clients are bound to the loop that created them, so a new loop
+    (e.g. a reload) gets its own client.
+    """
+    global _redis_client, _client_loop, _last_attempt, _lock, _lock_loop
+
+    loop = asyncio.get_running_loop()
+
+    cli = _redis_client
+    if cli is not None and _client_loop is loop:
+        return cli
+
+    if not _import_runtime():
+        return None
+
+    if _lock is None or _lock_loop is not loop:
+        _lock = asyncio.Lock()
+        _lock_loop = loop
+
+    async with _lock:
+        if _redis_client is not None and _client_loop is loop:
+            return _redis_client
+
+        # Throttle reconnection attempts
+        now = time.time()
+        if now - _last_attempt < _RECONNECT_COOLDOWN:
+            return None
+
+        _last_attempt = now
+
+        client = await _build_client()
+        if client:
+            _redis_client = client
+            _client_loop = loop
+            return _redis_client
+
+        return None
+
+
+# ===============================================================
+#        🔥 SAFE ASYNC REDIS HELPERS
+# ===============================================================
+
+async def redis_safe_get(key: str) -> Optional[bytes]:
+    r = await get_redis_async()
+    if not r:
+        return None
+    try:
+        return await r.get(key)
+    except Exception as e:
+        report_redis_error(e, r)
+        return None
+
+
+async def redis_safe_set(key: str, value: Any, ex: Optional[int] = None) -> bool:
+    r = await get_redis_async()
+    if not r:
+        return False
+    try:
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value).encode("utf-8")
+        elif isinstance(value, str):
+            value = value.encode("utf-8")
+        await r.set(key, value, ex=ex)
+        return True
+    except Exception as e:
+        report_redis_error(e, r)
+        return False
+
+
+async def redis_safe_publish(channel: str, message: Any) -> bool:
+    r = await get_redis_async()
+    if not r:
+        return False
+
+    try:
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message).encode("utf-8")
+        elif isinstance(message, str):
+            message = message.encode("utf-8")
+
+        await r.publish(channel, message)
+        return True
+    except Exception as e:
+        report_redis_error(e, r)
+        return False
+
+
+async def redis_safe_json_get(key: str):
+    raw = await redis_safe_get(key)
+    if not raw:
+        return None
+
+    try:
+        if isinstance(raw, (bytes, bytearray)):
+            return json.loads(raw.decode("utf-8"))
+        return json.loads(raw)
+    except Exception:
+        return None
+
+
+async def redis_safe_json_set(key: str, value: Any, ex: Optional[int] = None) -> bool:
+    try:
+        return await redis_safe_set(key, json.dumps(value), ex=ex)
+    except Exception:
+        return False
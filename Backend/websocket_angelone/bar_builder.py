@@ -0,0 +1,258 @@
+"""
+Streaming intraday OHLCV bars (1m / 5m / 15m) built from live ticks.
+
+All state lives in NumPy structured arrays indexed by a per-token slot,
+never in per-bar dicts:
+
+    current[iv]   (slots,)                 the open bar per token
+    ring[iv]      (slots, capacity[iv])    last capacity[iv] finished bars per token
+
+capacity[iv] is one session of bars (BAR_SESSION_SECONDS / iv, +1), so the
+5m/15m rings are a fraction of the 1m one. Slot rows grow by doubling as
+tokens appear, up to max_tokens, so memory follows the subscribed tokens.
+
+update() is O(intervals) per tick. A bar is finished when a tick lands in a
+later bucket, or by close_stale() once its bucket has passed (quiet
+symbols). Finished bars are also queued for the bulk Postgres flush
+(drain_finished()).
+
+Bucket starts are aligned to epoch seconds; IST (+05:30) is a whole number
+of 15-minute buckets, so they also line up with the 09:15 market open.
+Volume is the difference of the feed's cumulative day volume when the
+subscription mode provides it (0 in LTP-only mode); `ticks` always counts.
+"""
+
+import os
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BAR_INTERVALS: Tuple[int, ...] = (60, 300, 900)
+# NSE cash session 09:15-15:30; ring capacity per interval is derived from it
+BAR_SESSION_SECONDS = int(os.getenv("BAR_SESSION_SECONDS", str(6 * 3600 + 15 * 60)))
+BAR_MAX_TOKENS = int(os.getenv("BAR_MAX_TOKENS", "2048"))
+BAR_INITIAL_SLOTS = 64
+
+BAR_DTYPE = np.dtype([
+    ("start", "<i8"),     # bucket start, epoch seconds
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("ticks", "<i4"),
+])
+
+INTERVAL_NAMES = {"1m": 60, "5m": 300, "15m": 900}
+
+# (token, interval_s, start, open, high, low, close, volume, ticks)
+FinishedBar = Tuple[str, int, int, float, float, float, float, float, int]
+
+
+def parse_interval(value) -> Optional[int]:
+    """'1m' / '5m' / '15m' / seconds -> seconds, or None if not built."""
+    if isinstance(value, str):
+        value = INTERVAL_NAMES.get(value.strip().lower(), value)
+    try:
+        iv = int(value)
+    except (TypeError, ValueError):
+        return None
+    return iv if iv in BAR_INTERVALS else None
+
+
+def ring_capacity(interval: int, session_s: int = BAR_SESSION_SECONDS) -> int:
+    """Finished bars kept per token: one full session, plus the bar straddling the close."""
+    return math.ceil(session_s / interval) + 1
+
+
+class BarBuilder:
+    def __init__(
+        self,
+        intervals: Sequence[int] = BAR_INTERVALS,
+        session_s: int = BAR_SESSION_SECONDS,
+        max_tokens: int = BAR_MAX_TOKENS,
+    ):
+        self.intervals = tuple(intervals)
+        self.capacity = {iv: ring_capacity(iv, session_s) for iv in self.intervals}
+        self.max_tokens = max_tokens
+
+        self._slots: Dict[str, int] = {}
+        self._tokens: List[str] = []
+
+        rows = min(BAR_INITIAL_SLOTS, max_tokens)
+        self.current = {iv: np.zeros(rows, dtype=BAR_DTYPE) for iv in self.intervals}
+        self.ring = {iv: np.zeros((rows, self.capacity[iv]), dtype=BAR_DTYPE) for iv in self.intervals}
+        # next write position / number of finished bars held, per token
+        self._head = {iv: np.zeros(rows, dtype=np.int64) for iv in self.intervals}
+        self._count = {iv: np.zeros(rows, dtype=np.int64) for iv in self.intervals}
+
+        # last cumulative day volume seen per token (-1 = none yet)
+        self._cum_volume = np.full(rows, -1.0)
+
+        self._finished: List[FinishedBar] = []
+        self._lock = threading.Lock()
+
+        self.ticks = 0
+        self.bars_finished = 0
+        self.tokens_rejected = 0
+
+    # ------------------------ SLOTS ------------------------
+    def _slot(self, token: str) -> int:
+        slot = self._slots.get(token)
+        if slot is None:
+            if len(self._tokens) >= self.max_tokens:
+                return -1
+            slot = len(self._tokens)
+            if slot >= len(self._cum_volume):
+                self._grow(min(2 * slot, self.max_tokens))
+            self._slots[token] = slot
+            self._tokens.append(token)
+        return slot
+
+    def _grow(self, rows: int):
+        """Reallocate every per-slot array with `rows` rows (existing slots copied)."""
+        def grown(arr: np.ndarray, fill=0) -> np.ndarray:
+            out = np.full((rows,) + arr.shape[1:], fill, dtype=arr.dtype)
+            out[: len(arr)] = arr
+            return out
+
+        for iv in self.intervals:
+            self.current[iv] = grown(self.current[iv])
+            self.ring[iv] = grown(self.ring[iv])
+            self._head[iv] = grown(self._head[iv])
+            self._count[iv] = grown(self._count[iv])
+        self._cum_volume = grown(self._cum_volume, -1.0)
+
+    def slot_of(self, token: str) -> Optional[int]:
+        return self._slots.get(token)
+
+    # ------------------------ HOT PATH ------------------------
+    def update(self, token: str, price: float, ts_s: int, cum_volume: Optional[float] = None):
+        """One tick: price at ts_s (epoch seconds); cum_volume = day volume so far."""
+        with self._lock:
+            slot = self._slot(token)
+            if slot < 0:
+                self.tokens_rejected += 1
+                return
+            self.ticks += 1
+
+            vol = 0.0
+            if cum_volume is not None:
+                last = self._cum_volume[slot]
+                if last >= 0 and cum_volume >= last:
+                    vol = cum_volume - last
+                self._cum_volume[slot] = cum_volume
+
+            for iv in self.intervals:
+                cur = self.current[iv]
+                start = ts_s - ts_s % iv
+
+                if cur["ticks"][slot] and cur["start"][slot] == start:
+                    if price > cur["high"][slot]:
+                        cur["high"][slot] = price
+                    if price < cur["low"][slot]:
+                        cur["low"][slot] = price
+                    cur["close"][slot] = price
+                    cur["volume"][slot] += vol
+                    cur["ticks"][slot] += 1
+                    continue
+
+                if cur["ticks"][slot]:
+                    if start < cur["start"][slot]:
+                        continue  # late tick for an already-finished bucket
+                    self._finish(iv, slot)
+
+                cur[slot] = (start, price, price, price, price, vol, 1)
+
+    def _finish(self, iv: int, slot: int):
+        bar = self.current[iv][slot].copy()
+        head = self._head[iv][slot]
+        self.ring[iv][slot, head] = bar
+        self._head[iv][slot] = (head + 1) % self.capacity[iv]
+        self._count[iv][slot] = min(self._count[iv][slot] + 1, self.capacity[iv])
+        self.current[iv]["ticks"][slot] = 0
+
+        self._finished.append((
+            self._tokens[slot], iv, int(bar["start"]),
+            float(bar["open"]), float(bar["high"]), float(bar["low"]), float(bar["close"]),
+            float(bar["volume"]), int(bar["ticks"]),
+        ))
+        self.bars_finished += 1
+
+    def close_stale(self, now_s: int) -> int:
+        """Finish every open bar whose bucket has ended (no tick needed)."""
+        closed = 0
+        with self._lock:
+            n = len(self._tokens)
+            for iv in self.intervals:
+                cur = self.current[iv][:n]
+                stale = np.nonzero((cur["ticks"] > 0) & (cur["start"] + iv <= now_s))[0]
+                for slot in stale:
+                    self._finish(iv, int(slot))
+                closed += len(stale)
+        return closed
+
+    def drain_finished(self) -> List[FinishedBar]:
+        with self._lock:
+            out, self._finished = self._finished, []
+        return out
+
+    def requeue(self, bars: List[FinishedBar]):
+        """Put back bars whose DB flush failed (kept ahead of newer ones)."""
+        with self._lock:
+            self._finished = bars + self._finished
+
+    # ------------------------ READ ------------------------
+    def bars(self, token: str, interval: int, limit: int = 100, include_current: bool = True) -> np.ndarray:
+        """Oldest→newest finished bars (+ the open one) as a BAR_DTYPE array copy."""
+        with self._lock:
+            slot = self._slots.get(token)
+            if slot is None or interval not in self.ring:
+                return np.zeros(0, dtype=BAR_DTYPE)
+
+            count = int(self._count[interval][slot])
+            head = int(self._head[interval][slot])
+            idx = (np.arange(head - count, head) % self.capacity[interval])
+            out = self.ring[interval][slot, idx]
+
+            cur = self.current[interval][slot]
+            if include_current and cur["ticks"]:
+                out = np.concatenate([out, cur.reshape(1)])
+            return out[-limit:].copy() if limit else out.copy()
+
+    def current_bar(self, token: str, interval: int) -> Optional[dict]:
+        with self._lock:
+            slot = self._slots.get(token)
+            if slot is None or interval not in self.current:
+                return None
+            cur = self.current[interval][slot]
+            return bar_to_dict(cur) if cur["ticks"] else None
+
+    def stats(self) -> dict:
+        return {
+            "tokens": len(self._tokens),
+            "slots": len(self._cum_volume),
+            "max_tokens": self.max_tokens,
+            "ring_capacity": {str(iv): cap for iv, cap in self.capacity.items()},
+            "memory_bytes": sum(self.ring[iv].nbytes + self.current[iv].nbytes for iv in self.intervals),
+            "ticks": self.ticks,
+            "bars_finished": self.bars_finished,
+            "pending_flush": len(self._finished),
+            "tokens_rejected": self.tokens_rejected,
+        }
+
+
+# ------------------------ CONVERSION ------------------------
+def bar_to_dict(bar) -> dict:
+    return {
+        "time": int(bar["start"]),
+        "open": float(bar["open"]),
+        "high": float(bar["high"]),
+        "low": float(bar["low"]),
+        "close": float(bar["close"]),
+        "volume": float(bar["volume"]),
+        "ticks": int(bar["ticks"]),
+    }
+
@@ -0,0 +1,142 @@
+"""
+Hash index over the Angel One scrip master.
+
+Built once per instrument refresh so mapping a holding symbol to a token is a
+single dict lookup instead of a scan over every instrument row.
+
+Keys (all upper-cased):
+ - (exch_seg, symbol)        e.g. ("NSE", "RELIANCE-EQ")
+ - (exch_seg, name)          e.g. ("NSE", "RELIANCE")
+ - (exch_seg, "-EQ" base)    e.g. ("NSE", "RELIANCE")  from "RELIANCE-EQ"
+
+The index is persisted next to the instruments cache together with the
+timestamp of the instrument refresh it was built from, so a restart can
+reuse it without touching the scrip master at all.
+"""
+
+import os
+import json
+from typing import Dict, Optional
+
+EQ_SUFFIX = "-EQ"
+
+# exch_seg -> key -> token
+_Table = Dict[str, Dict[str, str]]
+
+
+class InstrumentIndex:
+    def __init__(
+        self,
+        by_symbol: Optional[_Table] = None,
+        by_name: Optional[_Table] = None,
+        by_eq_base: Optional[_Table] = None,
+        source_ts: float = 0.0,
+        count: int = 0,
+    ):
+        self.by_symbol: _Table = by_symbol or {}
+        self.by_name: _Table = by_name or {}
+        self.by_eq_base: _Table = by_eq_base or {}
+        self.source_ts = float(source_ts)
+        self.count = int(count)
+
+    # ------------------------ BUILD ------------------------
+    @classmethod
+    def from_store(cls, store) -> "InstrumentIndex":
+        """Build straight from the columnar InstrumentStore (no per-row dicts)."""
+        idx = cls(source_ts=store.source_ts)
+
+        columns = zip(
+            store.column("token").tolist(),
+            store.column("symbol").tolist(),
+            store.column("name").tolist(),
+            store.column("exch_seg").tolist(),
+        )
+        for token, symbol, name, exch in columns:
+            idx.add(
+                token=token.decode("utf-8"),
+                symbol=symbol.decode("utf-8"),
+                name=name.decode("utf-8"),
+                exch=exch.decode("utf-8"),
+            )
+
+        return idx
+
+    def add(self, token: str, symbol: str, name: str, exch: str):
+        if not token or not exch:
+            return
+
+        self.count += 1
+        is_equity = symbol.endswith(EQ_SUFFIX)
+
+        if symbol:
+            self.by_symbol.setdefault(exch, {})[symbol] = token
+
+            if is_equity:
+                base = symbol[: -len(EQ_SUFFIX)]
+                if base:
+                    self.by_eq_base.setdefault(exch, {})[base] = token
+
+        if name:
+            names = self.by_name.setdefault(exch, {})
+            # Many series share a name (-EQ, -BE, -BL …); prefer the equity row
+            if name not in names or is_equity:
+                names[name] = token
+
+    # ------------------------ LOOKUP ------------------------
+    def resolve(self, symbol: str, exch: str = "NSE") -> Optional[str]:
+        """
+        Token for a holding symbol.
+        Same precedence the old scan used: "<SYM>-EQ" first, then an exact
+        symbol match, then an instrument name match.
+        """
+        sym = (symbol or "").strip().upper()
+        exch = (exch or "").strip().upper()
+        if not sym:
+            return None
+
+        return (
+            self.by_eq_base.get(exch, {}).get(sym)
+            or self.by_symbol.get(exch, {}).get(sym)
+            or self.by_name.get(exch, {}).get(sym)
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    # ------------------------ PERSISTENCE ------------------------
+    def to_dict(self) -> dict:
+        return {
+            "source_ts": self.source_ts,
+            "count": self.count,
+            "by_symbol": self.by_symbol,
+            "by_name": self.by_name,
+            "by_eq_base": self.by_eq_base,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InstrumentIndex":
+        return cls(
+            by_symbol=data.get("by_symbol") or {},
+            by_name=data.get("by_name") or {},
+            by_eq_base=data.get("by_eq_base") or {},
+            source_ts=data.get("source_ts", 0.0),
+            count=data.get("count", 0),
+        )
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["InstrumentIndex"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                return None
+            return cls.from_dict(data)
+        except Exception:
+            return None
@@ -0,0 +1,179 @@
+"""
+Compact columnar on-disk cache of the Angel One scrip master.
+
+Only the fields the worker needs are kept, one fixed-width NumPy column each:
+token, symbol, name, exch_seg, expiry (bytes) and lotsize (int32).
+
+File layout:
+    b"OFINST1\\n"                     8-byte magic
+    uint32 (little endian)           header length
+    header JSON                      rows, source_ts, column dtype/offset/nbytes
+    column blocks                    each aligned to ALIGN bytes
+
+The loader memory-maps the file and exposes each column as a zero-copy
+NumPy view, so readers never materialize one dict per instrument row.
+"""
+
+import os
+import json
+import mmap
+import struct
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+MAGIC = b"OFINST1\n"
+ALIGN = 64
+VERSION = 1
+
+STRING_COLUMNS = ("token", "symbol", "name", "exch_seg", "expiry")
+INT_COLUMNS = ("lotsize",)
+COLUMNS = STRING_COLUMNS + INT_COLUMNS
+
+
+def _pad(n: int) -> int:
+    return (ALIGN - n % ALIGN) % ALIGN
+
+
+def _encode(value, upper: bool = False) -> bytes:
+    text = str(value if value is not None else "").strip()
+    if upper:
+        text = text.upper()
+    return text.encode("utf-8")
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(str(value)))
+    except Exception:
+        return 0
+
+
+# ------------------------ WRITE ------------------------
+def build_columns(instruments: Iterable[dict]) -> Dict[str, np.ndarray]:
+    """Project scrip master rows onto the cached columns."""
+    raw: Dict[str, List] = {c: [] for c in COLUMNS}
+
+    for row in instruments:
+        if not isinstance(row, dict):
+            continue
+        raw["token"].append(_encode(row.get("token")))
+        raw["symbol"].append(_encode(row.get("symbol"), upper=True))
+        raw["name"].append(_encode(row.get("name"), upper=True))
+        raw["exch_seg"].append(_encode(row.get("exch_seg"), upper=True))
+        raw["expiry"].append(_encode(row.get("expiry"), upper=True))
+        raw["lotsize"].append(_to_int(row.get("lotsize")))
+
+    cols: Dict[str, np.ndarray] = {}
+    for c in STRING_COLUMNS:
+        width = max((len(v) for v in raw[c]), default=1) or 1
+        cols[c] = np.array(raw[c], dtype=f"S{width}")
+    for c in INT_COLUMNS:
+        cols[c] = np.array(raw[c], dtype="<i4")
+    return cols
+
+
+def write_store(path: str, instruments: Iterable[dict], source_ts: Optional[float] = None) -> int:
+    """Write the columnar cache atomically. Returns the row count."""
+    cols = build_columns(instruments)
+    rows = len(cols["token"])
+
+    columns_meta = []
+    offset = 0
+    for c in COLUMNS:
+        arr = cols[c]
+        columns_meta.append({
+            "name": c,
+            "dtype": arr.dtype.str,
+            "offset": offset,
+            "nbytes": int(arr.nbytes),
+        })
+        offset += arr.nbytes + _pad(arr.nbytes)
+
+    header = json.dumps({
+        "version": VERSION,
+        "rows": rows,
+        "source_ts": float(source_ts if source_ts is not None else time.time()),
+        "columns": columns_meta,
+    }).encode("utf-8")
+
+    prefix_len = len(MAGIC) + 4 + len(header)
+    data_start = prefix_len + _pad(prefix_len)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - prefix_len))
+        for c in COLUMNS:
+            buf = cols[c].tobytes()
+            f.write(buf)
+            f.write(b"\0" * _pad(len(buf)))
+    os.replace(tmp, path)
+    return rows
+
+
+# ------------------------ READ ------------------------
+class InstrumentStore:
+    """Read-only, memory-mapped view of a columnar instruments cache."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        if self._mm[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an instruments store")
+
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mm[header_start: header_start + header_len].decode("utf-8"))
+
+        prefix_len = header_start + header_len
+        data_start = prefix_len + _pad(prefix_len)
+
+        self.rows: int = int(header.get("rows", 0))
+        self.source_ts: float = float(header.get("source_ts", 0.0))
+        self._columns: Dict[str, np.ndarray] = {}
+        for meta in header.get("columns", []):
+            dtype = np.dtype(meta["dtype"])
+            self._columns[meta["name"]] = np.frombuffer(
+                self._mm,
+                dtype=dtype,
+                count=self.rows,
+                offset=data_start + int(meta["offset"]),
+            )
+
+    @classmethod
+    def open(cls, path: str) -> Optional["InstrumentStore"]:
+        try:
+            return cls(path)
+        except Exception:
+            return None
+
+    def close(self):
+        # NumPy views keep the buffer exported; drop them before unmapping
+        self._columns = {}
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
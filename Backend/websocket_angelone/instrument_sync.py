@@ -0,0 +1,145 @@
+"""
+Conditional scrip master download and snapshot diffing.
+
+ - conditional_download(): If-None-Match / If-Modified-Since + sha256 of the
+   body, so an unchanged scrip master is neither parsed nor rewritten.
+ - diff_snapshots(): added / removed / changed (exch_seg, token) keys between
+   two InstrumentStore snapshots, used to patch the live symbol maps instead
+   of rebuilding them.
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, Optional, Set, Tuple
+
+import requests
+
+# (exch_seg, token)
+InstrumentKey = Tuple[str, str]
+
+
+# ------------------------ META SIDECAR ------------------------
+def load_meta(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_meta(path: str, meta: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=4)
+    os.replace(tmp, path)
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+# ------------------------ DOWNLOAD ------------------------
+class DownloadResult:
+    """
+    status:
+      "not_modified" → server answered 304
+      "unchanged"    → 200 but same sha256 as the previous snapshot
+      "changed"      → new content in `body`
+    """
+
+    def __init__(self, status: str, meta: dict, body: Optional[bytes] = None):
+        self.status = status
+        self.meta = meta
+        self.body = body
+
+    @property
+    def changed(self) -> bool:
+        return self.status == "changed"
+
+
+def conditional_download(url: str, meta: dict, timeout: float = 12, have_snapshot: bool = True) -> DownloadResult:
+    """
+    GET `url` using validators from `meta` (etag / last_modified / sha256).
+    Validators are only sent when a local snapshot exists to fall back on.
+    Raises on network / HTTP errors like requests does.
+    """
+    headers = {}
+    if have_snapshot:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    resp = requests.get(url, headers=headers, timeout=timeout)
+
+    new_meta = dict(meta)
+    if resp.status_code == 304 and have_snapshot:
+        return DownloadResult("not_modified", new_meta)
+
+    resp.raise_for_status()
+
+    body = resp.content
+    digest = content_hash(body)
+
+    new_meta["etag"] = resp.headers.get("ETag") or None
+    new_meta["last_modified"] = resp.headers.get("Last-Modified") or None
+
+    if have_snapshot and digest == meta.get("sha256"):
+        return DownloadResult("unchanged", new_meta)
+
+    new_meta["sha256"] = digest
+    return DownloadResult("changed", new_meta, body)
+
+
+# ------------------------ DIFF ------------------------
+class InstrumentDelta:
+    def __init__(
+        self,
+        added: Optional[Set[InstrumentKey]] = None,
+        removed: Optional[Set[InstrumentKey]] = None,
+        changed: Optional[Set[InstrumentKey]] = None,
+    ):
+        self.added: Set[InstrumentKey] = added or set()
+        self.removed: Set[InstrumentKey] = removed or set()
+        self.changed: Set[InstrumentKey] = changed or set()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def tokens(self, exch: str = "NSE") -> Set[str]:
+        """Every token of one exchange touched by this delta."""
+        exch = exch.upper()
+        return {tok for ex, tok in self.added | self.removed | self.changed if ex == exch}
+
+    def summary(self) -> str:
+        return f"+{len(self.added)} -{len(self.removed)} ~{len(self.changed)}"
+
+
+def snapshot(store) -> Dict[InstrumentKey, Tuple[bytes, bytes]]:
+    """(exch_seg, token) → (symbol, name), straight from the store columns."""
+    if store is None or not len(store):
+        return {}
+
+    exch = store.column("exch_seg").tolist()
+    token = store.column("token").tolist()
+    symbol = store.column("symbol").tolist()
+    name = store.column("name").tolist()
+
+    return {
+        (e.decode("utf-8"), t.decode("utf-8")): (s, n)
+        for e, t, s, n in zip(exch, token, symbol, name)
+    }
+
+
+def diff_snapshots(before: dict, after: dict) -> InstrumentDelta:
+    before_keys = before.keys()
+    after_keys = after.keys()
+
+    return InstrumentDelta(
+        added=set(after_keys - before_keys),
+        removed=set(before_keys - after_keys),
+        changed={k for k in after_keys & before_keys if before[k] != after[k]},
+    )
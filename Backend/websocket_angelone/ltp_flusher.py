@@ -0,0 +1,196 @@
+"""
+Single adaptive flusher: tick_buffer → holding.Ltp.
+
+Replaces the two fixed 5s loops that used to race on the same buffer. One
+thread polls every LTP_FLUSH_POLL_MS and flushes when either
+
+    * the dirty set reaches LTP_FLUSH_BATCH symbols (busy market: flush
+      sooner, but never more often than LTP_FLUSH_MIN_INTERVAL), or
+    * the current interval has elapsed since the previous flush.
+
+The interval starts at LTP_FLUSH_INTERVAL. A failed flush, or one slower
+than LTP_FLUSH_SLOW_MS, doubles it (up to LTP_FLUSH_MAX_INTERVAL) so a
+struggling DB gets bigger, rarer batches; each healthy flush halves it back
+towards the base.
+
+The flush function itself (worker.update_holdings_batch) returns a
+FlushResult, which this module turns into metrics: batch size, rows skipped
+as unchanged, DB time and flush lag (oldest tick in the batch → commit).
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional
+
+LTP_FLUSH_INTERVAL = float(os.getenv("LTP_FLUSH_INTERVAL", "5"))
+LTP_FLUSH_MIN_INTERVAL = float(os.getenv("LTP_FLUSH_MIN_INTERVAL", "0.5"))
+LTP_FLUSH_MAX_INTERVAL = float(os.getenv("LTP_FLUSH_MAX_INTERVAL", "60"))
+LTP_FLUSH_BATCH = int(os.getenv("LTP_FLUSH_BATCH", "500"))
+LTP_FLUSH_SLOW_MS = float(os.getenv("LTP_FLUSH_SLOW_MS", "1000"))
+LTP_FLUSH_POLL_MS = float(os.getenv("LTP_FLUSH_POLL_MS", "100"))
+METRIC_SAMPLES = 512
+
+
+class FlushResult:
+    __slots__ = ("ok", "rows", "skipped", "db_ms", "lag_ms")
+
+    def __init__(self, ok: bool, rows: int = 0, skipped: int = 0, db_ms: float = 0.0, lag_ms: float = 0.0):
+        self.ok = ok
+        self.rows = rows            # rows sent to the DB
+        self.skipped = skipped      # dirty symbols whose price matched the last commit
+        self.db_ms = db_ms
+        self.lag_ms = lag_ms
+
+
+class _Window:
+    """Last N samples; percentiles computed on read."""
+
+    def __init__(self, maxlen: int = METRIC_SAMPLES):
+        self._samples: Deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+
+    def add(self, value: float):
+        self._samples.append(value)
+        self.count += 1
+
+    def summary(self) -> dict:
+        s = sorted(self._samples)
+        if not s:
+            return {"count": self.count}
+        p = lambda q: round(s[min(len(s) - 1, int(q * len(s)))], 3)
+        return {"count": self.count, "last": round(self._samples[-1], 3), "p50": p(0.50), "p95": p(0.95), "max": round(s[-1], 3)}
+
+
+class AdaptiveLtpFlusher:
+    def __init__(
+        self,
+        flush: Callable[[], Optional[FlushResult]],
+        pending: Callable[[], int],
+        active: Optional[Callable[[], bool]] = None,
+        on_activate: Optional[Callable[[], None]] = None,
+        interval: float = LTP_FLUSH_INTERVAL,
+        min_interval: float = LTP_FLUSH_MIN_INTERVAL,
+        max_interval: float = LTP_FLUSH_MAX_INTERVAL,
+        batch: int = LTP_FLUSH_BATCH,
+        slow_ms: float = LTP_FLUSH_SLOW_MS,
+        poll_ms: float = LTP_FLUSH_POLL_MS,
+    ):
+        self.flush = flush
+        self.pending = pending
+        self.active = active
+        self.on_activate = on_activate
+
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch = batch
+        self.slow_ms = slow_ms
+        self.poll = poll_ms / 1000.0
+
+        self.interval = interval
+        self._last_flush = time.monotonic()
+        self._was_active = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # metrics
+        self.flushes = 0
+        self.early_flushes = 0
+        self.failures = 0
+        self.backoffs = 0
+        self.rows_written = 0
+        self.rows_skipped = 0
+        self.batch_size = _Window()
+        self.db_ms = _Window()
+        self.lag_ms = _Window()
+
+    # ------------------------ LIFECYCLE ------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ltp-db-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------ LOOP ------------------------
+    def _run(self):
+        while not self._stop.wait(self.poll):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[AdaptiveLtpFlusher] error: {e}")
+
+    def tick(self) -> bool:
+        """One scheduling decision. Returns True if a flush ran."""
+        if self.active is not None and not self.active():
+            self._was_active = False
+            return False
+
+        if not self._was_active:
+            # (re)gained the right to write: forget what an earlier term committed
+            self._was_active = True
+            if self.on_activate is not None:
+                self.on_activate()
+
+        now = time.monotonic()
+        since = now - self._last_flush
+        due = since >= self.interval
+        early = not due and since >= self.min_interval and self.pending() >= self.batch
+        if not (due or early):
+            return False
+
+        self._last_flush = now
+        result = self.flush()
+        if early:
+            self.early_flushes += 1
+        self._record(result)
+        self._last_flush = time.monotonic()
+        return True
+
+    def _record(self, result: Optional[FlushResult]):
+        if result is None:
+            # nothing was dirty; stay on the current cadence
+            return
+
+        self.flushes += 1
+        if not result.ok:
+            self.failures += 1
+            self._back_off()
+            return
+
+        self.rows_written += result.rows
+        self.rows_skipped += result.skipped
+        self.batch_size.add(result.rows)
+        self.db_ms.add(result.db_ms)
+        self.lag_ms.add(result.lag_ms)
+
+        if result.db_ms > self.slow_ms:
+            self._back_off()
+        else:
+            self.interval = max(self.base_interval, self.interval / 2)
+
+    def _back_off(self):
+        self.backoffs += 1
+        self.interval = min(self.max_interval, self.interval * 2)
+
+    def stats(self) -> dict:
+        return {
+            "interval_s": self.interval,
+            "base_interval_s": self.base_interval,
+            "batch_trigger": self.batch,
+            "pending": self.pending(),
+            "flushes": self.flushes,
+            "early_flushes": self.early_flushes,
+            "failures": self.failures,
+            "backoffs": self.backoffs,
+            "rows_written": self.rows_written,
+            "rows_skipped_unchanged": self.rows_skipped,
+            "batch_size": self.batch_size.summary(),
+            "db_ms": self.db_ms.summary(),
+            "flush_lag_ms": self.lag_ms.summary(),
+        }
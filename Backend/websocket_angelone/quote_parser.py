@@ -0,0 +1,290 @@
+"""
+Zero-dict parser for SmartAPI WebSocket V2 binary market-data packets.
+
+SmartWebSocketV2 turns every packet into a dict of ~40 keys before calling
+on_data. QuoteBook instead copies the raw little-endian packet straight into
+a preallocated NumPy record per token (one memcpy, no per-tick objects).
+The record dtype IS the packet layout, so fields are read back with plain
+array indexing and prices are converted (paise → rupees) only on read.
+
+Packet layouts (bytes):
+    LTP        (mode 1)   51   mode, exch, token[25], seq, exch_ts, ltp
+    QUOTE      (mode 2)  123   + ltq, atp, volume, total buy/sell qty, OHLC
+    SNAP_QUOTE (mode 3)  379   + last traded ts, OI, OI %, best 5 bid/ask,
+                               circuits, 52-week high/low
+
+Also: helpers to build synthetic packets and to record / replay raw packet
+files (<u4 length><bytes> frames) for benchmarks and load tests.
+"""
+
+import os
+import time
+import struct
+import threading
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+import numpy as np
+
+MODE_LTP = 1
+MODE_QUOTE = 2
+MODE_SNAP_QUOTE = 3
+MODES = (MODE_LTP, MODE_QUOTE, MODE_SNAP_QUOTE)
+
+DEPTH_DTYPE = np.dtype([
+    ("flag", "<u2"),        # 1 = buy, 0 = sell
+    ("qty", "<i8"),
+    ("price", "<i8"),       # paise
+    ("orders", "<u2"),
+])
+
+QUOTE_DTYPE = np.dtype([
+    ("mode", "u1"),
+    ("exch", "u1"),
+    ("token", "S25"),
+    ("seq", "<i8"),
+    ("exch_ts", "<i8"),
+    ("ltp", "<i8"),
+    # QUOTE
+    ("ltq", "<i8"),
+    ("atp", "<i8"),
+    ("volume", "<i8"),
+    ("total_buy_qty", "<f8"),
+    ("total_sell_qty", "<f8"),
+    ("open", "<i8"),
+    ("high", "<i8"),
+    ("low", "<i8"),
+    ("close", "<i8"),
+    # SNAP_QUOTE
+    ("last_traded_ts", "<i8"),
+    ("oi", "<i8"),
+    ("oi_change_pct", "<i8"),
+    ("depth", DEPTH_DTYPE, (10,)),
+    ("upper_circuit", "<i8"),
+    ("lower_circuit", "<i8"),
+    ("high_52w", "<i8"),
+    ("low_52w", "<i8"),
+])
+
+PACKET_SIZE = {MODE_LTP: 51, MODE_QUOTE: 123, MODE_SNAP_QUOTE: 379}
+RECORD_SIZE = QUOTE_DTYPE.itemsize
+assert RECORD_SIZE == PACKET_SIZE[MODE_SNAP_QUOTE]
+
+_TOKEN = slice(2, 27)
+_PRICE_FIELDS = ("ltp", "atp", "open", "high", "low", "close",
+                 "upper_circuit", "lower_circuit", "high_52w", "low_52w")
+QUOTE_MAX_TOKENS = int(os.getenv("QUOTE_MAX_TOKENS", "4096"))
+
+
+class QuoteBook:
+    def __init__(self, max_tokens: int = QUOTE_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.records = np.zeros(max_tokens, dtype=QUOTE_DTYPE)
+        self.updates = np.zeros(max_tokens, dtype=np.int64)
+
+        # raw byte view of `records` for the per-packet memcpy
+        self._mv = memoryview(self.records.view(np.uint8))
+
+        self._slots: Dict[bytes, int] = {}
+        self.tokens: List[str] = []
+        self._lock = threading.Lock()
+
+        self.packets = 0
+        self.rejected = 0
+
+    # ------------------------ SLOTS ------------------------
+    def _register(self, raw_token: bytes) -> int:
+        with self._lock:
+            slot = self._slots.get(raw_token)
+            if slot is not None:
+                return slot
+            if len(self.tokens) >= self.max_tokens:
+                return -1
+            slot = len(self.tokens)
+            self._slots[raw_token] = slot
+            self.tokens.append(raw_token.rstrip(b"\x00").decode("ascii", "ignore"))
+            return slot
+
+    def slot_of(self, token: str) -> Optional[int]:
+        return self._slots.get(token.encode("ascii").ljust(25, b"\x00"))
+
+    # ------------------------ HOT PATH ------------------------
+    def ingest(self, data: bytes) -> int:
+        """Copy one binary packet into its token's record. Returns the slot (-1 if rejected)."""
+        n = len(data)
+        if n < PACKET_SIZE[MODE_LTP]:
+            self.rejected += 1
+            return -1
+
+        key = data[_TOKEN]
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._register(key)
+            if slot < 0:
+                self.rejected += 1
+                return -1
+
+        if n > RECORD_SIZE:
+            n = RECORD_SIZE
+        off = slot * RECORD_SIZE
+        self._mv[off:off + n] = data[:n] if n != len(data) else data
+        self.updates[slot] += 1
+        self.packets += 1
+        return slot
+
+    # ------------------------ READ ------------------------
+    def ltp(self, slot: int) -> float:
+        return int(self.records["ltp"][slot]) / 100.0
+
+    def exch_ts(self, slot: int) -> int:
+        return int(self.records["exch_ts"][slot])
+
+    def volume(self, slot: int) -> Optional[int]:
+        """Cumulative day volume (None in LTP-only mode)."""
+        if self.records["mode"][slot] < MODE_QUOTE:
+            return None
+        return int(self.records["volume"][slot])
+
+    def quote(self, slot: int) -> dict:
+        """Decoded view of one record (for APIs / analytics, not the hot path)."""
+        rec = self.records[slot]
+        mode = int(rec["mode"])
+        out = {
+            "token": self.tokens[slot],
+            "mode": mode,
+            "exchange_type": int(rec["exch"]),
+            "seq": int(rec["seq"]),
+            "exchange_timestamp": int(rec["exch_ts"]),
+            "ltp": int(rec["ltp"]) / 100.0,
+            "updates": int(self.updates[slot]),
+        }
+        if mode >= MODE_QUOTE:
+            out.update({
+                "ltq": int(rec["ltq"]),
+                "atp": int(rec["atp"]) / 100.0,
+                "volume": int(rec["volume"]),
+                "total_buy_qty": float(rec["total_buy_qty"]),
+                "total_sell_qty": float(rec["total_sell_qty"]),
+                "open": int(rec["open"]) / 100.0,
+                "high": int(rec["high"]) / 100.0,
+                "low": int(rec["low"]) / 100.0,
+                "close": int(rec["close"]) / 100.0,
+            })
+        if mode >= MODE_SNAP_QUOTE:
+            depth = rec["depth"]
+            levels = [
+                {"qty": int(d["qty"]), "price": int(d["price"]) / 100.0, "orders": int(d["orders"])}
+                for d in depth
+            ]
+            out.update({
+                "last_traded_timestamp": int(rec["last_traded_ts"]),
+                "open_interest": int(rec["oi"]),
+                "open_interest_change_pct": int(rec["oi_change_pct"]),
+                "best_bids": [lv for lv, d in zip(levels, depth) if d["flag"] == 1],
+                "best_asks": [lv for lv, d in zip(levels, depth) if d["flag"] == 0],
+                "upper_circuit": int(rec["upper_circuit"]) / 100.0,
+                "lower_circuit": int(rec["lower_circuit"]) / 100.0,
+                "high_52w": int(rec["high_52w"]) / 100.0,
+                "low_52w": int(rec["low_52w"]) / 100.0,
+            })
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "tokens": len(self.tokens),
+            "max_tokens": self.max_tokens,
+            "packets": self.packets,
+            "rejected": self.rejected,
+            "bytes": self.records.nbytes,
+        }
+
+
+# ------------------------ SYNTHETIC PACKETS ------------------------
+def build_packet(
+    mode: int,
+    token: str,
+    ltp_paise: int,
+    seq: int = 0,
+    exch_ts: int = 0,
+    volume: int = 0,
+    exch: int = 1,
+) -> bytes:
+    """A well-formed packet of the given mode (other fields plausible filler)."""
+    rec = np.zeros(1, dtype=QUOTE_DTYPE)
+    r = rec[0]
+    r["mode"], r["exch"], r["token"] = mode, exch, token.encode("ascii")
+    r["seq"], r["exch_ts"], r["ltp"] = seq, exch_ts, ltp_paise
+    if mode >= MODE_QUOTE:
+        r["ltq"], r["atp"], r["volume"] = 10, ltp_paise, volume
+        r["total_buy_qty"], r["total_sell_qty"] = 1000.0, 1200.0
+        r["open"], r["high"], r["low"], r["close"] = ltp_paise, ltp_paise + 500, ltp_paise - 500, ltp_paise - 100
+    if mode >= MODE_SNAP_QUOTE:
+        r["last_traded_ts"], r["oi"] = exch_ts // 1000, 0
+        for i in range(10):
+            buy = i < 5
+            step = (i % 5 + 1) * 5
+            r["depth"][i] = (1 if buy else 0, 100 * (i + 1), ltp_paise - step if buy else ltp_paise + step, i + 1)
+        r["upper_circuit"], r["lower_circuit"] = ltp_paise * 12 // 10, ltp_paise * 8 // 10
+        r["high_52w"], r["low_52w"] = ltp_paise * 15 // 10, ltp_paise // 2
+    return rec.tobytes()[:PACKET_SIZE[mode]]
+
+
+# ------------------------ RECORD / REPLAY ------------------------
+_FRAME = struct.Struct("<I")
+
+
+def write_packet(fh: BinaryIO, data: bytes):
+    fh.write(_FRAME.pack(len(data)))
+    fh.write(data)
+
+
+class PacketRecorder:
+    """
+    One append-only packet file for the life of the process, shared by every
+    socket the worker opens. Writes are locked (the old socket's thread can
+    still deliver during a reconnect) and flushed at most `flush_interval`
+    seconds apart, so a crash loses at most that much of the recording.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._fh: Optional[BinaryIO] = open(path, "ab")
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.packets = 0
+
+    def write(self, data: bytes):
+        with self._lock:
+            if self._fh is None:
+                return
+            write_packet(self._fh, data)
+            self.packets += 1
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._fh.flush()
+                self._last_flush = now
+
+    def flush(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                self._last_flush = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            fh, self._fh = self._fh, None
+        if fh is not None:
+            fh.close()
+
+
+def read_packets(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        while True:
+            head = fh.read(_FRAME.size)
+            if len(head) < _FRAME.size:
+                return
+            (n,) = _FRAME.unpack(head)
+            data = fh.read(n)
+            if len(data) < n:
+                return
+            yield data
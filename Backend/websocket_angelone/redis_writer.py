@@ -0,0 +1,153 @@
+"""
+Micro-batching Redis writer for the per-tick hot path.
+
+on_data_callback only records (symbol, price, exch_ts, seq) in memory; a
+dedicated thread flushes everything collected during a short window
+(LTP_REDIS_WINDOW_MS, default 25ms) as ONE MULTI/EXEC pipeline:
+
+    HSET ltp:px / ZADD ltp:seq                    (see app.core.ltp_store)
+    XADD ltp:stream ... MAXLEN ~N                 (see app.core.tick_stream)
+
+Ticks for the same symbol inside one window are coalesced to the latest.
+
+Readers in this repo consume ltp:stream. For outside subscribers,
+LTP_CHANNEL_PUBLISH=1 adds one PUBLISH per flush (off by default):
+
+    PUBLISH ltp_updates [{"symbol": "SYM1", "ltp": p1, "ts": .., "seq": ..}, ...]
+
+LTP_CHANNEL_ENCODING=msgpack publishes compact rows instead (see app.core.ltp_codec).
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+PendingTick = Tuple[float, Optional[int], Optional[int]]
+
+from redis_client import get_redis
+from app.core import ltp_store, ltp_codec, tick_stream
+
+LTP_REDIS_WINDOW_MS = float(os.getenv("LTP_REDIS_WINDOW_MS", "25"))
+LTP_CHANNEL = "ltp_updates"
+LTP_CHANNEL_PUBLISH = os.getenv("LTP_CHANNEL_PUBLISH", "0").lower() in ("1", "true", "yes", "on")
+LTP_CHANNEL_ENCODING = ltp_codec.negotiate(os.getenv("LTP_CHANNEL_ENCODING", ltp_codec.JSON))
+if LTP_CHANNEL_ENCODING == ltp_codec.STRUCT:
+    # struct ids are per websocket connection; the channel has no dictionary
+    LTP_CHANNEL_ENCODING = ltp_codec.JSON
+
+
+class RedisTickWriter:
+    def __init__(
+        self,
+        window_ms: Optional[float] = None,
+        channel: str = LTP_CHANNEL,
+        encoding: str = LTP_CHANNEL_ENCODING,
+        publish: bool = LTP_CHANNEL_PUBLISH,
+    ):
+        self.window = (window_ms if window_ms is not None else LTP_REDIS_WINDOW_MS) / 1000.0
+        self.channel = channel
+        self.encoding = encoding
+        self.publish = publish
+
+        # symbol -> (price, exch_ts_ms, seq)
+        self._pending: Dict[str, PendingTick] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # metrics
+        self.ticks_offered = 0
+        self.ticks_written = 0
+        self.ticks_dropped = 0
+        self.flushes = 0
+        self.last_pipeline_size = 0
+        self.max_pipeline_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # ------------------------ LIFECYCLE ------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="redis-tick-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------------ HOT PATH ------------------------
+    def offer(self, symbol: str, price: float, exch_ts: Optional[int] = None, seq: Optional[int] = None):
+        with self._lock:
+            self._pending[symbol] = (price, exch_ts, seq)
+            self.ticks_offered += 1
+        self._wake.set()
+
+    # ------------------------ FLUSH ------------------------
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # let the window fill up before flushing
+            time.sleep(self.window)
+            self._wake.clear()
+
+            with self._lock:
+                batch, self._pending = self._pending, {}
+
+            if batch:
+                try:
+                    self.flush(batch)
+                except Exception as e:
+                    self.ticks_dropped += len(batch)
+                    print(f"[RedisTickWriter] flush error: {e}")
+
+    def flush(self, batch: Dict[str, PendingTick]) -> bool:
+        r = get_redis()
+        if not r:
+            self.ticks_dropped += len(batch)
+            return False
+
+        started = time.perf_counter()
+
+        # keep the seq assigned at receipt so the DB-flush path can be deduped against it
+        updates = [
+            (sym, price, ts, seq if seq is not None else ltp_store.next_seq())
+            for sym, (price, ts, seq) in batch.items()
+        ]
+
+        # MULTI/EXEC: readers never see ltp:px ahead of ltp:seq
+        pipe = r.pipeline(transaction=True)
+        ltp_store.write_many(pipe, updates)
+        tick_stream.append_many(pipe, updates)
+        if self.publish:
+            pipe.publish(self.channel, ltp_codec.encode_channel(updates, self.encoding))
+        pipe.execute()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        size = len(batch)
+
+        self.flushes += 1
+        self.ticks_written += size
+        self.last_pipeline_size = size
+        self.max_pipeline_size = max(self.max_pipeline_size, size)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+        return True
+
+    def stats(self) -> dict:
+        flushes = self.flushes or 1
+        return {
+            "window_ms": self.window * 1000.0,
+            "publish": self.publish,
+            "encoding": self.encoding,
+            "ticks_offered": self.ticks_offered,
+            "ticks_written": self.ticks_written,
+            "ticks_dropped": self.ticks_dropped,
+            "flushes": self.flushes,
+            "pending": len(self._pending),
+            "last_pipeline_size": self.last_pipeline_size,
+            "max_pipeline_size": self.max_pipeline_size,
+            "avg_pipeline_size": round(self.ticks_written / flushes, 2),
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / flushes, 3),
+        }
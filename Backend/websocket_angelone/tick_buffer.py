@@ -0,0 +1,106 @@
+"""
+Coalescing tick buffer between the SmartAPI callback and the DB flusher.
+
+Keeps only the latest (price, seq, exch_ts) per symbol, so memory is bounded
+by the number of subscribed symbols rather than the tick rate. drain() swaps
+the dirty map out in O(1) and hands back only the symbols that ticked since
+the previous drain; requeue() puts a set back when its flush failed.
+
+put() is idempotent per seq: the same tick arriving twice (SmartAPI callback
+and the Redis tick stream) or an older one arriving late changes nothing.
+"""
+
+import itertools
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# symbol -> (price, seq, exch_ts_ms)
+Dirty = Dict[str, Tuple[float, int, Optional[int]]]
+
+
+class CoalescingTickBuffer:
+    def __init__(self):
+        self._dirty: Dirty = {}
+        self._seq = itertools.count(1)
+
+        # Guards only the dict swap in drain(); put() holds it for one dict
+        # store, so the SmartAPI thread never waits on the DB flush itself.
+        self._swap_lock = threading.Lock()
+
+        # monotonic time of the oldest tick still waiting in _dirty, and of
+        # the set handed out by the last drain() (for flush-lag metrics)
+        self._dirty_since: Optional[float] = None
+        self.drained_since: Optional[float] = None
+
+        self.ticks_received = 0
+        self.ticks_coalesced = 0
+        self.ticks_flushed = 0
+        self.drains = 0
+        self.requeued = 0
+
+    def put(self, key: str, price: float, seq: Optional[int] = None, ts: Optional[int] = None) -> int:
+        """Record the latest price for `key`. Returns the tick's sequence number."""
+        if seq is None:
+            seq = next(self._seq)
+
+        with self._swap_lock:
+            self.ticks_received += 1
+            prev = self._dirty.get(key)
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            if prev is not None:
+                self.ticks_coalesced += 1
+                if prev[1] > seq:
+                    # an out-of-order (older) tick never overwrites a newer one
+                    return prev[1]
+            self._dirty[key] = (price, seq, ts)
+
+        return seq
+
+    def drain(self) -> Dirty:
+        """Swap out and return every key that ticked since the last drain."""
+        with self._swap_lock:
+            dirty, self._dirty = self._dirty, {}
+            self.drained_since, self._dirty_since = self._dirty_since, None
+
+        self.ticks_flushed += len(dirty)
+        self.drains += 1
+        return dirty
+
+    def requeue(self, items: Dirty, since: Optional[float] = None):
+        """
+        Put back a drained set whose flush failed. A newer tick that arrived
+        for the same key in the meantime wins; `since` (the drained set's
+        drained_since) keeps the lag metric counting from the original tick.
+        """
+        with self._swap_lock:
+            for key, tick in items.items():
+                prev = self._dirty.get(key)
+                if prev is None or prev[1] < tick[1]:
+                    self._dirty[key] = tick
+            if items:
+                oldest = since if since is not None else time.monotonic()
+                if self._dirty_since is None or oldest < self._dirty_since:
+                    self._dirty_since = oldest
+
+        self.requeued += len(items)
+
+    def __len__(self) -> int:
+        return len(self._dirty)
+
+    def oldest_age(self) -> float:
+        """Seconds the oldest un-drained tick has been waiting (0 if clean)."""
+        since = self._dirty_since
+        return time.monotonic() - since if since is not None else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "ticks_received": self.ticks_received,
+            "ticks_coalesced": self.ticks_coalesced,
+            "ticks_flushed": self.ticks_flushed,
+            "dirty": len(self._dirty),
+            "drains": self.drains,
+            "requeued": self.requeued,
+            "oldest_age_ms": round(self.oldest_age() * 1000.0, 1),
+        }
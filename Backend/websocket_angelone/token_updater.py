@@ -2,6 +2,7 @@ import os
 import json
 import time
 from datetime import datetime
+from typing import Callable, Optional
 import pyotp
 from SmartApi import SmartConnect
 
@@ -136,10 +137,15 @@ class TokenRefresher:
         # DO NOT call terminateSession — doing so kills feeds.
         # We keep the session alive.
 
-    def run_forever(self):
+    def run_forever(self, active: Optional[Callable[[], bool]] = None):
+        """`active` gates refreshes (multi-process: leader only)."""
         log("TokenRefresher started")
 
         while True:
+            if active is not None and not active():
+                time.sleep(10)
+                continue
+
             try:
                 last_login = self.current_tokens.get("last_full_login")
                 if last_login:
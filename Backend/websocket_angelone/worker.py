@@ -1,7 +1,8 @@
 import os
 import json
 import time
-import queue
+import atexit
+import socket
 import threading
 from datetime import datetime, time as dt_time
 
@@ -10,9 +11,6 @@ from typing import Dict, Set, Optional, List, Tuple, Callable
 from app.core.market_utils import is_market_open
 # ---------- Updated Redis API (safe wrappers) ----------
 from redis_client import (
-    
-    redis_safe_set,
-    redis_safe_publish,
     redis_safe_json_get,
     redis_safe_json_set,
 )
@@ -22,28 +20,59 @@ import pandas as pd
 from io import StringIO
 
 from apscheduler.schedulers.background import BackgroundScheduler
-from sqlalchemy import update
+from sqlalchemy import update, values, column, String, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.db import SessionLocal
-from app.models import Holding, MutualFund
+from app.models import Holding, MutualFund, IntradayBar
 from app.core.utils import load_credentials
 from app.core.config import ANGEL_API_KEY
 
 from SmartApi.smartWebSocketV2 import SmartWebSocketV2
 
+from app.core import ltp_store
+from app.core.tick_stream import StreamConsumer, StreamEntry
+from app.core.price_bus import PriceEvent, price_bus
+from websocket_angelone.instrument_index import InstrumentIndex
+from websocket_angelone.tick_buffer import CoalescingTickBuffer
+from websocket_angelone.bar_builder import BarBuilder
+from websocket_angelone.quote_parser import QuoteBook, MODES, MODE_QUOTE, PacketRecorder
+from websocket_angelone.redis_writer import RedisTickWriter
+from websocket_angelone.ltp_flusher import AdaptiveLtpFlusher, FlushResult
+from websocket_angelone.instrument_store import InstrumentStore, write_store
+from websocket_angelone.instrument_sync import (
+    InstrumentDelta,
+    conditional_download,
+    diff_snapshots,
+    load_meta,
+    save_meta,
+    snapshot,
+)
+
 
 # ============================ CONFIG ============================
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 TOKEN_FILE = os.path.join(BASE_DIR, "tokens", "angelone_token.json")
-INSTRUMENTS_CACHE = os.path.join(BASE_DIR, "tokens", "instruments_cache.json")
+INSTRUMENTS_CACHE = os.path.join(BASE_DIR, "tokens", "instruments_cache.bin")
+INSTRUMENTS_INDEX = os.path.join(BASE_DIR, "tokens", "instruments_index.json")
+INSTRUMENTS_META = os.path.join(BASE_DIR, "tokens", "instruments_meta.json")
 
-BATCH_INTERVAL = 5  # seconds
 INSTRUMENTS_TTL = 12 * 60 * 60
 AMFI_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
-ANGEL_INSTRUMENTS_URL = (
-    "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
+ANGEL_INSTRUMENTS_URL = os.getenv(
+    "ANGEL_INSTRUMENTS_URL",
+    "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json",
 )
 FEED_TOKEN_REFRESH_INTERVAL = 60 * 60
+BAR_FLUSH_INTERVAL = int(os.getenv("BAR_FLUSH_INTERVAL", "30"))
+# SmartAPI subscription mode: 1 = LTP, 2 = QUOTE (volume + OHLC), 3 = SNAP_QUOTE (+ best 5)
+ANGEL_WS_MODE = int(os.getenv("ANGEL_WS_MODE", str(MODE_QUOTE)))
+# append every raw binary packet here (for replay benchmarks); off when empty
+QUOTE_RECORD_PATH = os.getenv("QUOTE_RECORD_PATH", "")
+# re-send every dirty price at least this often, even if unchanged since our
+# last commit (broker syncs and new holdings also write holding.Ltp)
+LTP_FLUSH_REFRESH_S = float(os.getenv("LTP_FLUSH_REFRESH_S", "300"))
+BAR_FLUSH_CHUNK = 1000
 SUBSCRIBE_CHUNK_SIZE = 1000
 # ================================================================
 
@@ -51,16 +80,30 @@ SUBSCRIBE_CHUNK_SIZE = 1000
 # -------------------------------------------------
 # GLOBALS
 # -------------------------------------------------
-ltp_queue = queue.Queue()
+tick_buffer = CoalescingTickBuffer()
+redis_writer = RedisTickWriter()
+# created on the first tick, so only the ingesting leader pays for the rings
+bar_builder: Optional[BarBuilder] = None
+quote_book = QuoteBook()
+# QUOTE_RECORD_PATH file, opened once and shared across reconnects
+packet_recorder: Optional[PacketRecorder] = None
+db_stream_consumer: Optional[StreamConsumer] = None
+ltp_flusher: Optional[AdaptiveLtpFlusher] = None
+# symbol -> Ltp as of our last successful commit (skip re-writing unchanged prices)
+_last_committed: Dict[str, float] = {}
+_last_committed_reset = time.monotonic()
+_stream_ack_ids: List[str] = []
+_stream_ack_lock = threading.Lock()
 symbol_token_map: Dict[str, str] = {}
 token_to_symbol_map: Dict[str, str] = {}
 holding_tokens_set: Set[str] = set()
-ltp_listeners: List[Callable[[str, float], None]] = []
+holding_symbols: Set[str] = set()
 
 ltp_cache: Dict[str, float] = {}
-instruments_memory_cache: List[dict] = []
+instruments_store: Optional[InstrumentStore] = None
 _state_lock = threading.RLock()
-_instruments_meta: Dict[str, float | int] = {"ts": 0.0, "count": 0}
+_instruments_meta: Dict[str, float | int] = {"ts": 0.0, "count": 0, "source_ts": 0.0, "checked_ts": 0.0}
+_instrument_index: Optional[InstrumentIndex] = None
 ws_running = False
 
 # 🚦 NEW: flag to control when WS/LTP should be active (set by scheduler)
@@ -72,19 +115,6 @@ def log(msg: str, level="INFO"):
     print(f"[{datetime.now().strftime('%H:%M:%S')}] {level}: {msg}")
 
 
-# ------------------- Listener Registration -----------------------
-def register_ltp_listener(cb: Callable[[str, float], None]):
-    ltp_listeners.append(cb)
-
-
-def notify_ltp(symbol: str, ltp: float):
-    for cb in ltp_listeners:
-        try:
-            cb(symbol, ltp)
-        except Exception:
-            pass
-
-
 # ------------------- Token Handling ------------------------------
 def load_tokens_from_file() -> Tuple[Optional[str], Optional[str]]:
     try:
@@ -110,90 +140,245 @@ def load_tokens_from_file() -> Tuple[Optional[str], Optional[str]]:
 
 
 # ------------------- Instruments Caching --------------------------
+def _instruments_fresh_ts() -> float:
+    """Last time the scrip master was downloaded or confirmed unchanged."""
+    if not _instruments_meta.get("source_ts"):
+        meta = load_meta(INSTRUMENTS_META)
+        _instruments_meta["source_ts"] = float(meta.get("source_ts") or 0.0)
+        _instruments_meta["checked_ts"] = float(meta.get("checked_ts") or 0.0)
+
+    return max(
+        float(_instruments_meta.get("source_ts") or 0.0),
+        float(_instruments_meta.get("checked_ts") or 0.0),
+    )
+
+
 def _cache_valid() -> bool:
-    ts = _instruments_meta.get("ts", 0)
     if not os.path.exists(INSTRUMENTS_CACHE):
         return False
+    ts = _instruments_fresh_ts() or os.path.getmtime(INSTRUMENTS_CACHE)
     return (time.time() - ts) < INSTRUMENTS_TTL
 
 
-def load_cache() -> Optional[List[dict]]:
-    try:
-        with open(INSTRUMENTS_CACHE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+def _release_store():
+    """Unmap the current store (a mapped file cannot be replaced on Windows)."""
+    global instruments_store
 
-        _instruments_meta["ts"] = float(os.path.getmtime(INSTRUMENTS_CACHE))
-        _instruments_meta["count"] = len(data) if isinstance(data, list) else 0
+    if instruments_store is not None:
+        instruments_store.close()
+        instruments_store = None
 
-        return data
-    except Exception:
+
+def load_cache() -> Optional[InstrumentStore]:
+    global instruments_store
+
+    store = InstrumentStore.open(INSTRUMENTS_CACHE)
+    if store is None:
         return None
 
+    if instruments_store is not None and instruments_store is not store:
+        instruments_store.close()
+    instruments_store = store
 
-def save_cache(inst: List[dict]):
-    try:
-        os.makedirs(os.path.dirname(INSTRUMENTS_CACHE), exist_ok=True)
-        with open(INSTRUMENTS_CACHE, "w", encoding="utf-8") as f:
-            json.dump(inst, f)
+    _instruments_meta["ts"] = time.time()
+    _instruments_meta["source_ts"] = store.source_ts
+    _instruments_meta["count"] = len(store)
+    return store
 
-        _instruments_meta["ts"] = time.time()
-        _instruments_meta["count"] = len(inst)
+
+def save_cache(inst: List[dict]) -> Optional[InstrumentStore]:
+    # write_store goes through a temp file + os.replace, so the current store
+    # stays mapped and readable until load_cache swaps in the new one and
+    # closes it. Only Windows has to unmap before the file can be replaced.
+    release_first = os.name == "nt"
+    try:
+        if release_first:
+            _release_store()
+        write_store(INSTRUMENTS_CACHE, inst, source_ts=time.time())
+        return load_cache()
 
     except Exception as e:
         log(f"save_cache failed: {e}", "WARNING")
+        if instruments_store is None:
+            load_cache()  # remap the previous file
+        return None
 
 
-def fetch_instruments(force: bool = False) -> Optional[List[dict]]:
-    global instruments_memory_cache
+def refresh_instruments() -> Optional[InstrumentStore]:
+    """
+    Conditional download of the scrip master.
+    Unchanged (304 / same sha256) → keep the current store.
+    Changed → rewrite the store, rebuild the index and patch only the
+    affected holdings in the live symbol maps.
+    """
+    meta = load_meta(INSTRUMENTS_META)
+    if instruments_store is None:
+        load_cache()
 
-    # 1) Redis (safe)
-    if not force:
-        cached = redis_safe_json_get("instruments_cache")
-        if isinstance(cached, list):
-            instruments_memory_cache = cached
-            log(f"Loaded instruments from Redis ({len(cached)})")
-            return cached
+    result = conditional_download(
+        ANGEL_INSTRUMENTS_URL,
+        meta,
+        timeout=12,
+        have_snapshot=instruments_store is not None,
+    )
+
+    now = time.time()
+    result.meta["checked_ts"] = now
+    _instruments_meta["checked_ts"] = now
+
+    if not result.changed:
+        save_meta(INSTRUMENTS_META, result.meta)
+        log(f"Instruments {result.status.replace('_', ' ')} ({len(instruments_store or [])})")
+        return instruments_store
+
+    instruments = json.loads(result.body or b"")
+    if not isinstance(instruments, list):
+        raise ValueError("Invalid instrument response")
+
+    before = snapshot(instruments_store)
+
+    store = save_cache(instruments)
+    del instruments
+    if store is None:
+        raise ValueError("Could not write instruments cache")
+
+    result.meta["source_ts"] = store.source_ts
+    save_meta(INSTRUMENTS_META, result.meta)
+
+    delta = diff_snapshots(before, snapshot(store))
+    log(f"Fetched instruments remote ({len(store)}) delta {delta.summary()}")
+
+    index = rebuild_instrument_index(store)
+    if delta:
+        apply_instrument_delta(delta, index)
+
+    return store
+
+
+def fetch_instruments(force: bool = False) -> Optional[InstrumentStore]:
+    # 1) Memory (mmap already open)
+    if not force and instruments_store is not None and _cache_valid():
+        return instruments_store
 
     # 2) File
     if not force and _cache_valid():
         file_cached = load_cache()
-        if isinstance(file_cached, list):
-            instruments_memory_cache = file_cached
+        if file_cached is not None:
             log(f"Loaded instruments from file cache ({len(file_cached)})")
-            redis_safe_json_set("instruments_cache", file_cached)
             return file_cached
 
-    # 3) Remote fetch
+    # 3) Remote fetch (conditional)
     try:
-        resp = requests.get(ANGEL_INSTRUMENTS_URL, timeout=12)
-        resp.raise_for_status()
-
-        instruments = resp.json()
-        if not isinstance(instruments, list):
-            raise ValueError("Invalid instrument response")
-
-        save_cache(instruments)
-        redis_safe_json_set("instruments_cache", instruments)
-        instruments_memory_cache = instruments
-
-        log(f"Fetched instruments remote ({len(instruments)})")
-        return instruments
+        store = refresh_instruments()
+        if store is not None:
+            return store
 
     except Exception as e:
         log(f"Remote fetch failed: {e}", "WARNING")
 
-    # 4) RAM fallback
-    if instruments_memory_cache:
-        log("Using memory fallback instruments cache", "WARNING")
-        return instruments_memory_cache
+    # 4) Stale mmap / file fallback
+    if instruments_store is not None:
+        log("Using stale instruments cache", "WARNING")
+        return instruments_store
+
+    stale = load_cache()
+    if stale is not None:
+        log("Using stale instruments file cache", "WARNING")
+        return stale
 
     log("NO instruments available anywhere ❌", "ERROR")
     return None
 
 
+# ------------------- Instrument Index ------------------------------
+def rebuild_instrument_index(store: InstrumentStore) -> InstrumentIndex:
+    """Hash the scrip master once per refresh and persist it."""
+    global _instrument_index
+
+    index = InstrumentIndex.from_store(store)
+    _instrument_index = index
+
+    try:
+        index.save(INSTRUMENTS_INDEX)
+    except Exception as e:
+        log(f"instrument index save failed: {e}", "WARNING")
+
+    log(f"Instrument index built ({len(index)} rows)")
+    return index
+
+
+def get_instrument_index(force: bool = False) -> Optional[InstrumentIndex]:
+    """
+    Memory → persisted file → rebuild from instruments.
+    A persisted index is reused while its source refresh is within INSTRUMENTS_TTL.
+    """
+    global _instrument_index
+
+    if not force:
+        if _instrument_index is not None and len(_instrument_index):
+            return _instrument_index
+
+        persisted = InstrumentIndex.load(INSTRUMENTS_INDEX)
+        if (
+            persisted is not None
+            and len(persisted)
+            and _cache_valid()
+            and persisted.source_ts >= float(_instruments_meta.get("source_ts") or 0.0)
+        ):
+            _instrument_index = persisted
+            log(f"Loaded instrument index from file ({len(persisted)})")
+            return persisted
+
+    store = fetch_instruments(force=force)
+    if store is None:
+        return _instrument_index
+
+    # remote fetch already rebuilt it
+    if _instrument_index is not None and _instrument_index.source_ts == store.source_ts:
+        return _instrument_index
+
+    return rebuild_instrument_index(store)
+
+
+def apply_instrument_delta(delta: InstrumentDelta, index: InstrumentIndex):
+    """
+    Re-resolve only the holdings a scrip master change can affect:
+    those mapped to a touched NSE token, plus holdings still unmapped.
+    """
+    global holding_tokens_set
+
+    with _state_lock:
+        touched = delta.tokens("NSE")
+        affected = {sym for tok, sym in token_to_symbol_map.items() if tok in touched}
+        affected |= holding_symbols - symbol_token_map.keys()
+
+        if not affected:
+            return
+
+        remapped = 0
+        for sym in affected:
+            old_tok = symbol_token_map.pop(sym, None)
+            if old_tok is not None and token_to_symbol_map.get(old_tok) == sym:
+                del token_to_symbol_map[old_tok]
+
+            token = index.resolve(sym, "NSE")
+            if not token:
+                continue
+
+            symbol_token_map[sym] = token
+            token_to_symbol_map[token] = sym
+            if token != old_tok:
+                remapped += 1
+
+        holding_tokens_set = set(token_to_symbol_map.keys())
+        redis_safe_json_set("symbol_token_map", symbol_token_map)
+
+        log(f"Instrument delta applied: {len(affected)} holdings checked, {remapped} remapped")
+
+
 # ------------------- Build Symbol Map ------------------------------
 def build_symbol_token_map(force=False):
-    global symbol_token_map, token_to_symbol_map, holding_tokens_set, _instruments_meta
+    global symbol_token_map, token_to_symbol_map, holding_tokens_set, holding_symbols, _instruments_meta
 
     with _state_lock:
         old_size = len(symbol_token_map)
@@ -207,6 +392,7 @@ def build_symbol_token_map(force=False):
                 symbol_token_map = cached
                 token_to_symbol_map = {v: k for k, v in cached.items()}
                 holding_tokens_set = set(token_to_symbol_map.keys())
+                holding_symbols = set(cached.keys())
 
                 # mark timestamp so we DO NOT rebuild again soon
                 _instruments_meta["ts"] = time.time()
@@ -232,11 +418,13 @@ def build_symbol_token_map(force=False):
             log("No holdings found → mapping skipped")
             return
 
+        holding_symbols = symbols
+
         # ----------------------------------------
-        # 3) INSTRUMENTS (Redis/File/Remote)
+        # 3) INSTRUMENT INDEX (Memory/File/Instruments)
         # ----------------------------------------
-        inst = fetch_instruments(force=force)
-        if not inst:
+        index = get_instrument_index(force=force)
+        if index is None:
             log("No instruments available to map", "ERROR")
             return
 
@@ -246,36 +434,17 @@ def build_symbol_token_map(force=False):
         holding_tokens_set = set()
 
         # ----------------------------------------
-        # 4) BUILD MAP
+        # 4) BUILD MAP (one lookup per holding)
         # ----------------------------------------
-        for row in inst:
-            try:
-                token = str(row.get("token", "")).strip()
-                symbol_json = str(row.get("symbol", "")).strip().upper()
-                name_json = str(row.get("name", "")).strip().upper()
-                exch = row.get("exch_seg", "").upper()
-
-                if exch != "NSE":
-                    continue
-
-                is_equity = symbol_json.endswith("-EQ")
-
-                for sym in symbols:
-                    if is_equity and symbol_json == sym + "-EQ":
-                        symbol_token_map[sym] = token
-                        token_to_symbol_map[token] = sym
-                        holding_tokens_set.add(token)
-                        break
-
-                    if symbol_json == sym or name_json == sym:
-                        symbol_token_map[sym] = token
-                        token_to_symbol_map[token] = sym
-                        holding_tokens_set.add(token)
-                        break
-
-            except Exception:
+        for sym in symbols:
+            token = index.resolve(sym, "NSE")
+            if not token:
                 continue
 
+            symbol_token_map[sym] = token
+            token_to_symbol_map[token] = sym
+            holding_tokens_set.add(token)
+
         log(f"Mapped {len(holding_tokens_set)} tokens")
 
         # ----------------------------------------
@@ -287,64 +456,218 @@ def build_symbol_token_map(force=False):
         _instruments_meta["ts"] = time.time()
 
 
-# ------------------ Safe float conversion -------------------------
-def safe_float(x: object) -> float:
-    try:
-        return float(str(x))
-    except Exception:
-        return 0.0
+# ------------------- LTP Batch Update -----------------------------
+def reset_committed_cache():
+    """Forget last-committed prices, so the next flush re-sends every dirty symbol."""
+    global _last_committed_reset
+    _last_committed.clear()
+    _last_committed_reset = time.monotonic()
 
 
-# ------------------- LTP Batch Update -----------------------------
-def update_holdings_batch():
-    items: Dict[str, float] = {}
+def update_holdings_batch() -> Optional[FlushResult]:
+    # O(dirty tokens): only tokens that ticked since the last flush
+    # stream entries already folded into tick_buffer; acked once committed
+    with _stream_ack_lock:
+        ack_ids = _stream_ack_ids[:]
+        _stream_ack_ids.clear()
 
-    # Empty queue
-    while not ltp_queue.empty():
-        try:
-            token, raw = ltp_queue.get_nowait()
-            price_val = safe_float(raw) / 100.0
-            items[str(token)] = price_val
-        except Exception:
-            break
+    items = tick_buffer.drain()
+    since = tick_buffer.drained_since
 
     if not items:
-        return
+        _ack_stream(ack_ids)
+        return None
+
+    if time.monotonic() - _last_committed_reset >= LTP_FLUSH_REFRESH_S:
+        reset_committed_cache()
+
+    rows: List[Tuple[str, float]] = []
+    events: List[PriceEvent] = []
+    for symbol, (price, seq, ts) in items.items():
+        if _last_committed.get(symbol) == price:
+            continue
+        rows.append((symbol, price))
+        events.append(PriceEvent(symbol, price, ts, seq))
+
+    skipped = len(items) - len(rows)
+    if not rows:
+        _ack_stream(ack_ids)
+        return FlushResult(True, 0, skipped, 0.0, _lag_ms(since))
 
     session = SessionLocal()
-    updated = 0
+    started = time.perf_counter()
 
     try:
-        for tok, price in items.items():
-            symbol = token_to_symbol_map.get(tok)
-            if not symbol:
-                continue
+        # ❌ Do NOT overwrite Redis here.
+        # Redis is updated in real-time from WebSocket.
+        # This batch worker is only for DB commits (cadence: ltp_flusher).
+        #
+        # One round trip per flush:
+        #   UPDATE holding SET ... FROM (VALUES (sym, ltp), ...) AS v WHERE holding.symbol = v.symbol
+        batch = values(
+            column("symbol", String),
+            column("ltp", Float),
+            name="ltp_batch",
+        ).data(rows)
+
+        stmt = (
+            update(Holding)
+            .where(Holding.symbol == batch.c.symbol)
+            .values(Ltp=batch.c.ltp, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        result = session.execute(stmt)
+        session.commit()
 
-            # ❌ Do NOT overwrite Redis here.
-            # Redis is updated in real-time from WebSocket.
-            # This batch worker is only for DB commits every BATCH_INTERVAL.
-            stmt = (
-                update(Holding)
-                .where(Holding.symbol == symbol)
-                .values(Ltp=price, updated_at=datetime.utcnow())
-            )
-            session.execute(stmt)
+        elapsed = time.perf_counter() - started
+        updated = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(rows)
+        rate = updated / elapsed if elapsed > 0 else 0.0
 
-            updated += 1
-            notify_ltp(symbol, price)
+        log(
+            f"Batch LTP commit complete ({len(rows)}/{len(items)} symbols, "
+            f"{updated} rows in {elapsed * 1000:.1f} ms, {rate:.0f} rows/s)"
+        )
+        _last_committed.update(rows)
+        _ack_stream(ack_ids)
 
-        session.commit()
+        # Fallback delivery: same seq as the Redis path, so the broadcaster
+        # drops whatever already went out in real time.
+        for event in events:
+            price_bus.publish(event)
 
-        log(f"Batch LTP commit complete ({updated}/{len(items)})")
+        return FlushResult(True, len(rows), skipped, elapsed * 1000.0, _lag_ms(since))
 
     except Exception as e:
         session.rollback()
         log(f"update_holdings_batch ERROR: {e}", "ERROR")
+        # un-acked stream entries come back and refill the buffer; without
+        # the stream, put the drained prices back or they wait for the next tick
+        if db_stream_consumer is not None:
+            db_stream_consumer.request_redelivery()
+        else:
+            tick_buffer.requeue(items, since)
+        return FlushResult(False, 0, skipped, (time.perf_counter() - started) * 1000.0)
 
     finally:
         session.close()
 
 
+def _lag_ms(since: Optional[float]) -> float:
+    return (time.monotonic() - since) * 1000.0 if since is not None else 0.0
+
+
+def start_ltp_flusher(active: Optional[Callable[[], bool]] = None) -> AdaptiveLtpFlusher:
+    """The one DB flusher for live prices (see websocket_angelone.ltp_flusher)."""
+    global ltp_flusher
+    if ltp_flusher is None:
+        ltp_flusher = AdaptiveLtpFlusher(
+            flush=update_holdings_batch,
+            pending=lambda: len(tick_buffer),
+            active=active,
+            on_activate=reset_committed_cache,
+        )
+    ltp_flusher.start()
+    log("LTP DB flusher started")
+    return ltp_flusher
+
+
+# ------------------- Intraday Bars → DB --------------------------
+def get_bar_builder() -> BarBuilder:
+    global bar_builder
+
+    if bar_builder is None:
+        with _state_lock:
+            if bar_builder is None:
+                bar_builder = BarBuilder()
+                log(f"Bar builder created (ring capacity {bar_builder.capacity})")
+    return bar_builder
+
+
+def flush_intraday_bars():
+    """Close finished buckets and upsert them in bulk (chunks of BAR_FLUSH_CHUNK)."""
+    if bar_builder is None:
+        return
+
+    bar_builder.close_stale(int(time.time()))
+    bars = bar_builder.drain_finished()
+    if not bars:
+        return
+
+    rows = [
+        {
+            "token": tok,
+            "symbol": token_to_symbol_map.get(tok, tok),
+            "interval_s": iv,
+            "bar_start": datetime.utcfromtimestamp(start),
+            "open": o,
+            "high": h,
+            "low": l,
+            "close": c,
+            "volume": v,
+            "ticks": n,
+        }
+        for tok, iv, start, o, h, l, c, v, n in bars
+    ]
+
+    session = SessionLocal()
+    started = time.perf_counter()
+    try:
+        for i in range(0, len(rows), BAR_FLUSH_CHUNK):
+            stmt = pg_insert(IntradayBar).values(rows[i : i + BAR_FLUSH_CHUNK])
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_intraday_bar_token_interval_start",
+                set_={
+                    col: stmt.excluded[col]
+                    for col in ("symbol", "open", "high", "low", "close", "volume", "ticks")
+                },
+            )
+            session.execute(stmt)
+        session.commit()
+        log(f"Intraday bars flushed ({len(rows)} bars in {(time.perf_counter() - started) * 1000:.1f} ms)")
+    except Exception as e:
+        session.rollback()
+        bar_builder.requeue(bars)
+        log(f"flush_intraday_bars ERROR: {e}", "ERROR")
+    finally:
+        session.close()
+
+
+# ------------------- Tick Stream → DB ----------------------------
+def _ack_stream(ids: List[str]):
+    if ids and db_stream_consumer is not None:
+        db_stream_consumer.ack(ids)
+
+
+def _feed_from_stream(entries: List[StreamEntry]) -> bool:
+    # idempotent by seq: ticks already put by on_data_callback change nothing
+    for _id, rec in entries:
+        tick_buffer.put(rec["symbol"], rec["ltp"], rec["seq"], rec["ts"])
+    with _stream_ack_lock:
+        _stream_ack_ids.extend(entry_id for entry_id, _rec in entries)
+    return False  # ack after the DB commit, not now
+
+
+def start_db_stream_consumer(active: Optional[Callable[[], bool]] = None) -> StreamConsumer:
+    """
+    Feed tick_buffer from the Redis tick stream (group "ltp:db"), so ticks
+    survive a crash between receipt and commit: entries stay pending until
+    update_holdings_batch commits them, and a new leader claims whatever
+    a dead one left behind.
+    """
+    global db_stream_consumer
+    if db_stream_consumer is None:
+        db_stream_consumer = StreamConsumer(
+            group="ltp:db",
+            consumer=f"{socket.gethostname()}:{os.getpid()}",
+            handler=_feed_from_stream,
+            start_id="$",
+            claim_idle_ms=30_000,
+            active=active,
+        )
+    db_stream_consumer.start()
+    return db_stream_consumer
+
+
 # ------------------- MF NAV Update ------------------------------
 def update_mf_ltp():
     """
@@ -444,7 +767,21 @@ def daily_prev_ltp_update():
 
 
 # ------------------- SmartAPI WebSocket Callback ------------------
+def on_quote_packet(slot: int):
+    """Binary path: QuoteWebSocket already copied the packet into quote_book[slot]."""
+    token = quote_book.tokens[slot]
+    if token not in holding_tokens_set:
+        return
+
+    symbol = token_to_symbol_map.get(token)
+    if not symbol:
+        return
+
+    _handle_tick(token, symbol, quote_book.ltp(slot), quote_book.exch_ts(slot) or None, quote_book.volume(slot))
+
+
 def on_data_callback(parsed: dict):
+    """Dict path (stock SmartWebSocketV2 parsing)."""
     if not isinstance(parsed, dict):
         return
 
@@ -467,25 +804,100 @@ def on_data_callback(parsed: dict):
     except Exception:
         return
 
-    # ✅ Real-time: update Redis immediately
-    redis_safe_set(f"ltp:{symbol}", str(price))
-    redis_safe_publish("ltp_updates", {"symbol": symbol, "ltp": price})
+    exch_ts = parsed.get("exchange_timestamp")
+    try:
+        exch_ts = int(exch_ts) if exch_ts is not None else None
+    except Exception:
+        exch_ts = None
+
+    _handle_tick(token, symbol, price, exch_ts, parsed.get("volume_trade_for_the_day"))
+
+
+def _handle_tick(token: str, symbol: str, price: float, exch_ts: Optional[int], cum_volume: Optional[float]):
+    # One seq per tick, shared by the Redis path and the DB flush path
+    seq = ltp_store.next_seq()
+
+    # ✅ Real-time: LTP store + publish, pipelined every few ms by redis_writer
+    redis_writer.offer(symbol, price, exch_ts, seq)
 
     # ✅ Also keep in-memory cache fresh for fallback
     ltp_cache[symbol] = price
 
-    try:
-        # DB batch worker will commit this every BATCH_INTERVAL seconds
-        ltp_queue.put((token, ltp_raw))
-    except Exception:
-        pass
+    # ltp_flusher commits the latest price to the DB (adaptive cadence)
+    tick_buffer.put(symbol, price, seq, exch_ts)
+
+    # Intraday OHLCV (1m/5m/15m)
+    (bar_builder or get_bar_builder()).update(
+        token,
+        price,
+        exch_ts // 1000 if exch_ts else int(time.time()),
+        cum_volume,
+    )
+
+
+# ------------------- Binary Quote Socket -------------------------
+def get_packet_recorder() -> Optional[PacketRecorder]:
+    global packet_recorder
+
+    if not QUOTE_RECORD_PATH:
+        return None
+    with _state_lock:
+        if packet_recorder is None:
+            packet_recorder = PacketRecorder(QUOTE_RECORD_PATH)
+            atexit.register(packet_recorder.close)
+            log(f"Recording raw packets to {QUOTE_RECORD_PATH}")
+    return packet_recorder
+
+
+class QuoteWebSocket(SmartWebSocketV2):
+    """
+    SmartWebSocketV2 that skips the per-tick dict: binary packets are copied
+    into a QuoteBook record and `on_quote(slot)` is called. Text frames
+    (pong, errors) still go through the stock handler.
+    """
+
+    def __init__(self, *args, book: QuoteBook, on_quote: Callable[[int], None],
+                 recorder: Optional[PacketRecorder] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.book = book
+        self.on_quote = on_quote
+        # owned by the caller; shared with later clients after a reconnect
+        self.recorder = recorder
+
+    def close_connection(self):
+        if self.recorder is not None:
+            self.recorder.flush()
+        super().close_connection()
+
+    def _on_data(self, wsapp, data, data_type, continue_flag):
+        if data_type != 2:
+            return super()._on_data(wsapp, data, data_type, continue_flag)
+
+        if self.recorder is not None:
+            self.recorder.write(data)
+
+        slot = self.book.ingest(data)
+        if slot >= 0:
+            try:
+                self.on_quote(slot)
+            except Exception as e:
+                log(f"on_quote error: {e}", "ERROR")
 
 
 # ------------------- WebSocket Worker ----------------------------
 class WebSocketWorker(threading.Thread):
-    def __init__(self):
+    def __init__(self, active: Optional[Callable[[], bool]] = None, mode: Optional[int] = None):
         super().__init__(daemon=True)
 
+        # LTP / QUOTE / SNAP_QUOTE (see quote_parser)
+        self.mode = mode or ANGEL_WS_MODE
+        if self.mode not in MODES:
+            log(f"Unknown subscription mode {self.mode}, using LTP", "WARNING")
+            self.mode = MODES[0]
+
+        # gate for multi-process deployments: only the elected leader ingests
+        self.active: Callable[[], bool] = active or (lambda: True)
+
         creds = load_credentials(broker_name="angelone") or {}
         self.client_code = creds.get("client_code") or creds.get("clientId")
 
@@ -496,6 +908,17 @@ class WebSocketWorker(threading.Thread):
         self.connected_event = threading.Event()
         self.feed_last_refresh = 0
 
+    def _close_ws(self, reason: str):
+        if self.ws:
+            try:
+                self.ws.close_connection()
+                log(reason)
+            except Exception:
+                pass
+            self.ws = None
+            self.subscribed.clear()
+            self.connected_event.clear()
+
     def _on_open(self):
         self.connected_event.set()
         log("WS connected")
@@ -509,11 +932,14 @@ class WebSocketWorker(threading.Thread):
 
     def connect_ws(self, jwt: str, feed: str) -> Optional[SmartWebSocketV2]:
         try:
-            client = SmartWebSocketV2(
+            client = QuoteWebSocket(
                 auth_token=jwt,
                 api_key=ANGEL_API_KEY,
                 client_code=self.client_code,
                 feed_token=feed,
+                book=quote_book,
+                on_quote=on_quote_packet,
+                recorder=get_packet_recorder(),
             )
 
             client.on_data = lambda wsapp, data: on_data_callback(data)
@@ -547,16 +973,36 @@ class WebSocketWorker(threading.Thread):
 
             try:
                 client.subscribe(
-                    correlation_id="ltpupdate", mode=1, token_list=payload
+                    correlation_id="ltpupdate", mode=self.mode, token_list=payload
                 )
             except Exception:
                 try:
-                    client.subscribe("ltp", 1, payload)
+                    client.subscribe("ltp", self.mode, payload)
                 except Exception as e:
                     log(f"_subscribe_in_chunks fallback failed: {e}", "WARNING")
 
             time.sleep(0.05)
 
+    def unsubscribe_stale(self):
+        """Drop tokens no longer mapped (e.g. removed by an instrument delta)."""
+        stale = list(self.subscribed - holding_tokens_set)
+        if not stale or self.ws is None:
+            return
+
+        for i in range(0, len(stale), SUBSCRIBE_CHUNK_SIZE):
+            chunk = stale[i : i + SUBSCRIBE_CHUNK_SIZE]
+            payload = [{"exchangeType": 1, "tokens": chunk}]
+            try:
+                self.ws.unsubscribe(
+                    correlation_id="ltpupdate", mode=self.mode, token_list=payload
+                )
+            except Exception as e:
+                log(f"unsubscribe_stale failed: {e}", "WARNING")
+                return
+
+        self.subscribed.difference_update(stale)
+        log(f"Unsubscribed {len(stale)} stale tokens")
+
     def subscribe_missing(self):
         needed = list(holding_tokens_set - self.subscribed)
         if not needed or self.ws is None:
@@ -572,6 +1018,8 @@ class WebSocketWorker(threading.Thread):
     def run(self):
         log("WebSocketWorker starting")
 
+        redis_writer.start()
+
         build_symbol_token_map(force=False)
 
         jwt, feed = load_tokens_from_file()
@@ -579,33 +1027,21 @@ class WebSocketWorker(threading.Thread):
             self.current_tokens = (jwt, feed)
 
         while True:
+            # 🔥 Another process holds the feed → stay idle
+            if not self.active():
+                self._close_ws("WS closed because this process is not the leader")
+                time.sleep(5)
+                continue
+
             # 🔥 Only do anything if market window is active
             if not market_active:
-                if self.ws:
-                    try:
-                        self.ws.close_connection()
-                        log("WS closed because market_active=False")
-                    except Exception:
-                        pass
-                    self.ws = None
-                    self.subscribed.clear()
-                    self.connected_event.clear()
-
+                self._close_ws("WS closed because market_active=False")
                 time.sleep(30)
                 continue
 
             # 🔥 Inside active window, still respect actual market open/holiday
             if not is_market_open():
-                if self.ws:
-                    try:
-                        self.ws.close_connection()
-                        log("WS closed because market is not open (holiday/pre/post)")
-                    except Exception:
-                        pass
-                    self.ws = None
-                    self.subscribed.clear()
-                    self.connected_event.clear()
-
+                self._close_ws("WS closed because market is not open (holiday/pre/post)")
                 time.sleep(10)
                 continue
 
@@ -659,28 +1095,12 @@ class WebSocketWorker(threading.Thread):
             self.refresh_feed_token()
 
             if self.connected_event.is_set():
+                self.unsubscribe_stale()
                 self.subscribe_missing()
 
             time.sleep(1)
 
 
-# ------------------- LTP Batch Worker ----------------------------
-def start_ltp_batch_worker():
-    def worker():
-        while True:
-            try:
-                # 🔥 Only run batch when market window is active AND market is open
-                if market_active and is_market_open():
-                    log(f"{market_active}:{is_market_open()}")
-                    update_holdings_batch()
-            except Exception as e:
-                log(f"LTP batch worker ERROR: {e}", "ERROR")
-            time.sleep(BATCH_INTERVAL)
-
-    threading.Thread(target=worker, daemon=True).start()
-    log("LTP batch worker started")
-
-
 # ---------------- Scheduler ----------------
 def enable_market_mode():
     global market_active
@@ -694,7 +1114,16 @@ def disable_market_mode():
     log("🛑 Market session window DISABLED (WS + LTP batch paused)")
 
 
-def start_scheduler():
+def sync_market_mode():
+    """Set market_active from the clock (startup, or on becoming leader)."""
+    now = datetime.now().time()
+    if now >= dt_time(9, 10) and now <= dt_time(15, 45):
+        enable_market_mode()
+    else:
+        disable_market_mode()
+
+
+def start_scheduler() -> BackgroundScheduler:
     scheduler = BackgroundScheduler()
     scheduler.add_job(enable_market_mode, "cron", hour=9, minute=10)
     scheduler.add_job(disable_market_mode, "cron", hour=15, minute=45)
@@ -702,14 +1131,12 @@ def start_scheduler():
     scheduler.add_job(build_symbol_token_map, "cron", hour=0, minute=10)
     scheduler.add_job(update_mf_ltp, "cron", hour=15, minute=0)
     scheduler.add_job(daily_prev_ltp_update, "cron", hour=23, minute=30)
-    scheduler.add_job(lambda: fetch_instruments(force=True), "interval", hours=12)
+    scheduler.add_job(lambda: fetch_instruments(force=True), "interval", hours=12)  # conditional; patches maps on delta
+    scheduler.add_job(flush_intraday_bars, "interval", seconds=BAR_FLUSH_INTERVAL)
 
     scheduler.start()
     log("Scheduler started")
 
     # 🚀 INITIAL STATE CHECK
-    now = datetime.now().time()
-    if now >= dt_time(9, 10) and now <= dt_time(15, 45):
-        enable_market_mode()
-    else:
-        disable_market_mode()
+    sync_market_mode()
+    return scheduler